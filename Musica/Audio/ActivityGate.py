@@ -0,0 +1,127 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+
+"""This module implements an activity gate to skip the silent frames of a recording.
+
+The mean square of all the frames is computed from the cumulative sum of the squared samples, thus
+the cost is a single pass over the signal whatever the frame size and the hop are.  The frames whose
+RMS level is under a threshold are not transformed by the spectral analyses which accept a gate.
+
+"""
+
+####################################################################################################
+
+__all__ = [
+    'ActivityGate',
+    'frame_energy',
+    ]
+
+####################################################################################################
+
+import numpy as np
+
+####################################################################################################
+
+def frame_energy(values, number_of_samples, hop):
+
+    """Return the mean square of the frames of *values* along the last axis.
+
+    The frames are the same as :meth:`Musica.Audio.Spectrogram.Spectrogram.frame`.  The cumulative
+    sum is computed in double precision, its rounding error is negligible compared to the energy of
+    an audible frame.
+
+    """
+
+    values = np.asarray(values)
+    size = values.shape[-1]
+    if number_of_samples > size:
+        raise ValueError("frame size {} is larger than the signal".format(number_of_samples))
+
+    cumulative = np.zeros(values.shape[:-1] + (size + 1,))
+    np.cumsum(np.square(values, dtype=np.float64), axis=-1, out=cumulative[..., 1:])
+
+    number_of_frames = 1 + (size - number_of_samples) // hop
+    starts = np.arange(number_of_frames) * hop
+    energy = cumulative[..., starts + number_of_samples] - cumulative[..., starts]
+    energy /= number_of_samples
+
+    return np.maximum(energy, 0, out=energy)
+
+####################################################################################################
+
+class ActivityGate:
+
+    """Class to gate the frames by their RMS level.
+
+    *threshold* is the RMS level in dB relative to the full scale of the normalised samples, a frame
+    is active if its level is greater or equal to the threshold.
+
+    """
+
+    ##############################################
+
+    def __init__(self, threshold=-60):
+
+        self._threshold = threshold
+        self._energy_threshold = 10**(threshold / 10)
+
+    ##############################################
+
+    @property
+    def threshold(self):
+        return self._threshold
+
+    @property
+    def energy_threshold(self):
+        """Threshold of the mean square"""
+        return self._energy_threshold
+
+    ##############################################
+
+    def __repr__(self):
+        return '{0.__class__.__name__} {0._threshold} dB'.format(self)
+
+    ##############################################
+
+    def is_active(self, values):
+
+        """Return if a frame, or each frame of an array along the last axis, is active."""
+
+        values = np.asarray(values)
+        energy = np.einsum('...i,...i->...', values, values) / values.shape[-1]
+        return energy >= self._energy_threshold
+
+    ##############################################
+
+    def active_frames(self, values, number_of_samples, hop):
+
+        """Return the boolean mask of the active frames of *values*, see :func:`frame_energy`."""
+
+        return frame_energy(values, number_of_samples, hop) >= self._energy_threshold
+
+    ##############################################
+
+    def level(self, values, number_of_samples, hop):
+
+        """Return the RMS level of the frames in dB."""
+
+        with np.errstate(divide='ignore'):
+            return 10 * np.log10(frame_energy(values, number_of_samples, hop))
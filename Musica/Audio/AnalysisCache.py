@@ -0,0 +1,290 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+
+"""This module implements an on-disk cache for analysis results like spectra, spectrograms and
+pitches.
+
+An entry is keyed by the hash of the content of the audio file, the name of the analysis and its
+parameters, thus a modified file never hits a stale entry.  The content hash is itself cached
+using the path, size and modification time of the file so as not to read the file on a warm run.
+
+Arrays are stored as ``.npy`` files which are loaded memory mapped, and dictionaries of arrays as
+``.npz`` files.  The total size of the cache, including the content hash files, is bounded, the
+least recently used files are evicted first.  The cache keeps a running size and only scans the
+directory when it is over the budget, then it is trimmed to 90% of the budget.  The size counted by a process doesn't include the files
+written by the other processes in the meantime, thus concurrent writers can exceed the budget until
+the next scan.
+
+"""
+
+####################################################################################################
+
+__all__ = [
+    'AnalysisCache',
+    ]
+
+####################################################################################################
+
+import hashlib
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+class AnalysisCache:
+
+    """Class to implement an on-disk cache of analysis results.
+
+    Parameters
+    ----------
+    path : str
+        Cache directory, created if it doesn't exist
+    maximum_size : int
+        Maximum size of the entries and the content hash files in bytes
+
+    """
+
+    _logger = _module_logger.getChild('AnalysisCache')
+
+    HASH_DIRECTORY = 'hashes'
+    # a full cache is trimmed to this fraction of its maximum size, so as the scans are spread out
+    EVICTION_RATIO = .9
+    READ_SIZE = 2**20
+
+    ##############################################
+
+    def __init__(self, path, maximum_size=2**30):
+
+        self._path = path
+        self._maximum_size = maximum_size
+        self._content_hashes = {}
+        # running size, None until the directory is scanned
+        self._size = None
+
+        os.makedirs(os.path.join(path, self.HASH_DIRECTORY), exist_ok=True)
+
+    ##############################################
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def maximum_size(self):
+        return self._maximum_size
+
+    ##############################################
+
+    @staticmethod
+    def _digest(data):
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    ##############################################
+
+    def content_hash(self, path):
+
+        """Return the hash of the content of a file.
+
+        The file is only read if its path, size or modification time changed since the last call.
+
+        """
+
+        stat = os.stat(path)
+        signature = '{}\0{}\0{}'.format(os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        content_hash = self._content_hashes.get(signature, None)
+        if content_hash is not None:
+            return content_hash
+
+        hash_path = os.path.join(self._path, self.HASH_DIRECTORY, self._digest(signature.encode('utf-8')))
+        try:
+            with open(hash_path) as hash_file:
+                content_hash = hash_file.read()
+            # the modification time records the last use
+            os.utime(hash_path)
+        except OSError:
+            content_hash = None
+        if not content_hash:
+            hasher = hashlib.blake2b(digest_size=16)
+            with open(path, 'rb') as audio_file:
+                for chunk in iter(lambda: audio_file.read(self.READ_SIZE), b''):
+                    hasher.update(chunk)
+            content_hash = hasher.hexdigest()
+            self._write_atomically(hash_path, lambda f: f.write(content_hash.encode('ascii')))
+            self._add_size(hash_path)
+
+        self._content_hashes[signature] = content_hash
+        return content_hash
+
+    ##############################################
+
+    def _entry_path(self, path, name, parameters, extension):
+
+        description = repr((self.content_hash(path), name, sorted(parameters.items())))
+        return os.path.join(self._path, self._digest(description.encode('utf-8')) + extension)
+
+    ##############################################
+
+    def _write_atomically(self, path, write):
+
+        # a concurrent reader never sees a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    ##############################################
+
+    def load(self, path, name, **parameters):
+
+        """Return the entry for the file *path*, the analysis *name* and the keyword parameters, or
+        None if the entry is missing.
+
+        An array is returned as a read-only memory map and a dictionary of arrays as a dictionary.
+
+        """
+
+        for extension in ('.npy', '.npz'):
+            entry_path = self._entry_path(path, name, parameters, extension)
+            if os.path.exists(entry_path):
+                # the modification time records the last use
+                try:
+                    os.utime(entry_path)
+                    if extension == '.npy':
+                        return np.load(entry_path, mmap_mode='r')
+                    else:
+                        with np.load(entry_path) as npz:
+                            return dict(npz)
+                except (OSError, ValueError) as exception:
+                    # entry evicted or corrupted in the meantime
+                    self._logger.warning("Cannot load {}: {}".format(entry_path, exception))
+        return None
+
+    ##############################################
+
+    def _add_size(self, path):
+
+        """Add the size of a new file to the running size and evict if the cache is full."""
+
+        if self._size is None:
+            # scan once
+            self._size = self.size
+        else:
+            try:
+                self._size += os.path.getsize(path)
+            except OSError:
+                pass
+        if self._size > self._maximum_size:
+            self.evict(int(self._maximum_size * self.EVICTION_RATIO))
+
+    ##############################################
+
+    def save(self, path, name, value, **parameters):
+
+        """Save an array or a dictionary of arrays, then evict the least recently used files if the
+        cache is full.
+
+        """
+
+        if isinstance(value, dict):
+            entry_path = self._entry_path(path, name, parameters, '.npz')
+            self._write_atomically(entry_path, lambda f: np.savez(f, **value))
+        else:
+            entry_path = self._entry_path(path, name, parameters, '.npy')
+            self._write_atomically(entry_path, lambda f: np.save(f, value))
+        self._logger.debug("Saved {} for {}".format(name, path))
+        self._add_size(entry_path)
+
+    ##############################################
+
+    def get(self, path, name, compute, **parameters):
+
+        """Return the cached entry or call *compute* and save its result."""
+
+        value = self.load(path, name, **parameters)
+        if value is None:
+            value = compute()
+            self.save(path, name, value, **parameters)
+        return value
+
+    ##############################################
+
+    def _entries(self):
+
+        entries = []
+        hash_directory = os.path.join(self._path, self.HASH_DIRECTORY)
+        for directory, extensions in ((self._path, ('.npy', '.npz')), (hash_directory, None)):
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if not entry.is_file() or entry.name.endswith('.tmp'):
+                        continue
+                    if extensions is not None and not entry.name.endswith(extensions):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    ##############################################
+
+    @property
+    def size(self):
+        """Size of the entries and the content hash files, the directory is scanned"""
+        self._size = sum(size for mtime, size, path in self._entries())
+        return self._size
+
+    ##############################################
+
+    def evict(self, maximum_size=None):
+
+        """Remove the least recently used files until the size is lower than *maximum_size*."""
+
+        if maximum_size is None:
+            maximum_size = self._maximum_size
+
+        entries = self._entries()
+        size = sum(entry[1] for entry in entries)
+        for mtime, entry_size, entry_path in sorted(entries):
+            if size <= maximum_size:
+                break
+            try:
+                os.unlink(entry_path)
+            except OSError:
+                pass
+            size -= entry_size
+        self._size = size
+
+    ##############################################
+
+    def clear(self):
+        self.evict(0)
@@ -20,12 +20,14 @@
 
 ####################################################################################################
 
+import itertools
 import logging
 # import math
 import os
 
-# import numpy as np
+import numpy as np
 
+from .Spectrogram import Spectrogram
 from .Spectrum import Spectrum
 
 ####################################################################################################
@@ -42,11 +44,13 @@ class AudioFormatMetadata:
                  number_of_channels, # int > 0
                  sampling_frequency, # e.g. 44.1kHz 48kHz 96kHz
                  bits_per_sample, # e.g. 8 16 24-bit
+                 is_float=False, # IEEE float samples
     ):
 
         self._number_of_channels = number_of_channels
         self._sampling_frequency = sampling_frequency
         self._bits_per_sample = bits_per_sample
+        self._is_float = is_float
 
     ##############################################
 
@@ -66,10 +70,18 @@ class AudioFormatMetadata:
     def bits_per_sample(self):
         return self._bits_per_sample
 
+    @property
+    def is_float(self):
+        return self._is_float
+
     @property
     def float_scale(self):
-        # N-bit signed integer range from -2**(N-1) to 2**(N-1) -1
-        return 2**(self._bits_per_sample -1)
+        if self._is_float:
+            # samples are already normalised
+            return 1
+        else:
+            # N-bit signed integer range from -2**(N-1) to 2**(N-1) -1
+            return 2**(self._bits_per_sample -1)
 
     ##############################################
 
@@ -115,51 +127,442 @@ class AudioFormatMetaclass(type):
 
 ####################################################################################################
 
+class AudioFormatWriter:
+
+    """Base class to write an audio file.
+
+    Blocks are written one at a time, thus a signal rendered by a generator is never held in
+    memory.  A block is a 1-D array which is written to all the channels or a 2-D array of shape
+    (number_of_channels, number_of_samples) like the blocks yielded by
+    :meth:`AudioFormat.iter_blocks`.  Floating point blocks are normalised samples which are scaled
+    and clipped for integer formats, integer blocks are written as is.
+
+    The channels are interleaved by writing the block directly in the transposed view of a frame
+    buffer which is reused from one block to the next.
+
+    """
+
+    _logger = _module_logger.getChild('AudioFormatWriter')
+
+    ##############################################
+
+    def __init__(self, path, metadata):
+
+        self._path = path
+        self._metadata = metadata
+        self._number_of_samples = 0
+        self._buffers = {}
+        self._closed = False
+
+    ##############################################
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def metadata(self):
+        return self._metadata
+
+    @property
+    def number_of_samples(self):
+        return self._number_of_samples
+
+    @property
+    def closed(self):
+        return self._closed
+
+    ##############################################
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    ##############################################
+
+    def _buffer(self, name, shape, dtype):
+
+        """Return a C-contiguous buffer which is only reallocated when it is too small."""
+
+        size = int(np.prod(shape))
+        buffer = self._buffers.get(name, None)
+        if buffer is None or buffer.size < size or buffer.dtype != np.dtype(dtype):
+            buffer = np.empty(size, dtype=dtype)
+            self._buffers[name] = buffer
+        return buffer[:size].reshape(shape)
+
+    ##############################################
+
+    @property
+    def _sample_dtype(self):
+        raise NotImplementedError
+
+    ##############################################
+
+    def _encode(self, block):
+
+        """Return the frames of a block as an array of shape (number_of_samples, number_of_channels)."""
+
+        number_of_channels = self._metadata.number_of_channels
+        number_of_samples = block.shape[-1]
+        frames = self._buffer('frames', (number_of_samples, number_of_channels), self._sample_dtype)
+
+        if block.dtype.kind == 'f' and not self._metadata.is_float:
+            float_scale = self._metadata.float_scale
+            work = self._buffer('work', (number_of_channels, number_of_samples), np.float64)
+            np.multiply(block, float_scale, out=work)
+            np.rint(work, out=work)
+            np.clip(work, -float_scale, float_scale - 1, out=work)
+            block = work
+        # interleave
+        np.copyto(frames.T, block, casting='unsafe')
+
+        return frames
+
+    ##############################################
+
+    def _write_frames(self, frames):
+        raise NotImplementedError
+
+    ##############################################
+
+    def write(self, block):
+
+        """Write a block of samples."""
+
+        if self._closed:
+            raise ValueError("{} is closed".format(self._path))
+
+        block = np.asarray(block)
+        number_of_channels = self._metadata.number_of_channels
+        if block.ndim not in (1, 2) or (block.ndim == 2 and block.shape[0] != number_of_channels):
+            raise ValueError("Invalid block shape {} for {} channels".format(block.shape, number_of_channels))
+
+        self._write_frames(self._encode(block))
+        self._number_of_samples += block.shape[-1]
+
+    ##############################################
+
+    def write_blocks(self, blocks):
+
+        """Write an iterable of blocks and return the number of samples written so far."""
+
+        for block in blocks:
+            self.write(block)
+        return self._number_of_samples
+
+    ##############################################
+
+    def _close(self):
+        raise NotImplementedError
+
+    def close(self):
+
+        """Finalise the file, e.g. patch the sizes in the header."""
+
+        if not self._closed:
+            self._close()
+            self._closed = True
+            self._buffers.clear()
+
+####################################################################################################
+
 class AudioFormat(metaclass=AudioFormatMetaclass):
 
     __extensions__ = None
+    # writer class for the extensions if any
+    __writer__ = None
 
     _logger = _module_logger.getChild('AudioFormat')
 
     ##############################################
 
     @classmethod
-    def open(cls, path):
+    def open(cls, path, cache=None, **kwargs):
+
+        """Open an audio file, extra keyword arguments are passed to the format class, e.g.
+        ``memory_map=True`` for WAV files or ``float_dtype=np.float32``.
+
+        *cache* is an optional :class:`Musica.Audio.AnalysisCache.AnalysisCache` used to store the
+        spectra and spectrograms.
+
+        """
 
         basename, ext = os.path.splitext(path)
         audio_format_cls = AudioFormatMetaclass.get(ext)
 
-        return audio_format_cls(path)
+        audio = audio_format_cls(path, **kwargs)
+        audio.cache = cache
+        return audio
+
+    ##############################################
+
+    @classmethod
+    def open_writer(cls, path, sampling_frequency, number_of_channels=1, bits_per_sample=16, is_float=False):
+
+        """Return a :class:`AudioFormatWriter` for the format given by the extension of *path*."""
+
+        basename, ext = os.path.splitext(path)
+        writer_cls = AudioFormatMetaclass.get(ext).__writer__
+        if writer_cls is None:
+            raise NotImplementedError("No writer for {}".format(ext))
+
+        # e.g. Resampler.sampling_frequency() returns a float, check it before the file is created
+        if sampling_frequency != int(sampling_frequency):
+            raise ValueError("Sampling frequency must be integral: {}".format(sampling_frequency))
+        sampling_frequency = int(sampling_frequency)
+
+        metadata = AudioFormatMetadata(
+            number_of_channels=number_of_channels,
+            sampling_frequency=sampling_frequency,
+            bits_per_sample=bits_per_sample,
+            is_float=is_float,
+        )
+        return writer_cls(path, metadata)
+
+    ##############################################
+
+    @classmethod
+    def write(cls, path, blocks, sampling_frequency, number_of_channels=None, bits_per_sample=16, is_float=False):
+
+        """Write an array or an iterable of blocks to a file, see :class:`AudioFormatWriter`.
+
+        By default, the number of channels is given by the first block.  Return the number of
+        samples written.
+
+        """
+
+        if isinstance(blocks, np.ndarray):
+            blocks = iter((blocks,))
+        else:
+            blocks = iter(blocks)
+
+        if number_of_channels is None:
+            # peek the first block
+            try:
+                block = np.asarray(next(blocks))
+            except StopIteration:
+                block = np.zeros(0)
+            number_of_channels = 1 if block.ndim == 1 else block.shape[0]
+            blocks = itertools.chain((block,), blocks)
+
+        with cls.open_writer(path, sampling_frequency, number_of_channels, bits_per_sample, is_float) as writer:
+            return writer.write_blocks(blocks)
 
     ##############################################
 
-    def __init__(self, metadata, channels):
+    def __init__(self, metadata, channels, number_of_samples=None, float_dtype=np.float64, path=None):
+
+        """*float_dtype* is the working precision of the normalised channels, use ``np.float32`` to
+        halve the memory footprint.
 
+        """
+
+        self._path = path
+        self._cache = None
         self._metadata = metadata
         self._channels = channels
+        self._float_dtype = np.dtype(float_dtype)
+        # cache of normalised channels
+        self._float_channels = {}
+        if number_of_samples is None:
+            number_of_samples = channels[0].size
+        self._number_of_samples = number_of_samples
 
     ##############################################
 
+    @property
+    def path(self):
+        return self._path
+
     @property
     def metadata(self):
         return self._metadata
 
+    @property
+    def cache(self):
+        return self._cache
+
+    @cache.setter
+    def cache(self, cache):
+        self._cache = cache
+
+    @property
+    def number_of_samples(self):
+        return self._number_of_samples
+
+    @property
+    def is_memory_mapped(self):
+        return False
+
+    def _get_channel(self, i):
+        return self._channels[i]
+
+    @property
+    def float_dtype(self):
+        return self._float_dtype
+
+    def _to_float(self, data):
+
+        float_scale = self._metadata.float_scale
+        if float_scale == 1:
+            return data.astype(self._float_dtype, copy=False)
+        else:
+            return np.multiply(data, 1 / float_scale, dtype=self._float_dtype)
+
     def channel(self, i, as_float=False):
 
-        data = self._channels[i]
+        """Return the channel *i*.
+
+        If *as_float* is set, return the channel normalised to [-1, 1[ using the working precision.
+        The normalised channel is computed once and cached, thus it is read-only.
+
+        """
+
         if as_float:
-            return data / self._metadata.float_scale
-        else:
+            data = self._float_channels.get(i, None)
+            if data is None:
+                data = self._to_float(self._get_channel(i))
+                data.flags.writeable = False
+                self._float_channels[i] = data
             return data
+        else:
+            return self._get_channel(i)
+
+    def clear_cache(self):
+
+        """Release the normalised channels."""
+
+        self._float_channels.clear()
+
+    ##############################################
+
+    def _read_block(self, channel, start, stop):
+
+        if channel is None:
+            # only the block is copied
+            return np.stack([data[start:stop] for data in self._channels])
+        else:
+            return self._channels[channel][start:stop]
+
+    ##############################################
+
+    def iter_blocks(self, block_size, hop=None, channel=None, as_float=False):
+
+        """Iterate over blocks of *block_size* samples spaced by *hop* samples, the default hop is
+        the block size.
+
+        Yield ``(start, block)`` tuples where *start* is the index of the first sample.  If *channel*
+        is None then the block is a 2-D array of shape (number_of_channels, block_size) else a view
+        of the channel.  The last block can be shorter.
+
+        Only the current block is loaded in memory when the file is memory mapped.
+
+        """
+
+        if hop is None:
+            hop = block_size
+        if block_size <= 0 or hop <= 0:
+            raise ValueError("Invalid block size {} or hop {}".format(block_size, hop))
+
+        number_of_samples = self.number_of_samples
+        for start in range(0, number_of_samples, hop):
+            stop = min(start + block_size, number_of_samples)
+            block = self._read_block(channel, start, stop)
+            if as_float:
+                block = self._to_float(block)
+            yield start, block
+            if stop == number_of_samples:
+                break
+
+    ##############################################
+
+    def _cached(self, name, compute, **parameters):
+
+        """Return the result of *compute* through the analysis cache if any."""
+
+        if self._cache is None or self._path is None:
+            return compute()
+        else:
+            parameters['float_dtype'] = self._float_dtype.str
+            return self._cache.get(self._path, name, compute, **parameters)
+
+    ##############################################
+
+    def _channel_list(self, channel):
+
+        if channel == 'all':
+            return list(range(self._metadata.number_of_channels))
+        elif isinstance(channel, int):
+            return None
+        else:
+            return list(channel)
+
+    ##############################################
+
+    @staticmethod
+    def _segment(data, start, stop, resampler=None):
+
+        if resampler is None:
+            return data[start:stop]
+        else:
+            return resampler.resample_segment(data, start, stop)
+
+    ##############################################
+
+    def _float_segment(self, channel, start, stop, resampler=None):
+
+        """Return the normalised segment [*start*, *stop*[ of a channel, resampled if a *resampler* is
+        given.
+
+        If the file is memory mapped, only the segment and the margins of the resampler are read and
+        converted, else the normalised channel is cached, see :meth:`channel`.
+
+        """
+
+        if not self.is_memory_mapped:
+            return self._segment(self.channel(channel, as_float=True), start, stop, resampler)
+
+        if resampler is None:
+            left_margin = right_margin = 0
+        else:
+            left_margin, right_margin = resampler.margins(start, stop, self._number_of_samples)
+        data = self._to_float(self._read_block(channel, start - left_margin, stop + right_margin))
+        return self._segment(data, left_margin, left_margin + stop - start, resampler)
 
     ##############################################
 
     def spectrum(self, channel, **kwargs):
 
+        """Compute the spectrum of a segment of a channel.
+
+        If *channel* is 'all' or a list of channels, the segments are stacked in a 2-D array and the
+        FFT of all the channels is computed in a single call, see :class:`Spectrum`.
+
+        If a *resampler* is given, see :class:`Musica.Audio.Resampling.Resampler`, the segment is
+        resampled before the FFT, e.g. decimated to search a bass fundamental.
+
+        If a *gate* is given, see :class:`Musica.Audio.ActivityGate.ActivityGate`, the FFT of a
+        silent segment is not computed and is zero.
+
+        The segment is zero padded to *fft_size*, see :meth:`Spectrum.fft_size_for`.  For a
+        *frequency_resolution*, the number of samples is rounded up to a power of two or to a fast
+        FFT size if *fast_size* is set, and the segment is zero padded if the channel is too short.  If
+        the segment is resampled, the FFT size is the resampled number of samples rounded up in the
+        same way, unless *fft_size* is given.
+
+        """
+
         sampling_frequency = self._metadata.sampling_frequency
         window = kwargs.get('window', 'hann')
+        resampler = kwargs.get('resampler', None)
+        gate = kwargs.get('gate', None)
+        fft_size = kwargs.get('fft_size', None)
 
-        data = self.channel(channel, as_float=True)
+        channels = self._channel_list(channel)
+        number_of_samples = self._number_of_samples
 
         if 'start' in kwargs:
             start = self._metadata.time_to_sample(kwargs['start'])
@@ -173,16 +576,107 @@ class AudioFormat(metaclass=AudioFormatMetaclass):
         elif 'stop' in kwargs:
             stop = self._metadata.time_to_sample(kwargs['stop']) + 1
         elif 'frequency_resolution' in kwargs:
-            number_of_samples = Spectrum.sample_for_resolution(sampling_frequency,
-                                                               kwargs['frequency_resolution'],
-                                                               kwargs.get('power_of_two', True))
+            segment_size = Spectrum.sample_for_resolution(sampling_frequency,
+                                                          kwargs['frequency_resolution'],
+                                                          kwargs.get('power_of_two', True),
+                                                          kwargs.get('fast_size', False))
+            stop = min(start + segment_size, number_of_samples)
+            if fft_size is None:
+                if resampler is None:
+                    fft_size = segment_size
+                else:
+                    # apply the size policy to the resampled length
+                    fft_size = -(-segment_size * resampler.up // resampler.down)
+                    if kwargs.get('fast_size', False):
+                        fft_size = Spectrum.next_fast_size(fft_size)
+                    elif kwargs.get('power_of_two', True):
+                        fft_size = Spectrum.next_power_of_two(fft_size)
         else:
-            stop = data.size
+            stop = number_of_samples
 
-        if stop > data.size:
+        if stop > number_of_samples:
             raise ValueError("stop is too large")
-        data = data[start:stop]
+        if channels is None:
+            data = self._float_segment(channel, start, stop, resampler)
+        else:
+            data = np.stack([self._float_segment(i, start, stop, resampler) for i in channels])
+        if resampler is not None:
+            sampling_frequency = resampler.sampling_frequency(sampling_frequency)
 
         self._logger.info("spectrum from {} to {}".format(start, stop))
 
-        return Spectrum(sampling_frequency, data, window)
+        def compute_fft():
+            if gate is None:
+                return Spectrum(sampling_frequency, data, window, fft_size=fft_size).fft
+            active = gate.is_active(data)
+            size = Spectrum.fft_size_for(data.shape[-1], fft_size)
+            fft = np.zeros(data.shape[:-1] + (size // 2 + 1,), dtype=np.complex128)
+            if np.any(active):
+                # a 0-d mask adds an axis on both sides
+                fft[active] = Spectrum(sampling_frequency, data[active], window, fft_size=fft_size).fft
+            return fft
+
+        fft = self._cached('spectrum',
+                           compute_fft,
+                           channel=channel if channels is None else tuple(channels),
+                           start=start, stop=stop, window=window,
+                           resampling=None if resampler is None else resampler.key,
+                           gate=None if gate is None else gate.threshold,
+                           fft_size=fft_size)
+
+        return Spectrum(sampling_frequency, data, window, fft=fft, fft_size=fft_size)
+
+    ##############################################
+
+    def spectrogram(self, channel, number_of_samples, hop=None, window='hann', **kwargs):
+
+        """Compute the spectrogram of a channel using frames of *number_of_samples* spaced by *hop*.
+
+        The analysed segment can be restricted using the *start*, *start_sample*, *stop* and
+        *stop_sample* parameters.  If a *resampler* is given, the segment is resampled before the
+        framing, thus *number_of_samples* and *hop* are given at the resampled frequency.  If a *gate*
+        is given, the silent frames are not transformed.  The frames are zero padded to *fft_size*,
+        e.g. 'fast' for the next 2-3-5 smooth size, see :meth:`Spectrum.fft_size_for`.
+
+        """
+
+        if 'start' in kwargs:
+            start = self._metadata.time_to_sample(kwargs['start'])
+        else:
+            start = kwargs.get('start_sample', 0)
+
+        if 'stop_sample' in kwargs:
+            stop = kwargs['stop_sample'] + 1
+        elif 'stop' in kwargs:
+            stop = self._metadata.time_to_sample(kwargs['stop']) + 1
+        else:
+            stop = self._number_of_samples
+
+        if stop > self._number_of_samples:
+            raise ValueError("stop is too large")
+        resampler = kwargs.get('resampler', None)
+        gate = kwargs.get('gate', None)
+        fft_size = kwargs.get('fft_size', None)
+        data = self._float_segment(channel, start, stop, resampler)
+
+        self._logger.info("spectrogram from {} to {}".format(start, stop))
+
+        sampling_frequency = self._metadata.sampling_frequency
+        if resampler is not None:
+            sampling_frequency = resampler.sampling_frequency(sampling_frequency)
+        if hop is None:
+            hop = number_of_samples // 2
+        def compute_fft():
+            return Spectrogram(sampling_frequency, data, number_of_samples, hop, window,
+                               gate=gate, fft_size=fft_size).fft
+
+        fft = self._cached('spectrogram',
+                           compute_fft,
+                           channel=channel, start=start, stop=stop,
+                           number_of_samples=number_of_samples, hop=hop, window=window,
+                           resampling=None if resampler is None else resampler.key,
+                           gate=None if gate is None else gate.threshold,
+                           fft_size=fft_size)
+
+        return Spectrogram(sampling_frequency, data, number_of_samples, hop, window, fft=fft, gate=gate,
+                           fft_size=fft_size)
@@ -0,0 +1,187 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module implements the chromagram, also called pitch class profile.
+
+The energy of the spectrum bins is folded into the steps of an equal temperament, e.g. the 12
+pitch classes of ET12.  The bin to pitch class mapping is computed once per frequency axis.  Since
+the frequency axis is sorted, the bins of a pitch class form runs, thus a batch of frames is folded
+by summing the runs with :func:`numpy.add.reduceat` then accumulating the runs into the pitch classes
+using :func:`numpy.add.at`.
+
+"""
+
+####################################################################################################
+
+__all__ = [
+    'Chromagram',
+    'pitch_class_mapping',
+    ]
+
+####################################################################################################
+
+import functools
+
+import numpy as np
+
+from ..Theory.Temperament import ET12
+from .Spectrum import CACHE_SIZE, frequency_axis
+
+####################################################################################################
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def pitch_class_mapping(fft_size, sampling_frequency, temperament, minimum_frequency, maximum_frequency):
+
+    """Return the pitch class of each bin of a real FFT and the runs of consecutive bins having the
+    same pitch class.
+
+    Bins out of the frequency range have the pitch class -1.  The runs are given by an array of
+    bounds, the run i covers the bins ``bounds[i]:bounds[i+1]``, and the array of their pitch
+    classes.
+
+    """
+
+    frequencies = frequency_axis(fft_size, sampling_frequency)
+
+    pitch_classes = np.full(frequencies.size, -1, dtype=np.int16)
+    in_range = (frequencies >= minimum_frequency) & (frequencies <= maximum_frequency) & (frequencies > 0)
+    bins = np.flatnonzero(in_range)
+    pitch_classes[bins] = temperament.nearest_steps(frequencies[bins])[0]
+
+    # the bins in the range are contiguous
+    if bins.size:
+        starts = bins[np.flatnonzero(np.diff(pitch_classes[bins], prepend=-1))]
+        run_bounds = np.append(starts, bins[-1] + 1)
+    else:
+        run_bounds = np.zeros(1, dtype=int)
+    run_pitch_classes = pitch_classes[run_bounds[:-1]]
+
+    for array in (pitch_classes, run_bounds, run_pitch_classes):
+        array.flags.writeable = False
+
+    return pitch_classes, run_bounds, run_pitch_classes
+
+####################################################################################################
+
+class Chromagram:
+
+    """Class to fold spectral energy into the pitch classes of a temperament.
+
+    Parameters
+    ----------
+    temperament : :class:`Musica.Theory.Temperament.EqualTemperament`
+    minimum_frequency, maximum_frequency : float
+        Frequency range of the bins taken into account
+    normalisation : None, 'sum' or 'max'
+
+    """
+
+    ##############################################
+
+    def __init__(self,
+                 temperament=ET12,
+                 minimum_frequency=27.5, # A0
+                 maximum_frequency=5000,
+                 normalisation='max',
+    ):
+
+        if normalisation not in (None, 'sum', 'max'):
+            raise ValueError("Invalid normalisation {}".format(normalisation))
+
+        self._temperament = temperament
+        self._minimum_frequency = minimum_frequency
+        self._maximum_frequency = maximum_frequency
+        self._normalisation = normalisation
+
+    ##############################################
+
+    @property
+    def temperament(self):
+        return self._temperament
+
+    @property
+    def number_of_steps(self):
+        return self._temperament.number_of_steps
+
+    ##############################################
+
+    def _normalise(self, chroma):
+
+        if self._normalisation is None:
+            return chroma
+        elif self._normalisation == 'sum':
+            norm = chroma.sum(axis=-1, keepdims=True)
+        else:
+            norm = chroma.max(axis=-1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(norm > 0, chroma / norm, 0)
+
+    ##############################################
+
+    def fold(self, power, fft_size, sampling_frequency):
+
+        """Fold a power spectrum computed along the last axis by a real FFT of size *fft_size*."""
+
+        pitch_classes, run_bounds, run_pitch_classes = pitch_class_mapping(fft_size,
+                                                                           sampling_frequency,
+                                                                           self._temperament,
+                                                                           self._minimum_frequency,
+                                                                           self._maximum_frequency)
+        chroma = np.zeros(power.shape[:-1] + (self.number_of_steps,))
+        if run_pitch_classes.size:
+            runs = np.add.reduceat(power[..., :run_bounds[-1]], run_bounds[:-1], axis=-1)
+            # move the run axis first so as to accumulate on the first axis
+            np.add.at(np.moveaxis(chroma, -1, 0), run_pitch_classes, np.moveaxis(runs, -1, 0))
+        return self._normalise(chroma)
+
+    ##############################################
+
+    def from_spectrum(self, spectrum):
+
+        """Return the chroma vector of a :class:`Spectrum`, or an array for a multi-channel
+        spectrum.
+
+        """
+
+        return self.fold(spectrum.power, spectrum.fft_size, spectrum.sampling_frequency)
+
+    ##############################################
+
+    def from_spectrogram(self, spectrogram):
+
+        """Return the chroma vectors of the frames of a :class:`Spectrogram`."""
+
+        return self.fold(spectrogram.power, spectrogram.fft_size, spectrogram.sampling_frequency)
+
+    ##############################################
+
+    def from_constant_q(self, constant_q_transform, magnitude):
+
+        """Return the chroma vectors from the magnitude of a Constant-Q Transform."""
+
+        if constant_q_transform.temperament is not self._temperament:
+            raise ValueError("Temperaments must be the same")
+
+        pitch_classes = np.round(constant_q_transform.step_numbers).astype(int) % self.number_of_steps
+        chroma = np.zeros(magnitude.shape[:-1] + (self.number_of_steps,))
+        # move the bin axis first so as to accumulate on the first axis
+        np.add.at(np.moveaxis(chroma, -1, 0), pitch_classes, np.moveaxis(magnitude**2, -1, 0))
+
+        return self._normalise(chroma)
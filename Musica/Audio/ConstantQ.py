@@ -0,0 +1,280 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module implements the Constant-Q Transform.
+
+The bins are aligned on the steps of an equal temperament, the bin k has the frequency
+f_min * 2**(k / bins_per_octave) and the ratio of the frequency to the bandwidth is constant.
+
+The transform is computed using the efficient algorithm of Brown and Puckette: the temporal kernel
+of each bin is transformed once to the frequency domain, its small values are dropped and the
+transform of a frame is the product of its FFT with this sparse spectral kernel.
+
+The sparse kernel is stored by rows as (columns, values) arrays, thus the product is a gather
+followed by a reduction per row.  The gathered array has a size of number of frames × number of
+values, thus the frames are processed by batches of :attr:`ConstantQTransform.BATCH_SIZE`.
+
+References
+
+Calculation of a constant Q spectral transform.
+    Judith C. Brown
+    Journal of the Acoustical Society of America, 89(1), 1991
+
+An efficient algorithm for the calculation of a constant Q transform.
+    Judith C. Brown, Miller S. Puckette
+    Journal of the Acoustical Society of America, 92(5), 1992
+
+"""
+
+####################################################################################################
+
+__all__ = [
+    'ConstantQTransform',
+    'spectral_kernel',
+    ]
+
+####################################################################################################
+
+import functools
+import math
+
+import numpy as np
+
+from ..Theory.Temperament import ET12
+from .Spectrogram import Spectrogram
+from .Spectrum import CACHE_SIZE, Spectrum
+
+####################################################################################################
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def spectral_kernel(sampling_frequency,
+                    minimum_frequency,
+                    number_of_bins,
+                    bins_per_octave,
+                    threshold=.0054,
+                    window='hann',
+):
+
+    """Return the sparse spectral kernel of a Constant-Q Transform.
+
+    Return the FFT size, the frequencies of the bins, the row start indexes, the column indexes and
+    the values of the kernel.  The kernel applies on the output of :func:`numpy.fft.rfft` and is
+    cached.
+
+    """
+
+    quality_factor = 1 / (2**(1 / bins_per_octave) - 1)
+    frequencies = minimum_frequency * 2**(np.arange(number_of_bins) / bins_per_octave)
+    if frequencies[-1] >= sampling_frequency / 2:
+        raise ValueError("The highest bin is above the Nyquist frequency")
+
+    window_sizes = np.ceil(quality_factor * sampling_frequency / frequencies).astype(int)
+    fft_size = Spectrum.next_power_of_two(window_sizes[0])
+
+    columns = []
+    values = []
+    row_starts = np.zeros(number_of_bins, dtype=int)
+    number_of_values = 0
+    temporal_kernel = np.zeros(fft_size, dtype=complex)
+    for k in range(number_of_bins):
+        window_size = window_sizes[k]
+        # centered temporal kernel
+        start = (fft_size - window_size) // 2
+        n = np.arange(window_size)
+        temporal_kernel[...] = 0
+        temporal_kernel[start:start + window_size] = (
+            Spectrum.__window_function__[window](window_size) / window_size
+            * np.exp(2j * np.pi * quality_factor * n / window_size)
+        )
+        # the kernel is analytic, thus its energy is on the positive frequencies
+        kernel = np.conj(np.fft.fft(temporal_kernel)[:fft_size // 2 + 1]) / fft_size
+        magnitude = np.abs(kernel)
+        row_columns = np.flatnonzero(magnitude >= threshold * magnitude.max())
+        row_starts[k] = number_of_values
+        number_of_values += row_columns.size
+        columns.append(row_columns)
+        values.append(kernel[row_columns])
+
+    columns = np.concatenate(columns)
+    values = np.concatenate(values)
+    for array in (frequencies, row_starts, columns, values):
+        array.flags.writeable = False
+
+    return fft_size, frequencies, row_starts, columns, values
+
+####################################################################################################
+
+class ConstantQTransform:
+
+    """Class to compute a Constant-Q Transform whose bins are aligned on the steps of a temperament.
+
+    Parameters
+    ----------
+    sampling_frequency : float
+    lowest_pitch, highest_pitch : :class:`Musica.Theory.Pitch.Pitch` or float
+        Pitch range, a frequency is rounded to the nearest step of the temperament
+    bins_per_step : int
+        Number of bins per step, e.g. per semitone
+    temperament : :class:`Musica.Theory.Temperament.EqualTemperament`
+
+    """
+
+    # number of frames processed at once, it bounds the size of the temporary arrays
+    BATCH_SIZE = 16
+
+    ##############################################
+
+    def __init__(self,
+                 sampling_frequency,
+                 lowest_pitch,
+                 highest_pitch,
+                 bins_per_step=1,
+                 temperament=ET12,
+                 threshold=.0054,
+                 window='hann',
+    ):
+
+        self._sampling_frequency = sampling_frequency
+        self._temperament = temperament
+        self._bins_per_step = bins_per_step
+
+        # steps from C0
+        self._lowest_step = self._to_step(lowest_pitch)
+        highest_step = self._to_step(highest_pitch)
+        if highest_step < self._lowest_step:
+            raise ValueError("Invalid pitch range")
+        number_of_bins = (highest_step - self._lowest_step) * bins_per_step + 1
+
+        minimum_frequency = temperament.fundamental * 2**(self._lowest_step / temperament.number_of_steps)
+        bins_per_octave = temperament.number_of_steps * bins_per_step
+
+        (self._fft_size,
+         self._frequencies,
+         self._row_starts,
+         self._columns,
+         self._values) = spectral_kernel(sampling_frequency,
+                                         minimum_frequency,
+                                         number_of_bins,
+                                         bins_per_octave,
+                                         threshold,
+                                         window)
+
+    ##############################################
+
+    def _to_step(self, pitch):
+
+        if hasattr(pitch, 'frequency'):
+            frequency = pitch.frequency
+        else:
+            frequency = float(pitch)
+        return int(round(self._temperament.number_of_steps * math.log2(frequency / self._temperament.fundamental)))
+
+    ##############################################
+
+    @property
+    def sampling_frequency(self):
+        return self._sampling_frequency
+
+    @property
+    def temperament(self):
+        return self._temperament
+
+    @property
+    def bins_per_step(self):
+        return self._bins_per_step
+
+    @property
+    def number_of_bins(self):
+        return self._frequencies.size
+
+    @property
+    def fft_size(self):
+        """Size of the frames"""
+        return self._fft_size
+
+    @property
+    def frequencies(self):
+        return self._frequencies
+
+    @property
+    def step_numbers(self):
+        """Number of steps from C0 of each bin, fractional if there are several bins per step"""
+        return self._lowest_step + np.arange(self.number_of_bins) / self._bins_per_step
+
+    @property
+    def number_of_values(self):
+        """Number of non-zero values of the sparse kernel"""
+        return self._values.size
+
+    ##############################################
+
+    def transform_fft(self, fft):
+
+        """Apply the kernel on the output of :func:`numpy.fft.rfft` computed along the last axis."""
+
+        fft = np.asarray(fft)
+        ffts = fft.reshape(-1, fft.shape[-1])
+        output = np.empty((ffts.shape[0], self.number_of_bins), dtype=np.result_type(fft, self._values))
+        for start in range(0, ffts.shape[0], self.BATCH_SIZE):
+            stop = start + self.BATCH_SIZE
+            products = ffts[start:stop, self._columns].astype(output.dtype, copy=False)
+            products *= self._values
+            output[start:stop] = np.add.reduceat(products, self._row_starts, axis=-1)
+        return output.reshape(fft.shape[:-1] + (self.number_of_bins,))
+
+    ##############################################
+
+    def transform(self, frames):
+
+        """Return the complex Constant-Q Transform of a frame or an array of frames of size
+        :attr:`fft_size`.
+
+        """
+
+        if frames.shape[-1] != self._fft_size:
+            raise ValueError("Frame size must be {}".format(self._fft_size))
+
+        return self.transform_fft(np.fft.rfft(frames, axis=-1))
+
+    ##############################################
+
+    def transform_signal(self, values, hop, gate=None):
+
+        """Return the times of the frame centers and the magnitude of the Constant-Q Transform of
+        the frames spaced by *hop* samples.
+
+        If a *gate* is given, see :class:`Musica.Audio.ActivityGate.ActivityGate`, the magnitude of
+        the silent frames is zero.
+
+        """
+
+        frames = Spectrogram.frame(values, self._fft_size, hop)
+        times = (np.arange(frames.shape[0]) * hop + self._fft_size / 2) / self._sampling_frequency
+        if gate is None:
+            indexes = np.arange(frames.shape[0])
+        else:
+            indexes = np.flatnonzero(gate.active_frames(values, self._fft_size, hop))
+
+        # frames is a view on values, thus the FFT is computed batch by batch as well
+        magnitude = np.zeros((frames.shape[0], self.number_of_bins))
+        for start in range(0, indexes.size, self.BATCH_SIZE):
+            batch = indexes[start:start + self.BATCH_SIZE]
+            magnitude[batch] = np.abs(self.transform(frames[batch]))
+        return times, magnitude
@@ -0,0 +1,260 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module implements a batch pitch detection over a collection of audio files.
+
+Files are processed in parallel by a pool of processes and the results are yielded as soon as they
+are available, see the *musica-find-pitch* script.
+
+"""
+
+####################################################################################################
+
+__all__ = [
+    'find_files',
+    'find_pitch',
+    'find_pitches',
+    'nearest_pitch',
+    ]
+
+####################################################################################################
+
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import logging
+import os
+
+import numpy as np
+
+from ..Logging.Logging import log_to_stderr
+from ..Theory.Pitch import Pitch
+from .AnalysisCache import AnalysisCache
+from .AudioFormat import AudioFormat, AudioFormatMetaclass
+from .PitchDetection import PitchDetector
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+# caches of the process by directory, so as to keep their running size
+_caches = {}
+
+####################################################################################################
+
+def find_files(paths):
+
+    """Yield the audio files given by a list of files, directories and glob patterns.
+
+    Directories are walked recursively and only files having a registered extension are yielded.  A
+    path which doesn't exist and isn't a glob pattern is yielded as is, so as it is reported as an
+    error.
+
+    """
+
+    extensions = ['.' + extension for extension in AudioFormatMetaclass.__extensions__]
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, directories, filenames in os.walk(path):
+                directories.sort()
+                for filename in sorted(filenames):
+                    if os.path.splitext(filename)[1].lower() in extensions:
+                        yield os.path.join(root, filename)
+        elif os.path.exists(path) or not glob.has_magic(path):
+            yield path
+        else:
+            paths = sorted(glob.glob(path, recursive=True))
+            if not paths:
+                _module_logger.warning("{} doesn't match any file".format(path))
+            yield from paths
+
+####################################################################################################
+
+def nearest_pitch(frequency):
+
+    """Return the nearest pitch of a frequency and the deviation in cents.
+
+    To convert an array of frequencies, use :meth:`EqualTemperament.nearest_steps` which doesn't
+    build :class:`Pitch` instances.
+
+    """
+
+    step_number, octave, midi, cents = Pitch.__temperament__.nearest_steps(frequency)
+    return Pitch(midi=int(midi)), float(cents)
+
+####################################################################################################
+
+def _hps_frequency(audio, channel, start_sample, number_of_samples, number_of_products, refine, hop):
+
+    spectrum = audio.spectrum(channel, start_sample=start_sample, number_of_samples=number_of_samples)
+    frequencies, hfs = spectrum.hfs(number_of_products)
+    # skip DC
+    i_max = np.argmax(hfs[1:]) + 1
+    # ratio of the peak to the sum of the harmonic product spectrum
+    total = hfs[1:].sum()
+    if not total > 0:
+        return 0., 0.
+    confidence = float(hfs[i_max] / total)
+    if refine is None:
+        return float(frequencies[i_max]), confidence
+
+    # the HPS maximum can be a bin away from the magnitude peak
+    magnitude = spectrum.magnitude
+    i_max += np.argmax(magnitude[i_max-1:i_max+2]) - 1
+    if refine == 'quadratic':
+        frequency = spectrum.refine_peak(i_max)[0]
+    elif refine == 'phase-vocoder':
+        next_spectrum = audio.spectrum(channel,
+                                       start_sample=start_sample + hop,
+                                       number_of_samples=number_of_samples)
+        frequency = spectrum.instantaneous_frequency(next_spectrum, hop, i_max)
+    else:
+        raise ValueError("Invalid refine method {}".format(refine))
+    return float(frequency), confidence
+
+####################################################################################################
+
+def _channel_frequencies(path, number_of_samples, number_of_products, start, refine, method):
+
+    """Return an array of shape (number_of_channels, 2) of the frequencies and the confidences."""
+
+    audio = AudioFormat.open(path)
+    start_sample = audio.metadata.time_to_sample(start)
+    hop = number_of_samples // 4
+    if method == 'hps' and refine == 'phase-vocoder':
+        available_samples = audio.number_of_samples - start_sample - hop
+    else:
+        available_samples = audio.number_of_samples - start_sample
+    number_of_samples = min(number_of_samples, available_samples)
+    if method != 'hps':
+        detector = PitchDetector.create(method, audio.metadata.sampling_frequency)
+    results = []
+    for channel in range(audio.metadata.number_of_channels):
+        if method == 'hps':
+            frequency, confidence = _hps_frequency(audio, channel, start_sample, number_of_samples,
+                                                   number_of_products, refine, hop)
+        else:
+            data = audio.channel(channel, as_float=True)
+            frequency, confidence = detector.detect(data[start_sample:start_sample + number_of_samples])
+        results.append((float(frequency), float(confidence)))
+
+    return np.array(results)
+
+####################################################################################################
+
+def _get_cache(path):
+
+    """Return the :class:`AnalysisCache` of the process for the directory *path*."""
+
+    key = os.path.realpath(path)
+    cache = _caches.get(key, None)
+    if cache is None:
+        cache = _caches[key] = AnalysisCache(path)
+    return cache
+
+####################################################################################################
+
+def find_pitch(path,
+               number_of_samples=2**12,
+               number_of_products=5,
+               start=0,
+               refine='phase-vocoder',
+               method='hps',
+               cache=None,
+               minimum_confidence=.5,
+):
+
+    """Find the pitch of each channel of an audio file.
+
+    *method* is the name of a pitch detector, see :class:`Musica.Audio.PitchDetection.PitchDetector`.
+
+    For the Harmonic Product Spectrum, the bin found by the HPS is refined using *refine*:
+    'quadratic' for a parabolic interpolation of the log magnitude, 'phase-vocoder' for the
+    instantaneous frequency computed from a second frame shifted by a quarter of the frame size, or
+    None.  Thus a small FFT gives an accurate frequency.
+
+    *cache* is an optional :class:`Musica.Audio.AnalysisCache.AnalysisCache` or a cache directory,
+    the file is not even opened on a cache hit.  The cache of a directory is created once per
+    process.
+
+    Return a list of dictionaries with the keys: file, channel, frequency, pitch, cents and
+    confidence.  The confidence ranges from 0 to 1, for the HPS it is the ratio of the peak to the
+    sum of the harmonic product spectrum.  For a silent or unvoiced channel, i.e. the frequency is
+    not positive or the confidence is lower than *minimum_confidence*, the frequency, pitch and
+    cents are None.  If the file cannot be processed, return a single dictionary with the keys file
+    and error.
+
+    """
+
+    try:
+        if not os.path.exists(path):
+            raise FileNotFoundError("No such file")
+        parameters = dict(
+            number_of_samples=number_of_samples,
+            number_of_products=number_of_products,
+            start=start,
+            refine=refine,
+            method=method,
+        )
+        compute = lambda: _channel_frequencies(path, **parameters)
+        if cache is None:
+            results = compute()
+        else:
+            if isinstance(cache, str):
+                cache = _get_cache(cache)
+            results = cache.get(path, 'pitch_confidence', compute, **parameters)
+        frequencies, confidences = np.array(results).T
+        voiced = (frequencies > 0) & (confidences >= minimum_confidence)
+        temperament = Pitch.__temperament__
+        step_numbers, octaves, midi, cents = temperament.nearest_steps(frequencies[voiced])
+        names = iter(zip(temperament.pitch_names(step_numbers, octaves), cents))
+        results = []
+        for channel, (frequency, confidence) in enumerate(zip(frequencies, confidences)):
+            result = dict(file=path, channel=channel, frequency=None, pitch=None, cents=None)
+            if voiced[channel]:
+                name, cent = next(names)
+                result.update(frequency=float(frequency), pitch=str(name), cents=float(cent))
+            result['confidence'] = float(confidence)
+            results.append(result)
+        return results
+    except Exception as exception:
+        _module_logger.error("{}: {}".format(path, exception))
+        return [dict(file=path, error=str(exception))]
+
+####################################################################################################
+
+def _find_pitch(kwargs):
+    return find_pitch(**kwargs)
+
+def find_pitches(paths, max_workers=None, chunksize=16, **kwargs):
+
+    """Find the pitch of a collection of files using a process pool.
+
+    Yield the results of :func:`find_pitch` file per file in the order of *paths*.  Extra keyword
+    arguments are passed to :func:`find_pitch`.
+
+    The workers log on stderr, since a worker started by the spawn or forkserver method sets up the
+    logging again on stdout where the results are usually written.
+
+    """
+
+    tasks = (dict(path=path, **kwargs) for path in paths)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=log_to_stderr) as executor:
+        yield from executor.map(_find_pitch, tasks, chunksize=chunksize)
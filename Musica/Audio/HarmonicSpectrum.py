@@ -0,0 +1,139 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module implements the Harmonic Product Spectrum and the Harmonic Sum Spectrum.
+
+The functions work on the last axis, thus a whole spectrogram is processed at once.
+
+The spectrum decimated by a factor i is computed either by picking one bin over i, or by rebinning,
+i.e. averaging the i bins centered on the bin i*k.  For an even factor, the kernel has i+1 taps with
+half weight on the two end taps, so as it is centered too.  Since the magnitude spectrum of a real
+signal is symmetric around the bin 0 and the Nyquist bin, the spectrum is padded by reflection.
+
+The product is accumulated in the log domain so as to avoid an underflow.
+
+References
+
+Noll, M. (1969).
+    Pitch determination of human speech by the harmonic product spectrum, the harmonic sum
+    spectrum, and a maximum likelihood estimate. In Proceedings of the Symposium on Computer
+    Processing ing Communications, pp. 779-797. Polytechnic Institute of Brooklyn.
+
+"""
+
+####################################################################################################
+
+__all__ = [
+    'decimate_spectrum',
+    'fundamental_frequency',
+    'harmonic_product_spectrum',
+    'harmonic_sum_spectrum',
+    ]
+
+####################################################################################################
+
+import math
+
+import numpy as np
+
+####################################################################################################
+
+def decimate_spectrum(spectrum, factor, size, rebin=True):
+
+    """Return the first *size* bins of the spectrum decimated by *factor* along the last axis."""
+
+    if not rebin or factor == 1:
+        return spectrum[..., ::factor][..., :size]
+
+    # an even kernel has one more tap so as to be centered
+    even = int(factor % 2 == 0)
+    number_of_bins = spectrum.shape[-1]
+    left = factor // 2
+    length = size * factor + even
+    right = max(0, length - left - number_of_bins)
+    pad_width = [(0, 0)] * (spectrum.ndim - 1) + [(left, right)]
+    padded = np.pad(spectrum, pad_width, mode='reflect')
+    padded = padded[..., :length]
+
+    blocks = padded[..., :size * factor].reshape(padded.shape[:-1] + (size, factor))
+    if not even:
+        return blocks.mean(axis=-1)
+    # add the first bin of the next block and give half weight to the end taps
+    decimated = blocks.sum(axis=-1) + .5 * (padded[..., factor::factor] - padded[..., :-1:factor])
+    return decimated / factor
+
+####################################################################################################
+
+def _harmonic_size(number_of_bins, number_of_products):
+    return int(math.ceil(number_of_bins / number_of_products))
+
+####################################################################################################
+
+def harmonic_product_spectrum(magnitude, number_of_products, rebin=True):
+
+    """Return the logarithm of the Harmonic Product Spectrum computed along the last axis."""
+
+    size = _harmonic_size(magnitude.shape[-1], number_of_products)
+    tiny = np.finfo(magnitude.dtype).tiny if magnitude.dtype.kind == 'f' else np.finfo(float).tiny
+
+    hps = np.log(np.maximum(magnitude[..., :size], tiny))
+    for i in range(2, number_of_products + 1):
+        decimated = decimate_spectrum(magnitude, i, size, rebin)
+        hps += np.log(np.maximum(decimated, tiny))
+
+    return hps
+
+####################################################################################################
+
+def harmonic_sum_spectrum(magnitude, number_of_products, rebin=True):
+
+    """Return the Harmonic Sum Spectrum computed along the last axis."""
+
+    size = _harmonic_size(magnitude.shape[-1], number_of_products)
+
+    hss = np.array(magnitude[..., :size], dtype=float)
+    for i in range(2, number_of_products + 1):
+        hss += decimate_spectrum(magnitude, i, size, rebin)
+
+    return hss
+
+####################################################################################################
+
+def fundamental_frequency(frequencies, harmonic_spectrum, minimum_frequency=None, maximum_frequency=None):
+
+    """Return the frequencies of the maximum of the harmonic spectrum along the last axis.
+
+    The bin 0 is excluded from the search.
+
+    """
+
+    frequencies = frequencies[:harmonic_spectrum.shape[-1]]
+
+    lower_bin = 1
+    if minimum_frequency is not None:
+        lower_bin = max(lower_bin, int(np.searchsorted(frequencies, minimum_frequency)))
+    upper_bin = frequencies.size
+    if maximum_frequency is not None:
+        upper_bin = int(np.searchsorted(frequencies, maximum_frequency, side='right'))
+    if lower_bin >= upper_bin:
+        raise ValueError("Empty frequency range")
+
+    i_max = np.argmax(harmonic_spectrum[..., lower_bin:upper_bin], axis=-1) + lower_bin
+    return frequencies[i_max]
@@ -0,0 +1,315 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+
+"""This module implements an onset detector based on the spectral flux.
+
+The novelty of a frame is the sum of the positive differences of the log-compressed magnitude
+between consecutive frames.  An onset is a local maximum of the novelty which exceeds an adaptive
+threshold computed as an offset plus a multiple of the median of the previous novelty values.
+
+The threshold only depends on the past, thus the detector is streaming: samples can be fed block per
+block and an onset is reported as soon as the next frame is available.  Feeding a whole signal at
+once processes all the frames in a single vectorised pass.
+
+"""
+
+####################################################################################################
+
+__all__ = [
+    'OnsetDetector',
+    'segment_pitches',
+    'spectral_flux',
+    ]
+
+####################################################################################################
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .Spectrogram import Spectrogram
+from .Spectrum import window_vector
+
+####################################################################################################
+
+def spectral_flux(magnitude, compression=100, previous=None):
+
+    """Return the spectral flux of the frames of a magnitude array of shape (number_of_frames,
+    number_of_bins).
+
+    The magnitude is compressed by :math:`\\log(1 + \\gamma |X|)`.  *previous* is the compressed
+    magnitude of the frame preceding the first one, if it is None the flux of the first frame is
+    zero.  Return the flux and the compressed magnitude of the last frame.
+
+    """
+
+    compressed = np.log1p(compression * magnitude)
+    if previous is None:
+        previous = compressed[0]
+    differences = np.diff(compressed, axis=0, prepend=previous[np.newaxis,:])
+    np.maximum(differences, 0, out=differences)
+
+    return differences.sum(axis=-1), compressed[-1]
+
+####################################################################################################
+
+class OnsetDetector:
+
+    """Class to detect the onsets of a stream of samples.
+
+    Parameters
+    ----------
+    sampling_frequency : float
+    number_of_samples : int
+        Frame size
+    hop : int
+        Number of samples between two frames
+    compression : float
+        Factor of the log compression of the magnitude
+    median_window : float
+        Duration in s of the past novelty used by the threshold
+    offset, multiplier : float
+        The threshold is offset + multiplier * median, the novelty is normalised by the number of
+        bins
+    minimum_interval : float
+        Minimum time in s between two onsets
+
+    The onsets are sample indexes at the center of the frames.
+
+    """
+
+    ##############################################
+
+    def __init__(self,
+                 sampling_frequency,
+                 number_of_samples=2048,
+                 hop=512,
+                 window='hann',
+                 compression=100,
+                 median_window=.1,
+                 offset=.05,
+                 multiplier=1.5,
+                 minimum_interval=.05,
+    ):
+
+        if not 0 < hop <= number_of_samples:
+            raise ValueError("Invalid hop {}".format(hop))
+
+        self._sampling_frequency = sampling_frequency
+        self._number_of_samples = number_of_samples
+        self._hop = hop
+        self._window = window
+        self._compression = compression
+        self._median_window = max(1, int(round(median_window * sampling_frequency / hop)))
+        self._offset = offset
+        self._multiplier = multiplier
+        self._minimum_interval = int(round(minimum_interval * sampling_frequency))
+
+        self._window_vector = window_vector(window, number_of_samples)
+        self.reset()
+
+    ##############################################
+
+    @property
+    def sampling_frequency(self):
+        return self._sampling_frequency
+
+    @property
+    def number_of_samples(self):
+        return self._number_of_samples
+
+    @property
+    def hop(self):
+        return self._hop
+
+    ##############################################
+
+    def reset(self):
+
+        """Reset the state of the detector for a new stream."""
+
+        # samples which don't fill a frame yet
+        self._pending = np.zeros(0)
+        # the stream starts after a silence
+        self._previous_magnitude = np.zeros(self._number_of_samples // 2 + 1)
+        self._number_of_frames = 0
+        # the median window followed by the last frame whose successor is not known, the novelty
+        # before the first frame is zero
+        self._history = np.zeros(self._median_window + 1)
+        self._last_onset = None
+
+    ##############################################
+
+    def _frame_to_sample(self, frame_index):
+        return frame_index * self._hop + self._number_of_samples // 2
+
+    ##############################################
+
+    def _pick(self, novelty):
+
+        """Return the onsets of the frames whose successor is now known."""
+
+        median_window = self._median_window
+        history_size = self._history.size
+        values = np.concatenate((self._history, novelty))
+        self._history = values[-history_size:]
+
+        # candidates are at median_window, ..., median_window + novelty.size - 1
+        number_of_candidates = novelty.size
+        candidates = values[median_window:median_window + number_of_candidates]
+        previous_values = values[median_window - 1:median_window - 1 + number_of_candidates]
+        next_values = values[median_window + 1:median_window + 1 + number_of_candidates]
+        medians = np.median(sliding_window_view(values, median_window)[:number_of_candidates], axis=-1)
+        threshold = self._offset + self._multiplier * medians
+
+        peaks = np.flatnonzero((candidates > threshold) & (candidates >= previous_values) & (candidates > next_values))
+        # the first candidate is the frame preceding the new ones
+        first_frame = self._number_of_frames - 1
+        self._number_of_frames += novelty.size
+        onsets = self._frame_to_sample(first_frame + peaks)
+
+        # enforce the minimum interval, there are only a few peaks
+        kept = []
+        for onset in onsets:
+            if self._last_onset is None or onset - self._last_onset >= self._minimum_interval:
+                kept.append(onset)
+                self._last_onset = onset
+
+        return np.array(kept, dtype=int)
+
+    ##############################################
+
+    def feed(self, samples):
+
+        """Feed a block of samples of any size and return the array of the onsets detected so far.
+
+        An onset is reported one frame after the frame where it occurs.
+
+        """
+
+        samples = np.asarray(samples, dtype=np.float64)
+        if self._pending.size:
+            samples = np.concatenate((self._pending, samples))
+        if samples.size < self._number_of_samples:
+            self._pending = samples
+            return np.zeros(0, dtype=int)
+
+        frames = Spectrogram.frame(samples, self._number_of_samples, self._hop)
+        number_of_frames = frames.shape[0]
+        self._pending = samples[number_of_frames * self._hop:].copy()
+
+        magnitude = np.abs(np.fft.rfft(frames * self._window_vector, axis=-1))
+        return self._pick(self._novelty(magnitude))
+
+    ##############################################
+
+    def _novelty(self, magnitude):
+
+        novelty, self._previous_magnitude = spectral_flux(magnitude, self._compression, self._previous_magnitude)
+        novelty /= magnitude.shape[-1]
+        return novelty
+
+    ##############################################
+
+    def flush(self):
+
+        """Return the onset of the last frame if any, the next frame is assumed to be steady."""
+
+        return self._pick(np.zeros(1))
+
+    ##############################################
+
+    def detect(self, values):
+
+        """Return the onsets of a signal in a single pass."""
+
+        self.reset()
+        onsets = np.concatenate((self.feed(values), self.flush()))
+        self.reset()
+        return onsets
+
+    ##############################################
+
+    def detect_spectrogram(self, spectrogram):
+
+        """Return the onsets of the frames of a :class:`Spectrogram` having the frame size and the
+        hop of the detector.  The frames can be zero padded, see :attr:`Spectrogram.fft_size`.
+
+        """
+
+        if (spectrogram.number_of_samples, spectrogram.hop) != (self._number_of_samples, self._hop):
+            raise ValueError("Spectrogram frame size and hop don't match the detector")
+
+        self.reset()
+        # the number of bins depends on the FFT size
+        self._previous_magnitude = np.zeros(spectrogram.fft_size // 2 + 1)
+        onsets = np.concatenate((self._pick(self._novelty(spectrogram.magnitude)), self.flush()))
+        self.reset()
+        return onsets
+
+    ##############################################
+
+    def detect_audio(self, audio, channel=0, block_size=2**16):
+
+        """Return the onsets of an :class:`AudioFormat` channel, read block per block."""
+
+        self.reset()
+        onsets = [self.feed(block)
+                  for start, block in audio.iter_blocks(block_size, channel=channel, as_float=True)]
+        onsets.append(self.flush())
+        self.reset()
+        return np.concatenate(onsets)
+
+    ##############################################
+
+    @staticmethod
+    def segments(onsets, number_of_samples):
+
+        """Return the segments between the onsets as an array of [start, stop[ rows, the last segment
+        stops at *number_of_samples*.
+
+        """
+
+        onsets = np.asarray(onsets, dtype=int)
+        return np.stack((onsets, np.append(onsets[1:], number_of_samples)), axis=-1)
+
+####################################################################################################
+
+def segment_pitches(values, segments, detector, number_of_samples=4096, delay=0):
+
+    """Detect the pitch of each segment using a :class:`Musica.Audio.PitchDetection.PitchDetector`.
+
+    A frame of *number_of_samples* is taken *delay* samples after the start of each segment, e.g. to
+    skip the attack, and all the frames are analysed by a single call.  Return the arrays of the
+    frequencies and the confidences, which are NaN and 0 for a segment shorter than the frame.
+
+    """
+
+    segments = np.asarray(segments, dtype=int).reshape(-1, 2)
+    starts = segments[:,0] + delay
+    valid = (starts + number_of_samples <= segments[:,1]) & (starts + number_of_samples <= values.size)
+
+    frequencies = np.full(segments.shape[0], np.nan)
+    confidences = np.zeros(segments.shape[0])
+    if np.any(valid):
+        frames = values[starts[valid,np.newaxis] + np.arange(number_of_samples)]
+        frequencies[valid], confidences[valid] = detector.detect(frames)
+
+    return frequencies, confidences
@@ -0,0 +1,338 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+
+r"""This module implements a partial tracking and the estimation of the inharmonicity of strings.
+
+The partials of a stiff string are not exactly harmonic, their frequencies follow
+
+.. math::
+
+    f_k = k f_0 \sqrt{1 + B k^2}
+
+where :math:`B` is the inharmonicity coefficient.  Squaring gives a linear model in :math:`k^2`
+
+.. math::
+
+    (f_k / k)^2 = f_0^2 + f_0^2 B k^2
+
+which is fitted by least squares on all the partials of all the frames of a recording.
+
+Everything is vectorised along leading axes, thus a batch of recordings stacked in an array of shape
+(number_of_files, number_of_samples) is analysed without any loop on the files or the frames.
+Missing partials and padding frames are NaN and are ignored by the fit.
+
+"""
+
+####################################################################################################
+
+__all__ = [
+    'PartialTracker',
+    'fit_inharmonicity',
+    ]
+
+####################################################################################################
+
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .PitchDetection import PitchDetector
+from .Spectrum import interpolate_peak, window_vector
+
+####################################################################################################
+
+def fit_inharmonicity(frequencies, weights=None):
+
+    """Fit the fundamental frequency and the inharmonicity coefficient of partial frequencies.
+
+    *frequencies* is an array of shape (..., number_of_frames, number_of_partials) where the partial
+    *k* is at the index *k* - 1 and missing partials are NaN.  *weights* is an optional array of the
+    same shape, e.g. the amplitudes.
+
+    The normal equations of all the leading indexes are solved at once.  Return the arrays of the
+    fundamental frequencies and the inharmonicity coefficients, NaN if less than two distinct
+    partials are available.
+
+    """
+
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    ranks = np.arange(1, frequencies.shape[-1] + 1)
+    x = np.broadcast_to(ranks**2, frequencies.shape)
+    y = (frequencies / ranks)**2
+
+    valid = np.isfinite(y)
+    if weights is None:
+        weights = valid.astype(np.float64)
+    else:
+        weights = np.where(valid & np.isfinite(weights), weights, 0)
+    x = np.where(valid, x, 0)
+    y = np.where(valid, y, 0)
+
+    axes = (-2, -1)
+    sum_w = weights.sum(axis=axes)
+    sum_x = (weights * x).sum(axis=axes)
+    sum_y = (weights * y).sum(axis=axes)
+    sum_xx = (weights * x * x).sum(axis=axes)
+    sum_xy = (weights * x * y).sum(axis=axes)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        determinant = sum_w * sum_xx - sum_x**2
+        slope = (sum_w * sum_xy - sum_x * sum_y) / determinant
+        intercept = (sum_y - slope * sum_x) / sum_w
+        fundamentals = np.sqrt(intercept)
+        inharmonicities = slope / intercept
+
+    singular = ~(np.abs(determinant) > 0)
+    fundamentals = np.where(singular, np.nan, fundamentals)
+    inharmonicities = np.where(singular, np.nan, inharmonicities)
+
+    return fundamentals, inharmonicities
+
+####################################################################################################
+
+class PartialTracker:
+
+    """Class to track the partials of string recordings.
+
+    Parameters
+    ----------
+    sampling_frequency : float
+    number_of_samples : int
+        Frame size
+    hop : int
+        Number of samples between two frames, default is half the frame size
+    window : str
+    number_of_partials : int
+    search_width : float
+        A partial is searched at plus or minus this fraction of the fundamental around its
+        predicted frequency
+    threshold : float
+        Partials weaker than the strongest bin of the frame by more than this value in dB are
+        discarded
+    number_of_iterations : int
+        Number of times the partials are tracked again using the fitted model
+    pitch_method : str
+        Pitch detector used when the fundamental is not given, see
+        :class:`Musica.Audio.PitchDetection.PitchDetector`
+
+    """
+
+    ##############################################
+
+    def __init__(self,
+                 sampling_frequency,
+                 number_of_samples=2**13,
+                 hop=None,
+                 window='hann',
+                 number_of_partials=10,
+                 search_width=.25,
+                 threshold=60,
+                 number_of_iterations=2,
+                 pitch_method='yin',
+    ):
+
+        if hop is None:
+            hop = number_of_samples // 2
+
+        self._sampling_frequency = sampling_frequency
+        self._number_of_samples = number_of_samples
+        self._hop = hop
+        self._window = window
+        self._number_of_partials = number_of_partials
+        self._search_width = search_width
+        self._threshold = threshold
+        self._number_of_iterations = number_of_iterations
+        self._pitch_method = pitch_method
+
+        self._ranks = np.arange(1, number_of_partials + 1)
+
+    ##############################################
+
+    @property
+    def sampling_frequency(self):
+        return self._sampling_frequency
+
+    @property
+    def number_of_samples(self):
+        return self._number_of_samples
+
+    @property
+    def hop(self):
+        return self._hop
+
+    @property
+    def number_of_partials(self):
+        return self._number_of_partials
+
+    @property
+    def frequency_resolution(self):
+        return self._sampling_frequency / self._number_of_samples
+
+    ##############################################
+
+    def frames(self, values):
+
+        """Return a read-only view of the frames of *values* along the last axis, with the shape
+        (..., number_of_frames, number_of_samples).
+
+        """
+
+        return sliding_window_view(values, self._number_of_samples, axis=-1)[..., ::self._hop, :]
+
+    ##############################################
+
+    def magnitude(self, frames):
+
+        """Return the magnitude of the frames scaled so as a sinusoid peak is its amplitude."""
+
+        window = window_vector(self._window, self._number_of_samples)
+        return np.abs(np.fft.rfft(frames * window, axis=-1)) * (2 / window.sum())
+
+    ##############################################
+
+    def track(self, magnitude, fundamental, inharmonicity=0):
+
+        """Locate the partials in a magnitude array of shape (..., number_of_frames, number_of_bins).
+
+        *fundamental* and *inharmonicity* give the predicted partial frequencies and must broadcast
+        to the shape (..., number_of_frames).  The maximum of each search window is refined by a
+        parabolic interpolation.
+
+        Return the arrays of the frequencies and the amplitudes of shape (..., number_of_frames,
+        number_of_partials), NaN for partials which are not found.
+
+        """
+
+        frequency_resolution = self.frequency_resolution
+        number_of_bins = magnitude.shape[-1]
+        fundamental = np.asarray(fundamental, dtype=np.float64)[..., np.newaxis]
+        inharmonicity = np.nan_to_num(np.asarray(inharmonicity, dtype=np.float64))[..., np.newaxis]
+
+        ranks = self._ranks
+        predicted = ranks * fundamental * np.sqrt(1 + inharmonicity * ranks**2)
+        half_widths = self._search_width * fundamental / frequency_resolution
+        maximum_half_width = np.nanmax(half_widths, initial=1)
+        maximum_half_width = int(math.ceil(maximum_half_width))
+        offsets = np.arange(-maximum_half_width, maximum_half_width + 1)
+
+        # search windows of shape (..., number_of_frames, number_of_partials, window_size)
+        centers = np.rint(np.nan_to_num(predicted / frequency_resolution, nan=-number_of_bins))
+        indexes = centers.astype(int)[..., np.newaxis] + offsets
+        in_window = ((np.abs(offsets) <= half_widths[..., np.newaxis]) &
+                     (indexes >= 1) & (indexes <= number_of_bins - 2))
+        indexes = np.clip(indexes, 1, number_of_bins - 2)
+        magnitude = magnitude[..., np.newaxis, :]
+        values = np.where(in_window, np.take_along_axis(magnitude, indexes, axis=-1), -1)
+        best = np.argmax(values, axis=-1)[..., np.newaxis]
+        peak_indexes = np.take_along_axis(indexes, best, axis=-1)[..., 0]
+        found = np.take_along_axis(in_window, best, axis=-1)[..., 0]
+
+        # a partial is a local maximum above the threshold
+        def take(offset):
+            return np.take_along_axis(magnitude, (peak_indexes + offset)[..., np.newaxis], axis=-1)[..., 0]
+        peaks = take(0)
+        floor = magnitude.max(axis=-1) * 10**(-self._threshold / 20)
+        found &= (peaks >= take(-1)) & (peaks >= take(1)) & (peaks > floor)
+
+        indexes, amplitudes = interpolate_peak(magnitude, peak_indexes)
+        frequencies = np.where(found, indexes * frequency_resolution, np.nan)
+        amplitudes = np.where(found, amplitudes, np.nan)
+
+        return frequencies, amplitudes
+
+    ##############################################
+
+    def estimate_fundamental(self, frames):
+
+        """Return the median of the pitches of the frames along the axis -2."""
+
+        detector = PitchDetector.create(self._pitch_method, self._sampling_frequency)
+        frequencies, confidences = detector.detect(frames)
+        frequencies = np.where(confidences > .5, frequencies, np.nan)
+        return np.nanmedian(frequencies, axis=-1)
+
+    ##############################################
+
+    def analyse(self, values, fundamental=None):
+
+        """Analyse a recording or a batch of recordings of shape (..., number_of_samples).
+
+        *fundamental* is the approximative fundamental frequency of each recording, it is estimated
+        if it is None.  The partials are tracked using a harmonic model, then tracked again using
+        the fitted inharmonic model.
+
+        Return the arrays of the fundamental frequencies, the inharmonicity coefficients, the partial
+        frequencies and the partial amplitudes.  The zero padding of shorter recordings doesn't
+        contribute since its partials are not found.
+
+        """
+
+        frames = self.frames(np.asarray(values, dtype=np.float64))
+        magnitude = self.magnitude(frames)
+
+        if fundamental is None:
+            fundamental = self.estimate_fundamental(frames)
+        fundamental = np.asarray(fundamental, dtype=np.float64)
+        inharmonicity = np.zeros_like(fundamental)
+
+        for i in range(self._number_of_iterations + 1):
+            frequencies, amplitudes = self.track(magnitude,
+                                                 fundamental[..., np.newaxis],
+                                                 inharmonicity[..., np.newaxis])
+            fitted_fundamental, inharmonicity = fit_inharmonicity(frequencies)
+            # keep the initial guess if the fit failed
+            fundamental = np.where(np.isfinite(fitted_fundamental), fitted_fundamental, fundamental)
+
+        return fundamental, inharmonicity, frequencies, amplitudes
+
+    ##############################################
+
+    def analyse_files(self, paths, channel=0, start=0, duration=None, fundamentals=None):
+
+        """Analyse a segment of a list of audio files in a single batch.
+
+        The segments start at *start* and last *duration* seconds, or up to the end of the files.
+        They are zero padded to the longest one.  *fundamentals* is an optional list of approximative
+        fundamental frequencies.
+
+        """
+
+        from .AudioFormat import AudioFormat
+
+        segments = []
+        for path in paths:
+            audio = AudioFormat.open(path)
+            if audio.metadata.sampling_frequency != self._sampling_frequency:
+                raise ValueError("{} isn't sampled at {} Hz".format(path, self._sampling_frequency))
+            start_sample = audio.metadata.time_to_sample(start)
+            if duration is None:
+                stop_sample = audio.number_of_samples
+            else:
+                stop_sample = min(start_sample + audio.metadata.time_to_sample(duration), audio.number_of_samples)
+            segments.append(audio.channel(channel, as_float=True)[start_sample:stop_sample])
+
+        number_of_samples = max(self._number_of_samples, max(segment.size for segment in segments))
+        values = np.zeros((len(segments), number_of_samples))
+        for i, segment in enumerate(segments):
+            values[i,:segment.size] = segment
+
+        return self.analyse(values, fundamentals)
@@ -0,0 +1,348 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module implements pitch detectors working on frames.
+
+The detectors are registered by name, use :meth:`PitchDetector.create` to get one.  They process a
+1-D frame or a 2-D array of frames at once and the correlations are computed using FFT, thus the
+cost is O(N log N) per frame.
+
+References
+
+YIN, a fundamental frequency estimator for speech and music.
+    Alain de Cheveigné, Hideki Kawahara
+    Journal of the Acoustical Society of America, 111(4), 2002
+
+"""
+
+####################################################################################################
+
+__all__ = [
+    'AutocorrelationPitchDetector',
+    'HpsPitchDetector',
+    'PitchDetector',
+    'YinPitchDetector',
+    ]
+
+####################################################################################################
+
+import logging
+import math
+
+import numpy as np
+
+from .HarmonicSpectrum import harmonic_product_spectrum
+from .Spectrogram import Spectrogram
+from .Spectrum import interpolate_peak, window_vector
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+class PitchDetectorMetaclass(type):
+
+    __methods__ = {}
+
+    _logger = _module_logger.getChild('PitchDetectorMetaclass')
+
+    ##############################################
+
+    def __init__(cls, class_name, base_classes, attributes):
+
+        type.__init__(cls, class_name, base_classes, attributes)
+
+        if cls.__method__ is not None:
+            PitchDetectorMetaclass._logger.info('Register {} for {}'.format(cls, cls.__method__))
+            PitchDetectorMetaclass.__methods__[cls.__method__] = cls
+
+    ##############################################
+
+    @classmethod
+    def get(cls, method):
+
+        try:
+            return cls.__methods__[method]
+        except KeyError:
+            raise ValueError("Invalid pitch detection method {}".format(method))
+
+####################################################################################################
+
+class PitchDetector(metaclass=PitchDetectorMetaclass):
+
+    """Base class for pitch detectors.
+
+    Parameters
+    ----------
+    sampling_frequency : float
+    minimum_frequency, maximum_frequency : float
+        Range of the pitch search
+
+    """
+
+    __method__ = None
+
+    ##############################################
+
+    @classmethod
+    def create(cls, method, *args, **kwargs):
+
+        """Return an instance of the detector registered for *method*, e.g. 'yin'."""
+
+        return PitchDetectorMetaclass.get(method)(*args, **kwargs)
+
+    ##############################################
+
+    @staticmethod
+    def methods():
+        return sorted(PitchDetectorMetaclass.__methods__.keys())
+
+    ##############################################
+
+    def __init__(self, sampling_frequency, minimum_frequency=40, maximum_frequency=2000):
+
+        self._sampling_frequency = sampling_frequency
+        self._minimum_frequency = minimum_frequency
+        self._maximum_frequency = maximum_frequency
+
+    ##############################################
+
+    @property
+    def sampling_frequency(self):
+        return self._sampling_frequency
+
+    @property
+    def minimum_frequency(self):
+        return self._minimum_frequency
+
+    @property
+    def maximum_frequency(self):
+        return self._maximum_frequency
+
+    ##############################################
+
+    def _lag_range(self, number_of_samples):
+
+        minimum_lag = max(2, int(math.floor(self._sampling_frequency / self._maximum_frequency)))
+        maximum_lag = int(math.ceil(self._sampling_frequency / self._minimum_frequency))
+        return minimum_lag, maximum_lag
+
+    ##############################################
+
+    def detect(self, frames):
+
+        """Return the arrays of the frequencies and the confidences estimated for each frame.
+
+        *frames* is a 1-D frame or an array of frames along the last axis.  The confidence ranges
+        from 0 to 1.
+
+        """
+
+        raise NotImplementedError
+
+    ##############################################
+
+    def detect_spectrum(self, spectrum):
+        """Detect the pitch of the values of a :class:`Spectrum`."""
+        return self.detect(spectrum.values)
+
+    def detect_spectrogram(self, spectrogram):
+        """Detect the pitch of each frame of a :class:`Spectrogram`."""
+        return self.detect(spectrogram.frames)
+
+    ##############################################
+
+    def detect_audio(self, audio, channel, number_of_samples, hop=None, gate=None):
+
+        """Detect the pitch of the frames of an :class:`AudioFormat` channel.
+
+        If a *gate* is given, see :class:`Musica.Audio.ActivityGate.ActivityGate`, the silent frames
+        are skipped, their frequency is NaN and their confidence is zero.
+
+        Return the arrays of the times of the frame centers, the frequencies and the confidences.
+
+        """
+
+        if hop is None:
+            hop = number_of_samples // 2
+        data = audio.channel(channel, as_float=True)
+        frames = Spectrogram.frame(data, number_of_samples, hop)
+        times = (np.arange(frames.shape[0]) * hop + number_of_samples / 2) / audio.metadata.sampling_frequency
+        if gate is None:
+            frequencies, confidences = self.detect(frames)
+        else:
+            active = gate.active_frames(data, number_of_samples, hop)
+            frequencies = np.full(frames.shape[0], np.nan)
+            confidences = np.zeros(frames.shape[0])
+            if np.any(active):
+                frequencies[active], confidences[active] = self.detect(frames[active])
+
+        return times, frequencies, confidences
+
+####################################################################################################
+
+class HpsPitchDetector(PitchDetector):
+
+    """Pitch detector using the Harmonic Product Spectrum."""
+
+    __method__ = 'hps'
+
+    ##############################################
+
+    def __init__(self, sampling_frequency, number_of_products=5, window='hann', rebin=True, **kwargs):
+
+        super().__init__(sampling_frequency, **kwargs)
+        self._number_of_products = number_of_products
+        self._window = window
+        self._rebin = rebin
+
+    ##############################################
+
+    def detect(self, frames):
+
+        number_of_samples = frames.shape[-1]
+        magnitude = np.abs(np.fft.rfft(frames * window_vector(self._window, number_of_samples), axis=-1))
+        hps = harmonic_product_spectrum(magnitude, self._number_of_products, self._rebin)
+
+        frequency_resolution = self._sampling_frequency / number_of_samples
+        lower_bin = max(1, int(math.ceil(self._minimum_frequency / frequency_resolution)))
+        upper_bin = min(hps.shape[-1], int(self._maximum_frequency / frequency_resolution) + 1)
+        if lower_bin >= upper_bin:
+            raise ValueError("Frame size {} is too small for {} Hz".format(number_of_samples,
+                                                                          self._maximum_frequency))
+        index = np.argmax(hps[..., lower_bin:upper_bin], axis=-1) + lower_bin
+
+        # the HPS maximum can be a bin away from the magnitude peak
+        index = np.clip(index, 1, magnitude.shape[-1] - 2)
+        neighbours = np.stack([np.take_along_axis(magnitude, (index + offset)[..., np.newaxis], axis=-1)[..., 0]
+                               for offset in (-1, 0, 1)], axis=-1)
+        index = index + np.argmax(neighbours, axis=-1) - 1
+        refined_index, peak = interpolate_peak(magnitude, index)
+
+        # ratio of the peak to the sum of the harmonic product spectrum
+        maximum = np.max(hps, axis=-1, keepdims=True)
+        confidence = 1 / np.sum(np.exp(hps - maximum), axis=-1)
+
+        return refined_index * frequency_resolution, confidence
+
+####################################################################################################
+
+class AutocorrelationPitchDetector(PitchDetector):
+
+    """Pitch detector using the maximum of the normalised autocorrelation.
+
+    The autocorrelation is computed using the Wiener–Khinchin theorem, the signal is padded to avoid
+    the circular correlation.  The search starts after the first negative value of the
+    autocorrelation so as to skip the lobe at the lag 0.
+
+    """
+
+    __method__ = 'autocorrelation'
+
+    ##############################################
+
+    def detect(self, frames):
+
+        number_of_samples = frames.shape[-1]
+        minimum_lag, maximum_lag = self._lag_range(number_of_samples)
+        maximum_lag = min(maximum_lag, number_of_samples - 2)
+
+        spectrum = np.fft.rfft(frames, n=2*number_of_samples, axis=-1)
+        autocorrelation = np.fft.irfft(spectrum.real**2 + spectrum.imag**2, axis=-1)[..., :maximum_lag+2]
+        energy = autocorrelation[..., :1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            autocorrelation = np.where(energy > 0, autocorrelation / energy, 0)
+
+        # skip the main lobe at lag 0, i.e. search after the first negative value
+        first_negative = np.argmax(autocorrelation < 0, axis=-1)
+        lower_lag = np.clip(first_negative, minimum_lag, maximum_lag)
+        lags = np.arange(autocorrelation.shape[-1])
+        search = np.where((lags >= lower_lag[..., np.newaxis]) & (lags <= maximum_lag), autocorrelation, -np.inf)
+        lag = np.argmax(search, axis=-1)
+        refined_lag, peak = interpolate_peak(autocorrelation, lag, log=False)
+
+        return self._sampling_frequency / refined_lag, np.clip(peak, 0, 1)
+
+####################################################################################################
+
+class YinPitchDetector(PitchDetector):
+
+    """Pitch detector using the YIN algorithm.
+
+    The difference function is computed from the cross-correlation of the integration window with
+    the frame and the cumulative energy.  The lag is the first local minimum of the cumulative mean
+    normalised difference below the threshold, else the global minimum.
+
+    """
+
+    __method__ = 'yin'
+
+    ##############################################
+
+    def __init__(self, sampling_frequency, threshold=.1, **kwargs):
+
+        super().__init__(sampling_frequency, **kwargs)
+        self._threshold = threshold
+
+    ##############################################
+
+    def detect(self, frames):
+
+        number_of_samples = frames.shape[-1]
+        minimum_lag, maximum_lag = self._lag_range(number_of_samples)
+        # integration window
+        window_size = number_of_samples - maximum_lag - 1
+        if window_size < maximum_lag:
+            raise ValueError("Frame size {} is too small for {} Hz".format(number_of_samples,
+                                                                          self._minimum_frequency))
+        number_of_lags = maximum_lag + 2
+
+        # r(tau) = sum_j x[j] x[j+tau] for j < W
+        size = 2 * number_of_samples
+        cross_spectrum = np.conj(np.fft.rfft(frames[..., :window_size], n=size, axis=-1)) * np.fft.rfft(frames, n=size, axis=-1)
+        correlation = np.fft.irfft(cross_spectrum, n=size, axis=-1)[..., :number_of_lags]
+
+        # e(tau) = sum_j x[j+tau]**2 for j < W
+        cumulative_energy = np.cumsum(frames**2, axis=-1)
+        cumulative_energy = np.concatenate((np.zeros(frames.shape[:-1] + (1,)), cumulative_energy), axis=-1)
+        energy = cumulative_energy[..., window_size:window_size+number_of_lags] - cumulative_energy[..., :number_of_lags]
+
+        difference = energy[..., :1] + energy - 2 * correlation
+        difference[..., 0] = 0
+
+        # cumulative mean normalised difference
+        cumulative_difference = np.cumsum(difference[..., 1:], axis=-1)
+        normalised_difference = np.ones_like(difference)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            normalised_difference[..., 1:] = np.where(cumulative_difference > 0,
+                                                      difference[..., 1:] * np.arange(1, number_of_lags) / cumulative_difference,
+                                                      1)
+
+        search = normalised_difference[..., minimum_lag:maximum_lag+1]
+        local_minimum = search <= normalised_difference[..., minimum_lag+1:maximum_lag+2]
+        candidates = (search < self._threshold) & local_minimum
+        has_candidate = np.any(candidates, axis=-1)
+        lag = np.where(has_candidate, np.argmax(candidates, axis=-1), np.argmin(search, axis=-1)) + minimum_lag
+
+        refined_lag, minimum = interpolate_peak(-normalised_difference, lag, log=False)
+        confidence = np.clip(1 + minimum, 0, 1)
+
+        return self._sampling_frequency / refined_lag, confidence
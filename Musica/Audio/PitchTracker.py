@@ -0,0 +1,272 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module implements a real-time pitch tracker.
+
+The tracker accepts blocks of samples of arbitrary size and estimates the pitch using the Harmonic
+Product Spectrum each time *hop* new samples are received.  The peak is refined by parabolic
+interpolation of the magnitude spectrum, as :class:`Musica.Audio.PitchDetection.HpsPitchDetector`.
+
+The samples are stored in a ring buffer of twice the frame size where each sample is written twice,
+at the positions i and i + N, so as the last N samples are always a contiguous slice of the buffer.
+All the working arrays are preallocated.
+
+"""
+
+####################################################################################################
+
+__all__ = [
+    'StreamingPitchTracker',
+    ]
+
+####################################################################################################
+
+import time
+
+import numpy as np
+
+from .Spectrum import frequency_axis, interpolate_peak, window_vector
+
+####################################################################################################
+
+class StreamingPitchTracker:
+
+    """Class to track the pitch of a stream of samples.
+
+    Parameters
+    ----------
+    sampling_frequency : float
+    number_of_samples : int
+        Frame size
+    hop : int
+        Number of samples between two estimations
+    number_of_products : int
+        Number of products of the Harmonic Product Spectrum
+    minimum_frequency, maximum_frequency : float
+        Range of the pitch search
+    gate : :class:`Musica.Audio.ActivityGate.ActivityGate`
+        Silent frames are not transformed and are reported with a null frequency and confidence
+
+    """
+
+    ##############################################
+
+    def __init__(self,
+                 sampling_frequency,
+                 number_of_samples=4096,
+                 hop=1024,
+                 number_of_products=5,
+                 window='hann',
+                 minimum_frequency=20,
+                 maximum_frequency=None,
+                 gate=None,
+    ):
+
+        if not 0 < hop <= number_of_samples:
+            raise ValueError("Invalid hop {}".format(hop))
+
+        self._sampling_frequency = sampling_frequency
+        self._number_of_samples = number_of_samples
+        self._hop = hop
+        self._number_of_products = number_of_products
+        self._gate = gate
+
+        self._window = window_vector(window, number_of_samples)
+
+        number_of_bins = number_of_samples // 2 + 1
+        self._hps_size = int(np.ceil(number_of_bins / number_of_products))
+        self._frequencies = frequency_axis(number_of_samples, sampling_frequency)[:self._hps_size]
+        self._frequency_resolution = sampling_frequency / number_of_samples
+
+        if maximum_frequency is None:
+            maximum_frequency = self._frequencies[-1]
+        self._lower_bin = max(1, int(np.searchsorted(self._frequencies, minimum_frequency)))
+        self._upper_bin = int(np.searchsorted(self._frequencies, maximum_frequency, side='right'))
+        if self._lower_bin >= self._upper_bin:
+            raise ValueError("Empty frequency range")
+
+        # Ring buffer
+        self._buffer = np.zeros(2 * number_of_samples)
+        self._position = 0
+        # Working arrays
+        self._windowed = np.zeros(number_of_samples)
+        self._magnitude = np.zeros(number_of_bins)
+        self._hps = np.zeros(self._hps_size)
+
+        self.reset()
+
+    ##############################################
+
+    def reset(self):
+
+        """Clear the stream state."""
+
+        self._buffer[...] = 0
+        self._position = 0
+        self._pending = 0
+        self._number_of_received_samples = 0
+        self._latency = 0
+
+    ##############################################
+
+    @property
+    def sampling_frequency(self):
+        return self._sampling_frequency
+
+    @property
+    def number_of_samples(self):
+        return self._number_of_samples
+
+    @property
+    def hop(self):
+        return self._hop
+
+    @property
+    def hop_period(self):
+        return self._hop / self._sampling_frequency
+
+    @property
+    def latency(self):
+        """Processing time of the last frame in s"""
+        return self._latency
+
+    @property
+    def frame(self):
+        """View on the last N samples, oldest first"""
+        return self._buffer[self._position:self._position + self._number_of_samples]
+
+    ##############################################
+
+    def _write(self, samples):
+
+        # samples.size <= number_of_samples
+        size = self._number_of_samples
+        position = self._position
+        first = min(samples.size, size - position)
+        rest = samples.size - first
+        self._buffer[position:position + first] = samples[:first]
+        self._buffer[position + size:position + size + first] = samples[:first]
+        if rest:
+            self._buffer[:rest] = samples[first:]
+            self._buffer[size:size + rest] = samples[first:]
+        self._position = (position + samples.size) % size
+
+    ##############################################
+
+    def _process(self):
+
+        start_time = time.perf_counter()
+
+        # time at the center of the frame
+        timestamp = (self._number_of_received_samples - self._number_of_samples / 2) / self._sampling_frequency
+
+        if self._gate is not None and not self._gate.is_active(self.frame):
+            self._latency = time.perf_counter() - start_time
+            return timestamp, 0., 0.
+
+        np.multiply(self.frame, self._window, out=self._windowed)
+        np.abs(np.fft.rfft(self._windowed), out=self._magnitude)
+
+        hps = self._hps
+        np.copyto(hps, self._magnitude[:self._hps_size])
+        for i in range(2, self._number_of_products + 1):
+            np.multiply(hps, self._magnitude[::i][:self._hps_size], out=hps)
+
+        search = hps[self._lower_bin:self._upper_bin]
+        i_max = np.argmax(search)
+        total = search.sum()
+        if total > 0:
+            # the HPS maximum can be a bin away from the magnitude peak
+            magnitude = self._magnitude
+            index = min(max(self._lower_bin + int(i_max), 1), magnitude.size - 2)
+            index += int(np.argmax(magnitude[index-1:index+2])) - 1
+            refined_index, peak = interpolate_peak(magnitude, index)
+            frequency = float(refined_index) * self._frequency_resolution
+            confidence = search[i_max] / total
+        else:
+            frequency = 0.
+            confidence = 0.
+
+        self._latency = time.perf_counter() - start_time
+
+        return timestamp, frequency, confidence
+
+    ##############################################
+
+    def feed(self, samples):
+
+        """Feed a block of float samples of any size.
+
+        Return the list of ``(timestamp, frequency, confidence)`` estimated for each hop completed
+        by the block.  The timestamp is the time of the center of the frame and the confidence the
+        ratio of the peak to the sum of the harmonic product spectrum.
+
+        """
+
+        results = []
+        samples = np.asarray(samples)
+        offset = 0
+        while offset < samples.size:
+            size = min(samples.size - offset, self._hop - self._pending)
+            self._write(samples[offset:offset + size])
+            offset += size
+            self._pending += size
+            self._number_of_received_samples += size
+            if self._pending == self._hop:
+                self._pending = 0
+                # wait the buffer is filled
+                if self._number_of_received_samples >= self._number_of_samples:
+                    results.append(self._process())
+
+        return results
+
+    ##############################################
+
+    def track(self, stream, dtype='<i2', number_of_channels=1, channel=0, block_size=1024):
+
+        """Track a raw interleaved PCM binary stream, e.g. ``sys.stdin.buffer``.
+
+        Yield ``(timestamp, frequency, confidence)`` tuples.
+
+        """
+
+        dtype = np.dtype(dtype)
+        if dtype.kind == 'i':
+            scale = 1 / 2**(dtype.itemsize * 8 - 1)
+        else:
+            scale = 1
+
+        frame_size = dtype.itemsize * number_of_channels
+        data = bytearray(block_size * frame_size)
+        samples = np.zeros(block_size)
+        remainder = b''
+        while True:
+            size = stream.readinto(memoryview(data)[len(remainder):])
+            if not size:
+                break
+            data[:len(remainder)] = remainder
+            size += len(remainder)
+            # keep an incomplete frame for the next read
+            number_of_frames = size // frame_size
+            remainder = bytes(data[number_of_frames * frame_size:size])
+            frames = np.frombuffer(data, dtype=dtype, count=number_of_frames * number_of_channels)
+            block = samples[:number_of_frames]
+            np.multiply(frames[channel::number_of_channels], scale, out=block)
+            yield from self.feed(block)
@@ -0,0 +1,243 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+
+"""This module implements polyphase FIR resampling by rational factors.
+
+The signal is conceptually upsampled by inserting *up* - 1 zeros between the samples, filtered by a
+windowed-sinc low-pass filter, then downsampled by keeping one sample on *down*.  The polyphase
+implementation only computes the kept samples: the filter is split in *up* phases, and the outputs
+using the same phase are computed by a single matrix product of a strided view of the input frames
+with the reversed phase, thus no zero is multiplied and no frame is copied.
+
+Decimating before a pitch search reduces the FFT size at an equal frequency resolution, see
+:meth:`Musica.Audio.AudioFormat.AudioFormat.spectrum`.
+
+"""
+
+####################################################################################################
+
+__all__ = [
+    'Resampler',
+    'decimate',
+    'lowpass_filter',
+    'resample',
+    ]
+
+####################################################################################################
+
+import functools
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .Spectrum import CACHE_SIZE
+
+####################################################################################################
+
+def _reduce(up, down):
+
+    if up < 1 or down < 1:
+        raise ValueError("Invalid resampling factors {}/{}".format(up, down))
+    divisor = math.gcd(up, down)
+    return up // divisor, down // divisor
+
+####################################################################################################
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def lowpass_filter(up, down, half_length=10, beta=5.):
+
+    """Return the anti-aliasing filter for a resampling by *up*/*down*.
+
+    The filter is a Kaiser windowed-sinc of 2 * *half_length* * max(up, down) + 1 taps whose cutoff
+    is the lowest Nyquist frequency, with a gain of *up* to compensate the zero stuffing.  The
+    array is read-only since it is cached.
+
+    """
+
+    maximum_factor = max(up, down)
+    cutoff = 1 / maximum_factor # relative to the upsampled Nyquist frequency
+    number_of_taps = 2 * half_length * maximum_factor + 1
+    indexes = np.arange(number_of_taps) - (number_of_taps - 1) / 2
+    coefficients = cutoff * np.sinc(cutoff * indexes) * np.kaiser(number_of_taps, beta)
+    coefficients *= up / coefficients.sum()
+    coefficients.flags.writeable = False
+
+    return coefficients
+
+####################################################################################################
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _polyphase_filters(up, down, half_length, beta):
+
+    """Return the reversed phases of the filter as an array of shape (up, taps_per_phase)."""
+
+    coefficients = lowpass_filter(up, down, half_length, beta)
+    taps_per_phase = -(-coefficients.size // up)
+    phases = np.zeros(up * taps_per_phase)
+    phases[:coefficients.size] = coefficients
+    # phase p holds the taps p, p + up, ...
+    phases = phases.reshape(taps_per_phase, up).T[:,::-1].copy()
+    phases.flags.writeable = False
+
+    return phases
+
+####################################################################################################
+
+def resample(values, up, down=1, half_length=10, beta=5.):
+
+    """Resample *values* along the last axis by the rational factor *up*/*down*.
+
+    The output has ceil(size * up / down) samples and is aligned on the input, i.e. the output
+    sample *m* is at the time of the input sample *m* * down / up.
+
+    """
+
+    up, down = _reduce(up, down)
+    values = np.asarray(values)
+    if values.dtype.kind != 'f':
+        values = values.astype(np.float64)
+    if up == down:
+        return values.copy()
+
+    phases = _polyphase_filters(up, down, half_length, beta)
+    taps_per_phase = phases.shape[1]
+    # delay of the filter in upsampled samples
+    delay = half_length * max(up, down)
+
+    size = values.shape[-1]
+    number_of_outputs = -(-size * up // down)
+    last_index = ((number_of_outputs - 1) * down + delay) // up
+    left_padding = taps_per_phase - 1
+    right_padding = max(0, last_index - size + 1)
+    padding = [(0, 0)] * (values.ndim - 1) + [(left_padding, right_padding)]
+    frames = sliding_window_view(np.pad(values, padding), taps_per_phase, axis=-1)
+
+    output = np.empty(values.shape[:-1] + (number_of_outputs,), dtype=values.dtype)
+    for r in range(min(up, number_of_outputs)):
+        # the outputs r, r + up, ... use the same phase and their input indexes are spaced by down
+        upsampled_index = r * down + delay
+        phase = upsampled_index % up
+        first_frame = upsampled_index // up # + left_padding - taps_per_phase + 1
+        number_of_frames = len(range(r, number_of_outputs, up))
+        stop = first_frame + (number_of_frames - 1) * down + 1
+        output[..., r::up] = frames[..., first_frame:stop:down, :] @ phases[phase]
+
+    return output
+
+####################################################################################################
+
+def decimate(values, factor, **kwargs):
+
+    """Decimate *values* by an integer factor, see :func:`resample`."""
+
+    return resample(values, 1, factor, **kwargs)
+
+####################################################################################################
+
+class Resampler:
+
+    """Class to resample by a rational factor *up*/*down* before a spectral analysis.
+
+    For example ``Resampler(1, 8)`` decimates by 8, thus the FFT of a segment is 8 times smaller for
+    the same frequency resolution, but the frequencies are limited to 1/16 of the initial sampling
+    frequency.
+
+    """
+
+    ##############################################
+
+    def __init__(self, up=1, down=1, half_length=10, beta=5.):
+
+        self._up, self._down = _reduce(up, down)
+        self._half_length = half_length
+        self._beta = beta
+
+    ##############################################
+
+    @property
+    def up(self):
+        return self._up
+
+    @property
+    def down(self):
+        return self._down
+
+    @property
+    def ratio(self):
+        return self._up / self._down
+
+    @property
+    def key(self):
+        """Tuple identifying the resampling, e.g. for a cache."""
+        return (self._up, self._down, self._half_length, self._beta)
+
+    ##############################################
+
+    def __repr__(self):
+        return '{0.__class__.__name__} {0._up}/{0._down}'.format(self)
+
+    ##############################################
+
+    def sampling_frequency(self, sampling_frequency):
+
+        """Return the sampling frequency after resampling."""
+
+        return sampling_frequency * self._up / self._down
+
+    ##############################################
+
+    def __call__(self, values):
+        return resample(values, self._up, self._down, self._half_length, self._beta)
+
+    ##############################################
+
+    def margins(self, start, stop, number_of_samples):
+
+        """Return the numbers of samples before and after the segment [*start*, *stop*[ of a signal
+        of *number_of_samples* used by :meth:`resample_segment`.
+
+        """
+
+        down = self._down
+        # the margin is a multiple of down so as the output stays aligned on the segment
+        margin = (self._half_length * max(self._up, down) // self._up + 1) * down
+        return min(margin, start - start % down), min(margin, number_of_samples - stop)
+
+    ##############################################
+
+    def resample_segment(self, values, start, stop):
+
+        """Resample the segment [*start*, *stop*[ of *values* along the last axis.
+
+        The available samples around the segment are used to fill the filter, thus the segment
+        doesn't have the transients of a resampling of the segment alone.
+
+        """
+
+        down = self._down
+        left_margin, right_margin = self.margins(start, stop, values.shape[-1])
+
+        resampled = self(values[..., start - left_margin:stop + right_margin])
+        first = left_margin * self._up // down
+        number_of_samples = -(-(stop - start) * self._up // down)
+
+        return resampled[..., first:first + number_of_samples]
@@ -0,0 +1,257 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+"""This module implements the Short-Time Fourier Transform.
+
+The signal is framed using stride tricks, thus the frame matrix is a view on the signal, then the
+window is applied on the whole matrix and the FFT is computed along the last axis in a single call.
+
+"""
+
+####################################################################################################
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from .HarmonicSpectrum import (
+    fundamental_frequency,
+    harmonic_product_spectrum,
+    harmonic_sum_spectrum,
+)
+from .Spectrum import Spectrum, frequency_axis, window_vector
+
+####################################################################################################
+
+class Spectrogram:
+
+    """Class to compute a spectrogram.
+
+    Parameters
+    ----------
+    sampling_frequency : float
+    values : 1-D array
+    number_of_samples : int
+        Size of a frame
+    fft_size : int or str
+        The frames are zero padded to this size, see :meth:`Spectrum.fft_size_for`
+    hop : int
+        Number of samples between two frames, default is half the frame size
+    window : str
+    fft : 2-D array
+        Precomputed FFT of the frames, e.g. loaded from a cache
+    gate : :class:`Musica.Audio.ActivityGate.ActivityGate`
+        Only the active frames are transformed, the FFT of the others is zero
+
+    The spectral properties are 2-D arrays of shape (number_of_frames, number_of_bins).
+
+    """
+
+    ##############################################
+
+    @staticmethod
+    def frame(values, number_of_samples, hop):
+
+        """Return a read-only view of shape (number_of_frames, number_of_samples) on *values*."""
+
+        if values.ndim != 1:
+            raise ValueError("values must be a 1-D array")
+        if number_of_samples > values.size:
+            raise ValueError("frame size {} is larger than the signal".format(number_of_samples))
+
+        number_of_frames = 1 + (values.size - number_of_samples) // hop
+        stride = values.strides[0]
+        return as_strided(values,
+                          shape=(number_of_frames, number_of_samples),
+                          strides=(hop*stride, stride),
+                          writeable=False)
+
+    ##############################################
+
+    def __init__(self, sampling_frequency, values, number_of_samples, hop=None, window='hann', fft=None, gate=None,
+                 fft_size=None):
+
+        if hop is None:
+            hop = number_of_samples // 2
+        fft_size = Spectrum.fft_size_for(number_of_samples, fft_size)
+
+        self._sampling_frequency = sampling_frequency
+        self._number_of_samples = number_of_samples
+        self._fft_size = fft_size
+        self._hop = hop
+
+        frames = self.frame(values, number_of_samples, hop)
+        self._frames = frames
+        self._number_of_frames = frames.shape[0]
+
+        if gate is None:
+            self._active = None
+        else:
+            self._active = gate.active_frames(values, number_of_samples, hop)
+            if fft is None:
+                fft = np.zeros((self._number_of_frames, fft_size // 2 + 1),
+                               dtype=np.complex64 if values.dtype == np.float32 else np.complex128)
+                frames = frames[self._active]
+                if frames.shape[0]:
+                    fft[self._active] = self._transform(frames, window, fft_size)
+        if fft is None:
+            fft = self._transform(frames, window, fft_size)
+        self._fft = fft
+        self._magnitude = None
+        self._power = None
+        self._decibel_power = None
+
+        self._frequencies = frequency_axis(fft_size, sampling_frequency)
+        # time at the center of the frames
+        self._times = (np.arange(self._number_of_frames) * hop + number_of_samples / 2) * self.sample_spacing
+
+    ##############################################
+
+    @staticmethod
+    def _transform(frames, window, fft_size):
+
+        if window is not None:
+            dtype = np.float32 if frames.dtype == np.float32 else np.float64
+            frames = frames * window_vector(window, frames.shape[-1], dtype)
+        return np.fft.rfft(frames, n=fft_size, axis=-1)
+
+    ##############################################
+
+    @property
+    def sampling_frequency(self):
+        return self._sampling_frequency
+
+    @property
+    def sample_spacing(self):
+        return 1 / self._sampling_frequency
+
+    @property
+    def number_of_samples(self):
+        return self._number_of_samples
+
+    @property
+    def fft_size(self):
+        return self._fft_size
+
+    @property
+    def hop(self):
+        return self._hop
+
+    @property
+    def number_of_frames(self):
+        return self._number_of_frames
+
+    @property
+    def active(self):
+        """Mask of the frames which are transformed"""
+        if self._active is None:
+            return np.ones(self._number_of_frames, dtype=bool)
+        return self._active
+
+    @property
+    def frequency_resolution(self):
+        return self._sampling_frequency / self._fft_size
+
+    @property
+    def time_resolution(self):
+        return self._hop / self._sampling_frequency
+
+    ##############################################
+
+    @property
+    def frequencies(self):
+        return self._frequencies
+
+    @property
+    def times(self):
+        return self._times
+
+    @property
+    def frames(self):
+        """View of shape (number_of_frames, number_of_samples) on the signal"""
+        return self._frames
+
+    @property
+    def fft(self):
+        return self._fft
+
+    ##############################################
+
+    @property
+    def magnitude(self):
+        if self._magnitude is None:
+            self._magnitude = np.abs(self._fft)
+        return self._magnitude
+
+    @property
+    def power(self):
+        if self._power is None:
+            self._power = self.magnitude**2
+        return self._power
+
+    @property
+    def decibel_power(self):
+        if self._decibel_power is None:
+            self._decibel_power = 10 * np.log10(self.power)
+        return self._decibel_power
+
+    ##############################################
+
+    def hps(self, number_of_products, rebin=True):
+
+        """Return the frequencies and the logarithm of the Harmonic Product Spectrum of each frame."""
+
+        hps = harmonic_product_spectrum(self.magnitude, number_of_products, rebin)
+        return self._frequencies[:hps.shape[-1]], hps
+
+    ##############################################
+
+    def hss(self, number_of_products, rebin=True):
+
+        """Return the frequencies and the Harmonic Sum Spectrum of each frame."""
+
+        hss = harmonic_sum_spectrum(self.magnitude, number_of_products, rebin)
+        return self._frequencies[:hss.shape[-1]], hss
+
+    ##############################################
+
+    def fundamental_frequencies(self,
+                                number_of_products=5,
+                                method='product',
+                                rebin=True,
+                                minimum_frequency=None,
+                                maximum_frequency=None,
+    ):
+
+        """Return an array of the fundamental frequency estimated for each frame using the harmonic
+        product or sum spectrum, NaN for the frames skipped by the gate.
+
+        """
+
+        if method == 'product':
+            frequencies, harmonic_spectrum = self.hps(number_of_products, rebin)
+        elif method == 'sum':
+            frequencies, harmonic_spectrum = self.hss(number_of_products, rebin)
+        else:
+            raise ValueError("Invalid method {}".format(method))
+
+        fundamentals = fundamental_frequency(frequencies, harmonic_spectrum, minimum_frequency, maximum_frequency)
+        if self._active is not None:
+            fundamentals = np.where(self._active, fundamentals, np.nan)
+        return fundamentals
@@ -30,16 +30,122 @@ Efficient Pitch Detection Techniques for Interactive Music
 
 ####################################################################################################
 
+import functools
 import math
 
 import numpy as np
 
+from .HarmonicSpectrum import decimate_spectrum
+
+####################################################################################################
+
+#: Maximum number of entries in the window and frequency axis caches
+CACHE_SIZE = 128
+
+####################################################################################################
+
+def kaiser(number_of_samples, beta=14):
+    """Return a Kaiser window, a *beta* of 14 is a good starting point."""
+    return np.kaiser(number_of_samples, beta)
+
+####################################################################################################
+
+def window_vector(window, number_of_samples, dtype=np.float64):
+
+    """Return the read-only window vector for a window name, a size and a float type.
+
+    Windows are cached since they are shared by all the spectra having the same size.
+
+    """
+
+    # the dtype must be hashable
+    return _window_vector(window, number_of_samples, np.dtype(dtype).str)
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _window_vector(window, number_of_samples, dtype):
+
+    vector = Spectrum.__window_function__[window](number_of_samples).astype(dtype, copy=False)
+    vector.flags.writeable = False
+    return vector
+
+####################################################################################################
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def frequency_axis(number_of_samples, sampling_frequency):
+
+    """Return the read-only frequency axis of a real FFT for a size and a sampling frequency."""
+
+    # Given a window length N and a sample spacing dt
+    #   f = [0, 1, ...,   N/2 - 1,     -N/2, ..., -1] / (dt*N)   if N is even
+    #   f = [0, 1, ...,   (N-1)/2, -(N-1)/2, ..., -1] / (dt*N)   if N is odd
+    frequencies = np.fft.rfftfreq(number_of_samples, 1 / sampling_frequency)
+    frequencies.flags.writeable = False
+    return frequencies
+
+####################################################################################################
+
+def interpolate_peak(magnitude, index, log=True):
+
+    """Refine the location of peaks by parabolic interpolation along the last axis.
+
+    *index* is an integer or an array of bin indexes, with the shape of the leading axes of
+    *magnitude* if it is a 2-D array.  If *log* is set, the parabola is fitted on the log magnitude,
+    which is exact for a Gaussian peak and a good approximation for the main lobe of usual windows.
+
+    Return the fractional bin indexes and the interpolated magnitudes.
+
+    """
+
+    index = np.clip(np.asarray(index), 1, magnitude.shape[-1] - 2)
+    if magnitude.ndim > 1:
+        def take(offset):
+            return np.take_along_axis(magnitude, (index + offset)[..., np.newaxis], axis=-1)[..., 0]
+    else:
+        def take(offset):
+            return magnitude[index + offset]
+    alpha, beta, gamma = take(-1), take(0), take(1)
+
+    if log:
+        tiny = np.finfo(float).tiny
+        alpha, beta, gamma = [np.log(np.maximum(x, tiny)) for x in (alpha, beta, gamma)]
+
+    denominator = alpha - 2*beta + gamma
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(denominator < 0, .5 * (alpha - gamma) / denominator, 0)
+    # the offset of a local maximum is in [-1/2, 1/2]
+    offset = np.clip(offset, -.5, .5)
+    peak = beta - .25 * (alpha - gamma) * offset
+    if log:
+        peak = np.exp(peak)
+
+    return index + offset, peak
+
+####################################################################################################
+
+def wrap_phase(phase):
+    """Wrap a phase to [-pi, pi["""
+    return (phase + np.pi) % (2 * np.pi) - np.pi
+
 ####################################################################################################
 
 class Spectrum:
 
+    """Class to compute the spectrum of a signal.
+
+    *values* can be a 1-D array or a 2-D array of shape (number_of_channels, number_of_samples), in
+    this case the FFT of all the channels is computed in a single call and the spectral quantities
+    are 2-D arrays.
+
+    The windowed values are zero padded to *fft_size*, see :meth:`fft_size_for`, thus the frequency
+    axis and the resolution are given by the FFT size and not the number of samples.
+
+    """
+
     __window_function__ = {
+        'blackman': np.blackman,
+        'hamming': np.hamming,
         'hann': np.hanning,
+        'kaiser': kaiser,
         }
 
     ##############################################
@@ -50,18 +156,75 @@ class Spectrum:
 
     ##############################################
 
+    @staticmethod
+    @functools.lru_cache(maxsize=CACHE_SIZE)
+    def next_fast_size(x):
+
+        """Return the smallest 2-3-5 smooth number, i.e. 2**a * 3**b * 5**c, greater or equal to *x*.
+
+        These sizes are efficiently handled by the FFT of Numpy, and are at most 25% larger than *x*
+        when a power of two can be twice as large.
+
+        """
+
+        x = int(x)
+        best = 1 << max(0, (x - 1).bit_length())
+        power_of_five = 1
+        while power_of_five < best:
+            power_of_three_five = power_of_five
+            while power_of_three_five < best:
+                # smallest power of two such as the product is greater or equal to x
+                quotient = -(-x // power_of_three_five)
+                best = min(best, power_of_three_five * (1 << (quotient - 1).bit_length()))
+                power_of_three_five *= 3
+            power_of_five *= 5
+
+        return best
+
+    ##############################################
+
     @classmethod
-    def sample_for_resolution(cls, sampling_frequency, frequency_resolution, power_of_two=True):
+    def sample_for_resolution(cls, sampling_frequency, frequency_resolution, power_of_two=True, fast_size=False):
+
+        """Return the number of samples for a frequency resolution, rounded up to a fast FFT size if
+        *fast_size* is set, else to a power of two if *power_of_two* is set.
+
+        """
 
         number_of_samples = int(math.ceil(sampling_frequency / frequency_resolution))
-        if power_of_two:
+        if fast_size:
+            number_of_samples = cls.next_fast_size(number_of_samples)
+        elif power_of_two:
             number_of_samples = cls.next_power_of_two(number_of_samples)
 
         return number_of_samples
 
     ##############################################
 
-    def __init__(self, sampling_frequency, values, window='hann'):
+    @classmethod
+    def fft_size_for(cls, number_of_samples, fft_size=None):
+
+        """Return the FFT size for *number_of_samples* given a size or a policy: None for no padding,
+        'fast' for the next 2-3-5 smooth size or 'power_of_two'.
+
+        """
+
+        if fft_size is None:
+            return number_of_samples
+        elif fft_size == 'fast':
+            return cls.next_fast_size(number_of_samples)
+        elif fft_size == 'power_of_two':
+            return cls.next_power_of_two(number_of_samples)
+        elif isinstance(fft_size, str):
+            raise ValueError("Invalid FFT size policy {}".format(fft_size))
+        elif fft_size < number_of_samples:
+            raise ValueError("FFT size {} is smaller than {}".format(fft_size, number_of_samples))
+        else:
+            return int(fft_size)
+
+    ##############################################
+
+    def __init__(self, sampling_frequency, values, window='hann', lazy=False, fft=None, fft_size=None):
 
         # *args, **kwargs
         # Fixme: better way to handle ctor !
@@ -89,20 +252,48 @@ class Spectrum:
         #     window = kwargs.get('window', 'hann')
 
         self._sampling_frequency = sampling_frequency
-        self._number_of_samples = values.size
+        self._window = window
+        self._fft_size_policy = fft_size
+        self.values = values
 
-        self._values = np.array(values)
+        if fft is not None:
+            # precomputed FFT, e.g. loaded from a cache
+            self._fft = fft
+        # The FFT is computed on first access to a spectral property if lazy
+        elif not lazy:
+            self._compute_fft()
+
+    ##############################################
+
+    def _reset(self):
 
-        if window is not None:
-            window = self.__window_function__[window](self._number_of_samples)
-            values = values*window
+        """Invalidate the FFT and the derived quantities."""
 
-        self._fft = np.fft.rfft(values)
+        self._fft = None
+        self._frequencies = None
+        self._magnitude = None
+        self._power = None
+        self._decibel_power = None
+        self._hfs = {}
+        self._h_dome = {}
 
-        # Given a window length N and a sample spacing dt
-        #   f = [0, 1, ...,   N/2 - 1,     -N/2, ..., -1] / (dt*N)   if N is even
-        #   f = [0, 1, ...,   (N-1)/2, -(N-1)/2, ..., -1] / (dt*N)   if N is odd
-        self._frequencies = np.fft.rfftfreq(self._number_of_samples, self.sample_spacing)
+    ##############################################
+
+    @property
+    def _float_dtype(self):
+        # keep a float32 working precision
+        if self._values.dtype == np.float32:
+            return np.float32
+        else:
+            return np.float64
+
+    def _compute_fft(self):
+
+        values = self._values
+        if self._window is not None:
+            values = values*window_vector(self._window, self._number_of_samples, self._float_dtype)
+
+        self._fft = np.fft.rfft(values, n=self._fft_size, axis=-1)
 
     ##############################################
 
@@ -123,14 +314,17 @@ class Spectrum:
     def number_of_samples(self):
         return self._number_of_samples
 
+    @property
+    def fft_size(self):
+        return self._fft_size
+
     @property
     def duration(self):
-        # inverse of frequency_resolution
         return self._number_of_samples / self._sampling_frequency
 
     @property
     def frequency_resolution(self):
-        return self._sampling_frequency / self._number_of_samples
+        return self._sampling_frequency / self._fft_size
 
     ##############################################
 
@@ -140,12 +334,34 @@ class Spectrum:
     def values(self):
         return self._values
 
+    @values.setter
+    def values(self, values):
+        self._values = np.array(values)
+        self._number_of_samples = self._values.shape[-1]
+        self._fft_size = self.fft_size_for(self._number_of_samples, self._fft_size_policy)
+        self._reset()
+
+    @property
+    def number_of_channels(self):
+        if self._values.ndim == 1:
+            return 1
+        else:
+            return self._values.shape[0]
+
+    @property
+    def window(self):
+        return self._window
+
     @property
     def frequencies(self):
+        if self._frequencies is None:
+            self._frequencies = frequency_axis(self._fft_size, self._sampling_frequency)
         return self._frequencies
 
     @property
     def fft(self):
+        if self._fft is None:
+            self._compute_fft()
         return self._fft
 
     ##############################################
@@ -171,26 +387,35 @@ class Spectrum:
     # dB = 10 log10(P/Pref)
     # dB = 20 log10(A/Aref)
 
+    # These quantities are computed on first access and cached until the values change.
+
     @property
     def magnitude(self):
-        return np.abs(self._fft)
+        if self._magnitude is None:
+            self._magnitude = np.abs(self.fft)
+        return self._magnitude
 
     @property
     def power(self):
-        return self.magnitude**2
+        if self._power is None:
+            self._power = self.magnitude**2
+        return self._power
 
     @property
     def decibel_power(self):
-        return 10 * np.log10(self.power)
+        if self._decibel_power is None:
+            self._decibel_power = 10 * np.log10(self.power)
+        return self._decibel_power
 
     ##############################################
 
-    def hfs(self, number_of_products):
-
-        # , rebin=False
+    def hfs(self, number_of_products, rebin=False):
 
         """Compute the Harmonic Product Spectrum.
 
+        If *rebin* is set, the decimated spectra are computed by averaging the bins, see
+        :func:`Musica.Audio.HarmonicSpectrum.decimate_spectrum`.
+
         References
 
         Noll, M. (1969).
@@ -200,24 +425,99 @@ class Spectrum:
 
         """
 
+        key = (number_of_products, rebin)
+        if key in self._hfs:
+            return self._hfs[key]
+
         spectrum= self.magnitude # Fixme: **2 ???
 
         # Fixme: ceil ?
-        size = int(math.ceil(spectrum.size / number_of_products))
-        hfs = spectrum[:size].copy()
+        size = int(math.ceil(spectrum.shape[-1] / number_of_products))
+        hfs = spectrum[..., :size].copy()
         for i in range(2, number_of_products + 1):
-            # if rebin:
-            #     rebinned_spectrum = spectrum[::i][:size].copy()
-            #     for j ixn range(1, i):
-            #         array = spectrum[j::i][:size]
-            #         rebinned_spectrum[:array.size] += array
-            #     rebinned_spectrum /= i
-            #     hfs *= rebinned_spectrum # Fixme: wrong for upper bins
-            # else:
-            hfs *= spectrum[::i][:size]
+            hfs *= decimate_spectrum(spectrum, i, size, rebin)
 
         # Fixme: return class ???
-        return self._frequencies[:size], hfs
+        result = self.frequencies[:size], hfs
+        self._hfs[key] = result
+
+        return result
+
+    ##############################################
+
+    def peak_index(self, minimum_frequency=None, maximum_frequency=None):
+
+        """Return the bin index of the maximum of the magnitude, the bin 0 is excluded.
+
+        For a multi-channel spectrum, return an array of indexes.
+
+        """
+
+        frequencies = self.frequencies
+        lower_bin = 1
+        if minimum_frequency is not None:
+            lower_bin = max(lower_bin, int(np.searchsorted(frequencies, minimum_frequency)))
+        upper_bin = frequencies.size
+        if maximum_frequency is not None:
+            upper_bin = int(np.searchsorted(frequencies, maximum_frequency, side='right'))
+
+        index = lower_bin + np.argmax(self.magnitude[..., lower_bin:upper_bin], axis=-1)
+        if self._values.ndim == 1:
+            return int(index)
+        else:
+            return index
+
+    ##############################################
+
+    def refine_peak(self, index=None, log=True):
+
+        """Return the frequency and the magnitude of a peak refined by parabolic interpolation.
+
+        *index* is the bin index of the peak or an array of bin indexes, the default is the maximum
+        of the magnitude.  See :func:`interpolate_peak`.
+
+        """
+
+        if index is None:
+            index = self.peak_index()
+        bin_index, magnitude = interpolate_peak(self.magnitude, index, log)
+
+        return bin_index * self.frequency_resolution, magnitude
+
+    ##############################################
+
+    def instantaneous_frequency(self, other, hop, index=None):
+
+        """Return the instantaneous frequency of a bin using the phase vocoder method.
+
+        *other* is the spectrum of the frame which starts *hop* samples after this one, it must
+        have the same sizes and window.  *index* is a bin index or an array of bin indexes, the
+        default is the maximum of the magnitude.
+
+        The expected phase advance of the bin k is 2 pi k hop / N, where N is the FFT size, the
+        deviation from it gives the frequency deviation from the bin center.
+
+        """
+
+        if (other.number_of_samples, other.fft_size) != (self._number_of_samples, self._fft_size):
+            raise ValueError("Spectra must have the same size")
+
+        if index is None:
+            index = self.peak_index()
+        index = np.asarray(index)
+
+        bin_pulsation = 2 * np.pi * index / self._fft_size
+        if self._values.ndim == 1:
+            phase_advance = np.angle(other.fft[index]) - np.angle(self.fft[index])
+        else:
+            index = np.broadcast_to(index, self._values.shape[:-1])
+            def take(fft):
+                return np.take_along_axis(fft, index[..., np.newaxis], axis=-1)[..., 0]
+            phase_advance = np.angle(take(other.fft)) - np.angle(take(self.fft))
+        deviation = wrap_phase(phase_advance - bin_pulsation * hop)
+        pulsation = bin_pulsation + deviation / hop
+
+        return pulsation * self._sampling_frequency / (2 * np.pi)
 
     ##############################################
 
@@ -234,10 +534,16 @@ class Spectrum:
 
         # Fixme: just for test ...
 
-        values = np.array(self.decibel_power, dtype=np.int)
-        values = np.where(values >= 0, values, 0)
+        if height not in self._h_dome:
+            values = np.array(self.decibel_power, dtype=int)
+            values = np.where(values >= 0, values, 0)
 
-        from Musica.Math.Morphomath import Function
-        function = Function(values).h_dome(height)
+            from Musica.Math.Morphomath import Function
+            if values.ndim == 1:
+                h_dome = Function(values).h_dome(height).values
+            else:
+                h_dome = np.array([Function(channel_values).h_dome(height).values
+                                   for channel_values in values])
+            self._h_dome[height] = h_dome
 
-        return function.values
+        return self._h_dome[height]
@@ -0,0 +1,351 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+
+r"""This module implements an additive synthesiser.
+
+A note is the sum of partials whose frequencies follow the stiff string model
+
+.. math::
+
+    f_k = k f_0 \sqrt{1 + B k^2}
+
+where :math:`B` is the inharmonicity coefficient, shaped by an ADSR envelope.
+
+The signal is rendered by chunks, thus a long sequence can be written to a file without holding the
+full signal in memory.  For each chunk, the partials of a note are computed at once as a matrix of
+shape (chunk_size, number_of_partials) which is reduced by a matrix product with the amplitudes.
+
+"""
+
+####################################################################################################
+
+__all__ = [
+    'AdditiveSynthesizer',
+    'Envelope',
+    'Note',
+    ]
+
+####################################################################################################
+
+import numpy as np
+
+from ..Theory.Pitch import Pitch
+from .AudioFormat import AudioFormat
+
+####################################################################################################
+
+class Envelope:
+
+    """Class to define an ADSR envelope.
+
+    Parameters
+    ----------
+    attack, decay, release : float
+        Durations in s
+    sustain : float
+        Sustain level relative to the peak
+
+    """
+
+    ##############################################
+
+    def __init__(self, attack=.01, decay=.1, sustain=.7, release=.2):
+
+        if min(attack, decay, release) < 0 or not 0 <= sustain <= 1:
+            raise ValueError("Invalid envelope {} {} {} {}".format(attack, decay, sustain, release))
+
+        self._attack = attack
+        self._decay = decay
+        self._sustain = sustain
+        self._release = release
+
+    ##############################################
+
+    @property
+    def attack(self):
+        return self._attack
+
+    @property
+    def decay(self):
+        return self._decay
+
+    @property
+    def sustain(self):
+        return self._sustain
+
+    @property
+    def release(self):
+        return self._release
+
+    ##############################################
+
+    def _breakpoints(self, duration):
+
+        """Return the breakpoints of the envelope of a note released at *duration*."""
+
+        times = [0, self._attack, self._attack + self._decay]
+        levels = [0, 1, self._sustain]
+        # level when the note is released, possibly before the end of the decay
+        release_level = np.interp(duration, times, levels, right=self._sustain)
+        times = [time for time in times if time < duration] + [duration, duration + self._release]
+        levels = levels[:len(times) - 2] + [release_level, 0]
+
+        return times, levels
+
+    ##############################################
+
+    def values(self, times, duration):
+
+        """Return the envelope at *times* for a note released at *duration*."""
+
+        return np.interp(times, *self._breakpoints(duration), left=0, right=0)
+
+####################################################################################################
+
+class Note:
+
+    """Class to define a note to be rendered.
+
+    *pitch* is a :class:`Musica.Theory.Pitch.Pitch`, a pitch name like 'A4' or a frequency in Hz.
+    *start* and *duration* are in s, the note sounds after *duration* for the release time of the
+    envelope.
+
+    """
+
+    ##############################################
+
+    def __init__(self, pitch, start=0, duration=1, amplitude=1):
+
+        if isinstance(pitch, str):
+            pitch = Pitch(pitch)
+        if isinstance(pitch, Pitch):
+            frequency = pitch.frequency
+        else:
+            frequency = float(pitch)
+            pitch = None
+
+        self._pitch = pitch
+        self._frequency = frequency
+        self._start = start
+        self._duration = duration
+        self._amplitude = amplitude
+
+    ##############################################
+
+    @property
+    def pitch(self):
+        return self._pitch
+
+    @property
+    def frequency(self):
+        return self._frequency
+
+    @property
+    def start(self):
+        return self._start
+
+    @property
+    def duration(self):
+        return self._duration
+
+    @property
+    def amplitude(self):
+        return self._amplitude
+
+####################################################################################################
+
+class AdditiveSynthesizer:
+
+    """Class to implement an additive synthesiser.
+
+    Parameters
+    ----------
+    sampling_frequency : float
+    number_of_partials : int
+    amplitudes : array
+        Relative amplitudes of the partials, default is :math:`1/k`, they are normalised so as their
+        sum is one
+    inharmonicity : float
+        Inharmonicity coefficient B
+    envelope : :class:`Envelope`
+    chunk_size : int
+        Number of samples of a chunk
+    dtype : float dtype of the rendered signal
+
+    """
+
+    ##############################################
+
+    def __init__(self,
+                 sampling_frequency=44100,
+                 number_of_partials=8,
+                 amplitudes=None,
+                 inharmonicity=0,
+                 envelope=None,
+                 chunk_size=2**14,
+                 dtype=np.float64,
+    ):
+
+        if amplitudes is None:
+            amplitudes = 1 / np.arange(1, number_of_partials + 1)
+        else:
+            amplitudes = np.array(amplitudes, dtype=np.float64)
+            if amplitudes.size != number_of_partials:
+                raise ValueError("Expected {} amplitudes".format(number_of_partials))
+        if envelope is None:
+            envelope = Envelope()
+
+        self._sampling_frequency = sampling_frequency
+        self._amplitudes = amplitudes / amplitudes.sum()
+        self._inharmonicity = inharmonicity
+        self._envelope = envelope
+        self._chunk_size = chunk_size
+        self._dtype = np.dtype(dtype)
+
+        self._ranks = np.arange(1, number_of_partials + 1)
+        self._partial_buffer = np.empty((chunk_size, number_of_partials))
+
+    ##############################################
+
+    @property
+    def sampling_frequency(self):
+        return self._sampling_frequency
+
+    @property
+    def number_of_partials(self):
+        return self._ranks.size
+
+    @property
+    def amplitudes(self):
+        return self._amplitudes
+
+    @property
+    def inharmonicity(self):
+        return self._inharmonicity
+
+    @property
+    def envelope(self):
+        return self._envelope
+
+    @property
+    def chunk_size(self):
+        return self._chunk_size
+
+    ##############################################
+
+    def partial_frequencies(self, frequency):
+
+        """Return the frequencies of the partials of a fundamental frequency."""
+
+        ranks = self._ranks
+        return ranks * frequency * np.sqrt(1 + self._inharmonicity * ranks**2)
+
+    ##############################################
+
+    def _add_note(self, output, start_sample, note):
+
+        """Add the part of a note which overlaps the chunk starting at *start_sample*."""
+
+        sampling_frequency = self._sampling_frequency
+        note_start = int(round(note.start * sampling_frequency))
+        note_stop = note_start + int(round((note.duration + self._envelope.release) * sampling_frequency))
+        start = max(note_start, start_sample)
+        stop = min(note_stop, start_sample + output.size)
+        if start >= stop:
+            return
+
+        # partials above the Nyquist frequency would alias
+        frequencies = self.partial_frequencies(note.frequency)
+        audible = frequencies < sampling_frequency / 2
+        # sample indexes relative to the note start
+        indexes = np.arange(start - note_start, stop - note_start)
+        # phases in cycles, reduced modulo one to keep the precision of long notes
+        partials = self._partial_buffer[:indexes.size,:np.count_nonzero(audible)]
+        np.multiply.outer(indexes, frequencies[audible] / sampling_frequency, out=partials)
+        np.mod(partials, 1, out=partials)
+        partials *= 2 * np.pi
+        np.sin(partials, out=partials)
+        signal = partials @ self._amplitudes[audible]
+
+        times = indexes / sampling_frequency
+        signal *= note.amplitude * self._envelope.values(times, note.duration)
+        output[start - start_sample:stop - start_sample] += signal
+
+    ##############################################
+
+    def render(self, notes):
+
+        """Yield the signal of a list of :class:`Note` chunk per chunk.
+
+        Notes can overlap, only the notes sounding during a chunk are computed.  The notes are
+        sorted by start time, a note becomes sounding when the chunk reaches its start and it is
+        dropped once its release is over.
+
+        """
+
+        if isinstance(notes, Note):
+            notes = [notes]
+        notes = sorted(notes, key=lambda note: note.start)
+        if not notes:
+            return
+
+        sampling_frequency = self._sampling_frequency
+        release = self._envelope.release
+        end = max(note.start + note.duration + release for note in notes)
+        number_of_samples = int(round(end * sampling_frequency))
+
+        next_note = 0
+        sounding_notes = []
+        for start_sample in range(0, number_of_samples, self._chunk_size):
+            chunk_size = min(self._chunk_size, number_of_samples - start_sample)
+            output = np.zeros(chunk_size)
+            chunk_start = start_sample / sampling_frequency
+            chunk_stop = (start_sample + chunk_size) / sampling_frequency
+            while next_note < len(notes) and notes[next_note].start < chunk_stop:
+                sounding_notes.append(notes[next_note])
+                next_note += 1
+            sounding_notes = [note for note in sounding_notes
+                              if note.start + note.duration + release > chunk_start]
+            for note in sounding_notes:
+                self._add_note(output, start_sample, note)
+            yield output.astype(self._dtype, copy=False)
+
+    ##############################################
+
+    def render_note(self, pitch, duration=1, amplitude=1):
+
+        """Yield the signal of a single note chunk per chunk."""
+
+        return self.render(Note(pitch, 0, duration, amplitude))
+
+    ##############################################
+
+    def write(self, path, notes, number_of_channels=1, bits_per_sample=16, is_float=False):
+
+        """Render a list of :class:`Note` to a file chunk per chunk, see :meth:`AudioFormat.write`.
+
+        The signal is written to all the channels.  Return the number of samples.
+
+        """
+
+        with AudioFormat.open_writer(path, self._sampling_frequency,
+                                     number_of_channels, bits_per_sample, is_float) as writer:
+            return writer.write_blocks(self.render(notes))
@@ -20,44 +20,292 @@
 
 ####################################################################################################
 
-import wave
+# https://en.wikipedia.org/wiki/WAV
+# http://soundfile.sapp.org/doc/WaveFormat
+
+####################################################################################################
+
+import struct
 
 import numpy as np
 
-from .AudioFormat import AudioFormat, AudioFormatMetadata
+from .AudioFormat import AudioFormat, AudioFormatMetadata, AudioFormatWriter
+
+####################################################################################################
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# the sub-format GUID of the extensible format is the format code followed by these bytes
+KSDATAFORMAT_SUBTYPE_SUFFIX = b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+
+####################################################################################################
+
+def decode_uint8(data):
+
+    """Decode unsigned 8-bit samples to signed 16-bit integers."""
+
+    return data.astype(np.int16) - 128
+
+####################################################################################################
+
+def decode_int24(data):
+
+    """Decode 24-bit samples given as an uint8 array of shape (..., 3) to 32-bit integers.
+
+    The three bytes are copied in the upper bytes of 32-bit words and the words are shifted
+    arithmetically, so as the sign is extended without any per-sample Python code.
+
+    """
+
+    words = np.zeros(data.shape[:-1] + (4,), dtype=np.uint8)
+    words[..., 1:] = data
+    return words.view('<i4')[..., 0] >> 8
+
+####################################################################################################
+
+class WaveWriter(AudioFormatWriter):
+
+    """Class to write WAV files.
+
+    Supported formats are 16, 24 and 32-bit integer PCM and 32-bit IEEE float.  The header is
+    written with null sizes which are patched when the file is closed.
+
+    As recommended by the specification, integer samples wider than 16-bit and more than 2 channels
+    use the WAVE_FORMAT_EXTENSIBLE format, the channels are assigned to the first speaker positions.
+    Float files have a fact chunk.
+
+    """
+
+    ##############################################
+
+    def __init__(self, path, metadata):
+
+        super().__init__(path, metadata)
+
+        bits_per_sample = metadata.bits_per_sample
+        if metadata.is_float:
+            if bits_per_sample != 32:
+                raise NotImplementedError("Unsupported float sample width {}".format(bits_per_sample))
+            self._audio_format = WAVE_FORMAT_IEEE_FLOAT
+            self._dtype = np.dtype('<f4')
+        else:
+            if bits_per_sample not in (16, 24, 32):
+                raise NotImplementedError("Unsupported sample width {}".format(bits_per_sample))
+            self._audio_format = WAVE_FORMAT_PCM
+            # 24-bit samples are encoded in 32-bit words then packed
+            self._dtype = np.dtype('<i2' if bits_per_sample == 16 else '<i4')
+
+        self._data_size = 0
+        self._file = open(path, 'wb')
+        self._write_header()
+
+    ##############################################
+
+    @property
+    def _sample_dtype(self):
+        return self._dtype
+
+    ##############################################
+
+    def _write_header(self):
+
+        metadata = self._metadata
+        number_of_channels = metadata.number_of_channels
+        sampling_frequency = metadata.sampling_frequency
+        bits_per_sample = metadata.bits_per_sample
+        block_align = number_of_channels * bits_per_sample // 8
+        is_float = self._audio_format == WAVE_FORMAT_IEEE_FLOAT
+
+        fmt = struct.pack('<HIIHH', number_of_channels, sampling_frequency,
+                          sampling_frequency * block_align, block_align, bits_per_sample)
+        if number_of_channels > 2 or (bits_per_sample > 16 and not is_float):
+            # cbSize, valid_bits_per_sample, channel_mask and sub-format GUID
+            channel_mask = (1 << number_of_channels) - 1 if number_of_channels <= 18 else 0
+            fmt = struct.pack('<H', WAVE_FORMAT_EXTENSIBLE) + fmt + \
+                  struct.pack('<HHIH', 22, bits_per_sample, channel_mask, self._audio_format) + \
+                  KSDATAFORMAT_SUBTYPE_SUFFIX
+        else:
+            fmt = struct.pack('<H', self._audio_format) + fmt
+            if is_float:
+                # cbSize
+                fmt += struct.pack('<H', 0)
+
+        chunks = struct.pack('<4sI', b'fmt ', len(fmt)) + fmt
+        if is_float:
+            # number of samples per channel
+            chunks += struct.pack('<4sII', b'fact', 4, self._data_size // block_align)
+        chunks += struct.pack('<4sI', b'data', self._data_size)
+
+        # the data chunk is padded to an even size
+        riff_size = 4 + len(chunks) + self._data_size + (self._data_size & 1)
+        self._file.write(struct.pack('<4sI4s', b'RIFF', riff_size, b'WAVE'))
+        self._file.write(chunks)
+
+    ##############################################
+
+    def _write_frames(self, frames):
+
+        if self._metadata.bits_per_sample == 24:
+            # keep the three low bytes of the little endian words
+            words = frames.view(np.uint8).reshape(frames.shape + (4,))
+            packed = self._buffer('packed', frames.shape + (3,), np.uint8)
+            packed[...] = words[..., :3]
+            frames = packed
+        self._file.write(frames.data)
+        self._data_size += frames.nbytes
+
+    ##############################################
+
+    def _close(self):
+
+        if self._data_size & 1:
+            self._file.write(b'\0')
+        self._file.seek(0)
+        self._write_header()
+        self._file.close()
 
 ####################################################################################################
 
 class WaveFormat(AudioFormat):
 
+    """Class to read WAV files.
+
+    Supported formats are 8, 16, 24 and 32-bit integer PCM and 32 and 64-bit IEEE float.
+
+    If *memory_map* is set, the PCM data chunk is memory mapped and the channels are strided views
+    on it, thus nothing is loaded in memory until samples are accessed.  For 8 and 24-bit samples
+    which must be decoded, a channel is decoded on each access and :meth:`iter_blocks` decodes one
+    block at a time.
+
+    """
+
     __extensions__ = ['wav']
+    __writer__ = WaveWriter
 
     ##############################################
 
-    def __init__(self, path):
+    @staticmethod
+    def _read_header(path):
+
+        """Return the fields of the fmt chunk and the offset and size of the data chunk."""
+
+        with open(path, 'rb') as wave_file:
+            header = wave_file.read(12)
+            if len(header) < 12:
+                raise ValueError("{} is not a WAVE file".format(path))
+            riff_id, riff_size, wave_id = struct.unpack('<4sI4s', header)
+            if riff_id != b'RIFF' or wave_id != b'WAVE':
+                raise ValueError("{} is not a WAVE file".format(path))
+            fmt = None
+            while True:
+                chunk_header = wave_file.read(8)
+                if len(chunk_header) < 8:
+                    raise ValueError("{} doesn't have a data chunk".format(path))
+                chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+                if chunk_id == b'fmt ':
+                    chunk = wave_file.read(chunk_size)
+                    # audio_format, number_of_channels, sampling_frequency, byte_rate, block_align,
+                    # bits_per_sample
+                    fmt = list(struct.unpack('<HHIIHH', chunk[:16]))
+                    if fmt[0] == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                        # cbSize, valid_bits_per_sample, channel_mask then the sub-format GUID
+                        # whose first two bytes are the format code
+                        fmt[0] = struct.unpack('<H', chunk[24:26])[0]
+                    chunk_size = 0
+                elif chunk_id == b'data':
+                    if fmt is None:
+                        raise ValueError("{} doesn't have a fmt chunk".format(path))
+                    data_offset = wave_file.tell()
+                    # size can be wrong for a truncated or streamed file
+                    wave_file.seek(0, 2)
+                    data_size = min(chunk_size, wave_file.tell() - data_offset)
+                    return fmt, data_offset, data_size
+                # chunks are word aligned
+                wave_file.seek(chunk_size + (chunk_size & 1), 1)
+
+    ##############################################
 
-        wave_file = wave.open(path, 'r')
+    def __init__(self, path, memory_map=False, float_dtype=np.float64):
 
-        number_of_channels = wave_file.getnchannels()
-        sample_width = wave_file.getsampwidth() # in bytes
-        sampling_frequency = wave_file.getframerate() # Hz
-        number_of_frames = wave_file.getnframes()
-        # wave_file.getcomptype()
+        fmt, data_offset, data_size = self._read_header(path)
+        audio_format, number_of_channels, sampling_frequency, byte_rate, block_align, bits_per_sample = fmt
 
-        bits_per_sample = sample_width * 8
+        sample_width = bits_per_sample // 8 # in bytes
+        number_of_frames = data_size // block_align
+        shape = (number_of_frames, number_of_channels)
 
-        # print(number_of_channels, sample_width, sampling_frequency, number_of_frames)
-        # 1 2 44100 82256
+        decode = None
+        if audio_format == WAVE_FORMAT_PCM:
+            if sample_width == 1:
+                dtype = 'u1'
+                decode = decode_uint8
+            elif sample_width == 3:
+                dtype = 'u1'
+                shape += (3,)
+                decode = decode_int24
+            elif sample_width in (2, 4):
+                dtype = '<i{}'.format(sample_width)
+            else:
+                raise NotImplementedError("Unsupported sample width {}".format(sample_width))
+        elif audio_format == WAVE_FORMAT_IEEE_FLOAT and sample_width in (4, 8):
+            dtype = '<f{}'.format(sample_width)
+        else:
+            raise NotImplementedError("Unsupported WAVE format {} {}-bit".format(audio_format, bits_per_sample))
 
         metadata = AudioFormatMetadata(
             number_of_channels=number_of_channels,
             sampling_frequency=sampling_frequency,
             bits_per_sample=bits_per_sample,
+            is_float=audio_format == WAVE_FORMAT_IEEE_FLOAT,
         )
 
-        dtype = '<i{}'.format(sample_width)
-        data = np.frombuffer(wave_file.readframes(number_of_frames), dtype=dtype)
-        data = data.reshape(number_of_frames // number_of_channels, number_of_channels)
-        channels = [np.array(data[:,i]) for i in range(number_of_channels)]
+        self._memory_map = memory_map
+        self._decode = decode
+
+        if memory_map:
+            data = np.memmap(path, dtype=dtype, mode='r', offset=data_offset, shape=shape)
+            if decode is None:
+                # channels are zero-copy strided views on the interleaved frames
+                channels = [data[:,i] for i in range(number_of_channels)]
+            else:
+                # channels are decoded on demand
+                channels = None
+        else:
+            count = int(np.prod(shape))
+            data = np.fromfile(path, dtype=dtype, count=count, offset=data_offset).reshape(shape)
+            if decode is not None:
+                data = decode(data)
+            channels = [np.array(data[:,i]) for i in range(number_of_channels)]
+            data = None
+        self._data = data
+
+        super().__init__(metadata, channels, number_of_frames, float_dtype, path)
+
+    ##############################################
+
+    @property
+    def is_memory_mapped(self):
+        return self._memory_map
+
+    ##############################################
+
+    def _get_channel(self, i):
+
+        if self._channels is None:
+            return self._decode(self._data[:,i])
+        else:
+            return self._channels[i]
+
+    ##############################################
+
+    def _read_block(self, channel, start, stop):
 
-        super().__init__(metadata, channels)
+        if self._channels is None:
+            if channel is None:
+                return self._decode(self._data[start:stop]).T
+            else:
+                return self._decode(self._data[start:stop,channel])
+        else:
+            return super()._read_block(channel, start, stop)
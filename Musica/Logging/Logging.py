@@ -24,6 +24,7 @@ import yaml
 import logging
 import logging.config
 import os
+import sys
 
 ####################################################################################################
 
@@ -56,3 +57,14 @@ def setup_logging(application_name='Musica',
         logger.setLevel(numeric_level)
 
     return logger
+
+####################################################################################################
+
+def log_to_stderr():
+
+    """Move the console handlers to stderr, e.g. for a script which writes its results on stdout."""
+
+    for handler in logging.getLogger().handlers:
+        # a FileHandler is a StreamHandler
+        if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+            handler.setStream(sys.stderr)
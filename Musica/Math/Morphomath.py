@@ -27,7 +27,10 @@
 
 ####################################################################################################
 
+from collections import deque
+
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 ####################################################################################################
 
@@ -41,6 +44,111 @@ def odd(n):
 
 ####################################################################################################
 
+#: Window size from which :func:`moving_rank` switches to the van Herk & Gil-Werman algorithm
+VHGW_MINIMUM_SIZE = 64
+
+_RANK_UFUNCS = {
+    min: np.minimum,
+    max: np.maximum,
+    np.minimum: np.minimum,
+    np.maximum: np.maximum,
+}
+
+def _rank_ufunc(rank_operator):
+
+    """ Return the Numpy ufunc corresponding to *rank_operator*. """
+
+    try:
+        return _RANK_UFUNCS[rank_operator]
+    except KeyError:
+        raise ValueError('Unsupported rank operator {}'.format(rank_operator))
+
+def _neutral_value(dtype, ufunc):
+
+    """ Return the neutral element of *ufunc* for *dtype*, which is used as padding value. """
+
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        return info.max if ufunc is np.minimum else info.min
+    else:
+        return np.inf if ufunc is np.minimum else -np.inf
+
+####################################################################################################
+
+def _pad(values, left, right, value):
+
+    """ Return *values* padded with *left* and *right* samples set to *value*. """
+
+    padded = np.empty(left + values.size + right, dtype=values.dtype)
+    padded[:left] = value
+    padded[left:left+values.size] = values
+    padded[left+values.size:] = value
+    return padded
+
+####################################################################################################
+
+def _sliding_window_rank(padded, size, ufunc):
+
+    """ Return the rank of each window of *size* samples of *padded*. """
+
+    # reduce the window offsets one after the other, which is faster than a reduction along the
+    # last axis of the view
+    return ufunc.reduce(sliding_window_view(padded, size).T, axis=0)
+
+####################################################################################################
+
+def _vhgw_rank(padded, size, ufunc):
+
+    """ Return the rank of each window of *size* samples of *padded* using the van Herk & Gil-Werman
+    algorithm.
+
+    The signal is cut in blocks of *size* samples, the ranks are accumulated forward and backward
+    in each block, and a window which overlaps two blocks is the union of the end of the first and
+    the beginning of the second, thus the cost doesn't depend on *size*.
+    """
+
+    number_of_windows = padded.size - size + 1
+    number_of_blocks = -(-padded.size // size)
+    blocks = _pad(padded, 0, number_of_blocks * size - padded.size, _neutral_value(padded.dtype, ufunc))
+    blocks = blocks.reshape(number_of_blocks, size)
+    forward = ufunc.accumulate(blocks, axis=1).ravel()
+    backward = ufunc.accumulate(blocks[:,::-1], axis=1)[:,::-1].ravel()
+    return ufunc(backward[:number_of_windows], forward[size-1:size-1+number_of_windows])
+
+####################################################################################################
+
+def moving_rank(values, lower, upper, rank_operator, vhgw=None):
+
+    """ Return the min or max of *values* over the windows [i + *lower*, i + *upper*] clipped to the
+    domain.
+
+    The parameter *rank_operator* is :func:`min` or :func:`max`.  If *vhgw* is None, the van Herk &
+    Gil-Werman algorithm is used when the window size is at least :data:`VHGW_MINIMUM_SIZE`, else a
+    sliding window view is reduced.
+    """
+
+    ufunc = _rank_ufunc(rank_operator)
+    values = np.asarray(values)
+    size = upper - lower + 1
+    if size < 1:
+        raise ValueError('Empty window')
+    if vhgw is None:
+        vhgw = size >= VHGW_MINIMUM_SIZE
+
+    # the window of sample i starts at padded[i + lower + left]
+    left = max(0, -lower)
+    right = max(0, upper)
+    padded = _pad(values, left, right, _neutral_value(values.dtype, ufunc))
+    start = lower + left
+    padded = padded[start:start + values.size + size - 1]
+
+    if vhgw:
+        return _vhgw_rank(padded, size, ufunc)
+    else:
+        return _sliding_window_rank(padded, size, ufunc)
+
+####################################################################################################
+
 class Domain(object):
 
     """ This class implements a functional 1D domain defined by the range [inf, sup].
@@ -240,7 +348,7 @@ class Function(object):
 
     def __init__(self, values):
 
-        self.values = np.array(values, dtype=np.int)
+        self.values = np.array(values, dtype=int)
         self.domain = Domain(inf=0, sup=self.values.size -1)
 
     ##############################################
@@ -249,7 +357,7 @@ class Function(object):
 
         """ Return a copy of the function. """
 
-        return self.__class__(self)
+        return self.__class__(self.values)
 
     ##############################################
 
@@ -293,11 +401,23 @@ class Function(object):
 
     ##############################################
 
+    @staticmethod
+    def _as_array(obj):
+
+        """ Return the values of *obj* if it is a function, else *obj*. """
+
+        if isinstance(obj, Function):
+            return obj.values
+        else:
+            return obj
+
+    ##############################################
+
     def add(self, obj):
 
         """ Add a function. """
 
-        self.values += obj
+        self.values += self._as_array(obj)
         return self
 
     ##############################################
@@ -325,7 +445,7 @@ class Function(object):
         Negative values are set to zero.
         """
 
-        self.values -= obj
+        self.values -= self._as_array(obj)
         self.values[np.where(self.values < 0)] = 0
         return self
 
@@ -380,7 +500,40 @@ class Function(object):
 
     def _rank_filter(self, structuring_element, rank_operator):
 
-        """ This method implements a rank filter.
+        """ This method implements a rank filter using Numpy.
+
+        A structuring element made of consecutive offsets is applied by :func:`moving_rank`, else the
+        translated functions are reduced.  The result is the same than :meth:`_rank_filter_loop`.
+
+        The function is modified in-place.
+        """
+
+        offsets = np.array(list(structuring_element), dtype=int)
+        lower = offsets.min()
+        upper = offsets.max()
+
+        if np.array_equal(np.sort(offsets), np.arange(lower, upper +1)):
+            self.values = moving_rank(self.values, lower, upper, rank_operator)
+        else:
+            ufunc = _rank_ufunc(rank_operator)
+            size = len(self)
+            left = max(0, -lower)
+            padded = _pad(self.values, left, max(0, upper), _neutral_value(self.values.dtype, ufunc))
+            new_values = None
+            for offset in offsets:
+                translated = padded[left+offset:left+offset+size]
+                if new_values is None:
+                    new_values = translated.copy()
+                else:
+                    ufunc(new_values, translated, out=new_values)
+            self.values = new_values
+
+    ##############################################
+
+    def _rank_filter_loop(self, structuring_element, rank_operator):
+
+        """ This method implements a rank filter using Python loops, it is the reference
+        implementation.
 
         The function is modified in-place.
         """
@@ -394,20 +547,32 @@ class Function(object):
 
     ##############################################
 
-    def erode(self, structuring_element):
+    def erode(self, structuring_element, vectorised=True):
 
-        """ Perform an erosion. """
+        """ Perform an erosion.
 
-        self._rank_filter(structuring_element, rank_operator=min)
+        If *vectorised* is False, the reference implementation is used.
+        """
+
+        if vectorised:
+            self._rank_filter(structuring_element, rank_operator=min)
+        else:
+            self._rank_filter_loop(structuring_element, rank_operator=min)
         return self
 
     ##############################################
 
-    def dilate(self, structuring_element):
+    def dilate(self, structuring_element, vectorised=True):
 
-        """ Perform a dilation. """
+        """ Perform a dilation.
+
+        If *vectorised* is False, the reference implementation is used.
+        """
 
-        self._rank_filter(structuring_element, rank_operator=max)
+        if vectorised:
+            self._rank_filter(structuring_element, rank_operator=max)
+        else:
+            self._rank_filter_loop(structuring_element, rank_operator=max)
         return self
 
     ##############################################
@@ -479,8 +644,8 @@ class Function(object):
         The function is modified in-place.
          """
 
-        for i in self.domain.forward_iterator():
-            self[i] = rank_operator(self[i], other[i])
+        ufunc = _rank_ufunc(rank_operator)
+        ufunc(self.values, self._as_array(other), out=self.values)
         return self
 
     ##############################################
@@ -501,9 +666,61 @@ class Function(object):
 
     ##############################################
 
-    def geodesic_reconstruction(self, marker):
+    def geodesic_reconstruction(self, marker, iterative=False):
+
+        """ Perform a geodesic reconstruction.
+
+        The reconstruction is computed using the hybrid algorithm described in the article:
+        Morphological Grayscale Reconstruction in Image Analysis: Applications and Efficient
+        Algorithms, Luc Vincent, IEEE Transactions on image processing, Vol. 2, No. 2, April 1993.
+        A forward and a backward scan propagate the marker, then the pixels which can still
+        propagate are processed using a FIFO queue.  The cost is nearly linear.
+
+        If *iterative* is set, the elementary dilation and point-wise min are repeated until
+        stability, it is the reference implementation.
+        """
+
+        if iterative:
+            return self._geodesic_reconstruction_iterative(marker)
+
+        # first iteration of the reference implementation, thus the marker is below the mask
+        reconstruction = marker.clone().dilate(self.unit_ball).pointwise_min(self)
+
+        mask = self.values.tolist()
+        values = reconstruction.values.tolist()
+        size = len(values)
+
+        # forward scan
+        for i in range(1, size):
+            if values[i-1] > values[i]:
+                values[i] = min(values[i-1], mask[i])
+
+        # backward scan
+        queue = deque()
+        for i in range(size -2, -1, -1):
+            if values[i+1] > values[i]:
+                values[i] = min(values[i+1], mask[i])
+            j = i + 1
+            if values[j] < values[i] and values[j] < mask[j]:
+                queue.append(i)
+
+        # propagation
+        while queue:
+            i = queue.popleft()
+            value = values[i]
+            for j in (i -1, i +1):
+                if 0 <= j < size and values[j] < value and values[j] != mask[j]:
+                    values[j] = min(value, mask[j])
+                    queue.append(j)
+
+        reconstruction.values[...] = values
+        return reconstruction
+
+    ##############################################
+
+    def _geodesic_reconstruction_iterative(self, marker):
 
-        """ Perform a geodesic reconstruction. """
+        """ Perform a geodesic reconstruction by iterating elementary geodesic dilations. """
 
         mask = self
         prev_reconstruction = None
@@ -534,7 +751,21 @@ class Function(object):
 
     def _rank_filter_vhgw(self, radius, rank_operator):
 
-        """ This method implements a rank filter using the Van Herk & Gill-Werman algorithm.
+        """ This method implements a rank filter using a vectorised Van Herk & Gill-Werman algorithm,
+        see :func:`moving_rank`.
+
+        The function is modified in-place.
+        """
+
+        self.values = moving_rank(self.values, -radius, radius, rank_operator, vhgw=True)
+        return self
+
+    ##############################################
+
+    def _rank_filter_vhgw_loop(self, radius, rank_operator):
+
+        """ This method implements a rank filter using the Van Herk & Gill-Werman algorithm, it is the
+        reference implementation.
 
         This algorithm comes from C. Clienti, M. Bilodeau, and S. Beucher, An Efficient Hardware
         Architecture without Line Memories for Morphological Image Processing.  In Proceedings of
@@ -593,16 +824,28 @@ class Function(object):
 
     ##############################################
 
-    def dilate_vhgw(self, radius):
+    def dilate_vhgw(self, radius, vectorised=True):
+
+        """ Perform a dilation using the WHGW algorithm.
 
-        """ Perform a dilation using the WHGW algorithm. """
+        If *vectorised* is False, the reference implementation is used.
+        """
 
-        return self._rank_filter_vhgw(radius, rank_operator=max)
+        if vectorised:
+            return self._rank_filter_vhgw(radius, rank_operator=max)
+        else:
+            return self._rank_filter_vhgw_loop(radius, rank_operator=max)
 
     ##############################################
 
-    def erode_vhgw(self, radius):
+    def erode_vhgw(self, radius, vectorised=True):
 
-        """ Perform an erosion using the WHGW algorithm. """
+        """ Perform an erosion using the WHGW algorithm.
 
-        return self._rank_filter_vhgw(radius, rank_operator=min)
+        If *vectorised* is False, the reference implementation is used.
+        """
+
+        if vectorised:
+            return self._rank_filter_vhgw(radius, rank_operator=min)
+        else:
+            return self._rank_filter_vhgw_loop(radius, rank_operator=min)
@@ -35,6 +35,8 @@ __all__ = [
 
 ####################################################################################################
 
+import numpy as np
+
 from ..Locale.Note import translate_et12_note
 from ..Math.MusicTheory import ET12Tuning
 from .NoteTools import flatten_note, sharpen_note
@@ -126,6 +128,40 @@ class EqualTemperament:
 
         return self._fundamental * self._compute_scale(octave, step_number)
 
+    ##############################################
+
+    def fractional_step_numbers(self, frequencies):
+
+        """Return the number of steps from C0 of an array of frequencies as a float array."""
+
+        frequencies = np.asarray(frequencies, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self._number_of_steps * np.log2(frequencies / self._fundamental)
+
+    ##############################################
+
+    def nearest_steps(self, frequencies):
+
+        """Return the nearest pitches of an array of frequencies in closed form.
+
+        Return a tuple of arrays ``(step_number, octave, midi, cents)`` where *step_number* ranges
+        from 0 to the number of steps minus one, *octave* uses the scientific pitch notation, *midi*
+        is the MIDI number for which C0 is 12, and *cents* is the deviation from the nearest pitch in
+        cents of the temperament.  Non-positive frequencies have a NaN deviation and a meaningless
+        pitch.
+
+        """
+
+        steps = self.fractional_step_numbers(frequencies)
+        invalid = ~np.isfinite(steps)
+        nearest_steps = np.round(np.where(invalid, 0, steps))
+        cents = np.where(invalid, np.nan, steps - nearest_steps) * (1200 / self._number_of_steps)
+        nearest_steps = nearest_steps.astype(int)
+        octaves, step_numbers = np.divmod(nearest_steps, self._number_of_steps)
+        midi = nearest_steps + self._number_of_steps
+
+        return step_numbers, octaves, midi, cents
+
 ####################################################################################################
 
 class TemperamentStep:
@@ -300,6 +336,9 @@ class UsualEqualTemperament(EqualTemperament):
         # Map note name -> step
         self._name_to_step = {step.name:step for step in self._natural_steps}
 
+        # Arrays of step names for vectorised lookup, see step_names
+        self._name_tables = {}
+
         # Map step number -> step
         self._steps = [None]*self._number_of_steps
         for step in self._natural_steps:
@@ -398,6 +437,58 @@ class UsualEqualTemperament(EqualTemperament):
     def name_to_number(self, name):
         return self.by_name(name).step_number
 
+    ##############################################
+
+    def _name_table(self, flat):
+
+        # built on first request
+        table = self._name_tables.get(flat, None)
+        if table is None:
+            names = []
+            for step in self._steps:
+                if step.is_natural:
+                    names.append(step.name)
+                elif flat:
+                    names.append(step.flatten_name)
+                else:
+                    names.append(step.sharpen_name)
+            table = np.array(names)
+            self._name_tables[flat] = table
+        return table
+
+    ##############################################
+
+    def step_names(self, step_numbers, flat=False):
+
+        """Return the names of an array of step numbers, accidentals are sharpened unless *flat* is
+        set.
+
+        """
+
+        return self._name_table(flat)[np.asarray(step_numbers)]
+
+    ##############################################
+
+    def pitch_names(self, step_numbers, octaves, flat=False):
+
+        """Return the names of pitches given by arrays of step numbers and octaves, e.g. 'C#4'.
+
+        A negative octave is written with a '/' as :class:`Musica.Theory.Pitch.Pitch` does,
+        e.g. 'F/-1', since '-' is the flat sign.
+
+        """
+
+        step_numbers = np.asarray(step_numbers)
+        octaves = np.asarray(octaves)
+        if octaves.size == 0:
+            return np.array([], dtype=str)
+        # concatenate the names once per pitch of the octave range, then look up the table
+        minimum_octave = int(octaves.min())
+        octave_names = np.array([('/' if octave < 0 else '') + str(octave)
+                                 for octave in range(minimum_octave, int(octaves.max()) + 1)])
+        table = np.char.add(self._name_table(flat)[np.newaxis,:], octave_names[:,np.newaxis]).ravel()
+        return table[(octaves - minimum_octave) * self._number_of_steps + step_numbers]
+
 ####################################################################################################
 
 #: Twelve-tone equal temperament, also known as 12 equal temperament, 12-TET, or 12-ET
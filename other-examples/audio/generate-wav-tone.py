@@ -28,149 +28,29 @@
 ####################################################################################################
 
 import argparse
-import wave
 
-import numpy as np
-
-####################################################################################################
-
-class ToneGenerator:
-
-    ##############################################
-
-    def __init__(self,
-                frequency=440, # Hz LA3 A4
-                amplitude=1.,
-    ):
-
-        self._frequency = frequency
-        self._amplitude = amplitude
-
-    ##############################################
-
-    def generate(self, times):
-
-        pulsation = 2 * np.pi * self._frequency
-        pcm = self._amplitude * np.sin(pulsation * times)
-        return pcm
-
-####################################################################################################
-
-class WavFile:
-
-    ##############################################
-
-    def __init__(self,
-                 sample_rate=44100, # Hz
-                 number_of_bits=16,
-                 number_of_channels=2,
-                 duration=1, # s
-                 rise_time=100, # ms
-                 fall_time=100,
-    ):
-
-        self._sample_rate = sample_rate
-        self._number_of_bits = number_of_bits
-        self._number_of_channels = number_of_channels
-        self._duration = duration
-        self._rise_time = rise_time
-        self._fall_time = fall_time
-
-        self._sampling_period = 1 / self._sample_rate
-
-    ##############################################
-
-    def make_t(self, i_start, i_stop):
-
-        # stop = start + size * self._sampling_period
-        # times = np.arange(start, stop, self._sampling_period)
-        # return times[:size]
-
-        # return np.arange(start, stop, self._sampling_period)
-
-        return np.arange(i_start, i_stop) *  self._sampling_period
-
-    ##############################################
-
-    def encode_frames(self, pcm, to_stereo=False):
-
-        if self._number_of_bits:
-            dtype = '<i2'
-        else:
-            raise NotImplementedError
-
-        mono_frames = np.array(pcm, dtype=dtype)
-        if to_stereo:
-            stereo_frames = np.zeros(2 * mono_frames.size, dtype=dtype)
-            stereo_frames[0:-1:2] = mono_frames
-            stereo_frames[1::2] = mono_frames
-            frames = stereo_frames
-        else:
-            frames = mono_frames
-
-        return frames.tobytes('C')
-
-    ##############################################
-
-    def make_wave(self, path, tone_generator):
-
-        wave_file = wave.open(path, 'wb')
-
-        sample_width = self._number_of_bits // 8
-        number_of_frames = int(self._sample_rate * self._duration)
-        # (nchannels, sampwidth, framerate, nframes, comptype, compname)
-        wave_file.setparams((self._number_of_channels,
-                             sample_width,
-                             self._sample_rate,
-                             number_of_frames,
-                             'NONE',
-                             'not compressed'))
-
-        # 16-bit = 32767
-        amplitude_max = 2 ** self._number_of_bits // 2 - 1
-
-        chunk_size = 10000
-        time_window = chunk_size * self._sampling_period
-        for chunk in range(number_of_frames // 1000 + 2):
-            i_start = chunk * chunk_size
-            i_stop = i_start + chunk_size
-            start = i_start * self._sampling_period
-            stop = min(i_stop * self._sampling_period, self._duration)
-            i_stop = int(stop / self._sampling_period)
-            times = self.make_t(i_start, i_stop)
-            # print(chunk, i_start, i_stop,  stop, times)
-            pcm = tone_generator.generate(times)
-            if start < self._rise_time:
-                pcm *= np.minimum(times / self._rise_time, np.ones(times.size))
-            if stop > self._duration - self._fall_time:
-                pcm *= np.minimum(- (times - self._duration) / self._fall_time, np.ones(times.size))
-            pcm *= amplitude_max
-            frames = self.encode_frames(pcm, to_stereo=self._number_of_channels == 2)
-            wave_file.writeframes(frames) # writeframesraw
-            if stop == self._duration:
-                break
-
-        wave_file.close()
+from Musica.Audio.Synthesis import AdditiveSynthesizer, Envelope, Note
 
 ####################################################################################################
 
 if __name__ == "__main__":
 
-    # cut at 14.7 kHz ???
-
     argument_parser = argparse.ArgumentParser()
 
     argument_parser.add_argument('-r', '--rate', help="Sample rate in Hz",
                                  type=int, default=44100)
 
     argument_parser.add_argument('-b', '--bits', help="Number of bits in each sample",
-                                 type=int, choices=(16,), default=16)
+                                 type=int, choices=(16, 24, 32), default=16)
+
+    argument_parser.add_argument('--float', help="Write 32-bit float samples",
+                                 action='store_true', default=False)
 
     argument_parser.add_argument('-c', '--channels', help="Number of channels to produce",
                                  type=int, default=2)
 
     argument_parser.add_argument('-t', '--time', help="Duration of the wave in ms.",
-                                 type=float, default=1.)
+                                 type=float, default=1000.)
 
     argument_parser.add_argument('-rt', '--rise-time', help="Rise time in ms.",
                                  type=float, default=100.)
@@ -181,23 +61,33 @@ if __name__ == "__main__":
     argument_parser.add_argument('-a', '--amplitude', help="Amplitude of the wave on a scale of 0.0-1.0.",
                                  type=float, default=1,)
 
-    argument_parser.add_argument('-f', '--frequency', help="Frequency of the wave in Hz",
-                                 type=float, default=440.0) # LA3 A4
+    argument_parser.add_argument('-f', '--frequency', help="Frequency of the wave in Hz or pitch name",
+                                 default='440') # LA3 A4
+
+    argument_parser.add_argument('-p', '--partials', help="Number of partials",
+                                 type=int, default=1)
+
+    argument_parser.add_argument('-B', '--inharmonicity', help="Inharmonicity coefficient",
+                                 type=float, default=0)
 
     argument_parser.add_argument('filename', help="The file to generate.")
 
     args = argument_parser.parse_args()
 
-    wav_file = WavFile(
-        sample_rate=args.rate,
-        number_of_bits=args.bits,
-        number_of_channels=args.channels,
-        duration=args.time / 1000,
-        rise_time=args.rise_time / 1000,
-        fall_time=args.fall_time / 1000,
-    )
-    tone_generator = ToneGenerator(
-        frequency=args.frequency,
-        amplitude=args.amplitude,
+    try:
+        pitch = float(args.frequency)
+    except ValueError:
+        pitch = args.frequency
+
+    fall_time = args.fall_time / 1000
+    synthesizer = AdditiveSynthesizer(
+        sampling_frequency=args.rate,
+        number_of_partials=args.partials,
+        inharmonicity=args.inharmonicity,
+        envelope=Envelope(attack=args.rise_time / 1000, decay=0, sustain=1, release=fall_time),
     )
-    wav_file.make_wave(args.filename, tone_generator)
+    note = Note(pitch, duration=args.time / 1000 - fall_time, amplitude=args.amplitude)
+    synthesizer.write(args.filename, note,
+                      number_of_channels=args.channels,
+                      bits_per_sample=32 if args.float else args.bits,
+                      is_float=args.float)
@@ -44,6 +44,8 @@ setup_dict.extend(dict(
     packages=find_packages(exclude=['unit-test']),
     scripts=[
         'bin/make-figure',
+        'bin/musica-find-pitch',
+        'bin/musica-tuner',
     ],
     package_data={
         'Musica.Config': ['logging.yml'],
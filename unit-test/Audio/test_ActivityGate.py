@@ -0,0 +1,73 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from Musica.Audio.ActivityGate import ActivityGate, frame_energy
+from Musica.Audio.PitchTracker import StreamingPitchTracker
+from Musica.Audio.Spectrogram import Spectrogram
+
+####################################################################################################
+
+class TestActivityGate(unittest.TestCase):
+
+    ##############################################
+
+    def test_gate(self):
+
+        sampling_frequency = 8000
+        times = np.arange(sampling_frequency) / sampling_frequency
+        values = .5 * np.sin(2 * np.pi * 440 * times)
+        # silence in the middle
+        values[2000:6000] = 1e-5 * np.random.RandomState(0).normal(size=4000)
+
+        frames = Spectrogram.frame(values, 512, 256)
+        np.testing.assert_allclose(frame_energy(values, 512, 256), np.mean(frames**2, axis=-1), atol=1e-12)
+
+        gate = ActivityGate(-60)
+        active = gate.active_frames(values, 512, 256)
+        np.testing.assert_array_equal(active, gate.is_active(frames))
+        self.assertFalse(np.any(active[8:22]))
+        self.assertTrue(np.all(active[:6]) and np.all(active[24:]))
+
+        spectrogram = Spectrogram(sampling_frequency, values, 512, 256)
+        gated_spectrogram = Spectrogram(sampling_frequency, values, 512, 256, gate=gate)
+        np.testing.assert_array_equal(gated_spectrogram.active, active)
+        np.testing.assert_allclose(gated_spectrogram.fft[active], spectrogram.fft[active])
+        self.assertFalse(np.any(gated_spectrogram.fft[~active]))
+        self.assertTrue(np.all(np.isnan(gated_spectrogram.fundamental_frequencies()[~active])))
+
+        tracker = StreamingPitchTracker(sampling_frequency, number_of_samples=1024, hop=512, gate=gate)
+        results = tracker.feed(values)
+        confidences = np.array([confidence for timestamp, frequency, confidence in results])
+        self.assertTrue(np.all(confidences[5:10] == 0))
+        self.assertTrue(np.all(confidences[:2] > 0))
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
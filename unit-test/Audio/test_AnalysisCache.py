@@ -0,0 +1,155 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import os
+import tempfile
+import unittest
+import wave
+
+import numpy as np
+
+####################################################################################################
+
+from Musica.Audio.AnalysisCache import AnalysisCache
+from Musica.Audio.AudioFormat import AudioFormat
+from Musica.Audio.FindPitch import find_pitch
+
+####################################################################################################
+
+class TestAnalysisCache(unittest.TestCase):
+
+    ##############################################
+
+    def setUp(self):
+
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, 'test.wav')
+        self._cache = AnalysisCache(os.path.join(self._directory.name, 'cache'))
+        self._write(440)
+
+    ##############################################
+
+    def tearDown(self):
+
+        self._directory.cleanup()
+
+    ##############################################
+
+    def _write(self, frequency):
+
+        sampling_frequency = 8000
+        times = np.arange(sampling_frequency) / sampling_frequency
+        values = (np.sin(2 * np.pi * frequency * times) * 2**14).astype('<i2')
+        wave_file = wave.open(self._path, 'wb')
+        wave_file.setparams((1, 2, sampling_frequency, 0, 'NONE', 'not compressed'))
+        wave_file.writeframes(values.tobytes())
+        wave_file.close()
+
+    ##############################################
+
+    def test_spectrum(self):
+
+        audio = AudioFormat.open(self._path, cache=self._cache)
+        spectrum = audio.spectrum(0, number_of_samples=1024)
+        # the entry and the content hash file
+        self.assertEqual(self._cache.size, spectrum.fft.nbytes + 128 + 32)
+        cached_spectrum = audio.spectrum(0, number_of_samples=1024)
+        self.assertIsInstance(cached_spectrum.fft, np.memmap)
+        np.testing.assert_array_equal(cached_spectrum.fft, spectrum.fft)
+
+        spectrogram = audio.spectrogram(0, 1024)
+        cached_spectrogram = audio.spectrogram(0, 1024, hop=512)
+        self.assertIsInstance(cached_spectrogram.fft, np.memmap)
+        np.testing.assert_array_equal(cached_spectrogram.power, spectrogram.power)
+
+    ##############################################
+
+    def test_invalidation(self):
+
+        result = find_pitch(self._path, method='yin', cache=self._cache)[0]
+        self.assertEqual(result['pitch'], 'A4')
+        self.assertEqual(find_pitch(self._path, method='yin', cache=self._cache.path)[0], result)
+
+        self._write(880)
+        # make sure the modification time changes
+        stat = os.stat(self._path)
+        os.utime(self._path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(find_pitch(self._path, method='yin', cache=self._cache)[0]['pitch'], 'A5')
+
+    ##############################################
+
+    def test_eviction(self):
+
+        for i in range(4):
+            self._cache.save(self._path, 'test', np.zeros(1000), index=i)
+            # set the last use explicitly so as the order doesn't depend on the clock resolution
+            entry_path = self._cache._entry_path(self._path, 'test', dict(index=i), '.npy')
+            os.utime(entry_path, ns=(i * 10**9, i * 10**9))
+        entry_size = os.path.getsize(entry_path)
+        # the content hash file is counted
+        hash_size = self._cache.size - 4 * entry_size
+        self.assertGreater(hash_size, 0)
+        self._cache.evict(2 * entry_size + hash_size)
+        self.assertIsNone(self._cache.load(self._path, 'test', index=0))
+        self.assertIsNotNone(self._cache.load(self._path, 'test', index=3))
+        self._cache.clear()
+        self.assertEqual(self._cache.size, 0)
+
+    ##############################################
+
+    def test_running_size(self):
+
+        number_of_scans = 0
+        entries = self._cache._entries
+        def count_scans():
+            nonlocal number_of_scans
+            number_of_scans += 1
+            return entries()
+        self._cache._entries = count_scans
+
+        # the directory is scanned once, then only when the cache is full
+        for i in range(10):
+            self._cache.save(self._path, 'test', np.zeros(1000), index=i)
+        self.assertEqual(number_of_scans, 1)
+
+        cache = AnalysisCache(self._cache.path, maximum_size=self._cache.size // 2)
+        cache.save(self._path, 'test', np.zeros(1000), index=10)
+        self.assertLessEqual(cache.size, cache.maximum_size * cache.EVICTION_RATIO)
+
+        # a full cache is trimmed below its maximum size, thus it isn't scanned on each save
+        # array and .npy header
+        entry_size = np.zeros(1000).nbytes + 128
+        cache = AnalysisCache(self._cache.path, maximum_size=40 * entry_size)
+        cache._entries = count_scans
+        for i in range(100):
+            if i == 50:
+                number_of_scans = 0
+            cache.save(self._path, 'test', np.zeros(1000), index=100 + i)
+        self.assertLessEqual(cache.size, cache.maximum_size)
+        # an eviction removes at least 4 entries
+        self.assertLessEqual(number_of_scans, 50 // 4 + 1)
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
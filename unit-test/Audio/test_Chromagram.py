@@ -0,0 +1,78 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from Musica.Audio.Chromagram import Chromagram, pitch_class_mapping
+from Musica.Audio.ConstantQ import ConstantQTransform
+from Musica.Audio.Spectrogram import Spectrogram
+from Musica.Theory.Pitch import Pitch
+
+####################################################################################################
+
+class TestChromagram(unittest.TestCase):
+
+    ##############################################
+
+    def test_chromagram(self):
+
+        sampling_frequency = 11025
+        times = np.arange(sampling_frequency) / sampling_frequency
+        values = sum(np.sin(2 * np.pi * Pitch(name).frequency * times) for name in ('C4', 'E4', 'G4'))
+        expected = np.zeros(12, dtype=bool)
+        expected[[0, 4, 7]] = True
+
+        chromagram = Chromagram()
+        spectrogram = Spectrogram(sampling_frequency, values, 4096, 2048)
+        chroma = chromagram.from_spectrogram(spectrogram)
+        self.assertEqual(chroma.shape, (spectrogram.number_of_frames, 12))
+        self.assertTrue(np.all((chroma > .5) == expected))
+
+        transform = ConstantQTransform(sampling_frequency, Pitch('C3'), Pitch('C6'), bins_per_step=3)
+        times, magnitude = transform.transform_signal(values, transform.fft_size // 2)
+        chroma = chromagram.from_constant_q(transform, magnitude)
+        self.assertTrue(np.all((chroma > .5) == expected))
+
+    ##############################################
+
+    def test_fold(self):
+
+        chromagram = Chromagram(minimum_frequency=100, maximum_frequency=3000, normalisation=None)
+        power = np.random.RandomState(0).uniform(size=(3, 1025))
+        chroma = chromagram.fold(power, 2048, 11025)
+        pitch_classes = pitch_class_mapping(2048, 11025, chromagram.temperament, 100, 3000)[0]
+        expected = np.stack([power[:, pitch_classes == i].sum(axis=-1) for i in range(12)], axis=-1)
+        np.testing.assert_allclose(chroma, expected)
+
+        # empty frequency range
+        chromagram = Chromagram(minimum_frequency=1, maximum_frequency=2, normalisation=None)
+        self.assertFalse(np.any(chromagram.fold(power, 2048, 11025)))
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
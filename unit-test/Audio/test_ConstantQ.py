@@ -0,0 +1,70 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from Musica.Audio.ConstantQ import ConstantQTransform
+from Musica.Theory.Pitch import Pitch
+
+####################################################################################################
+
+class TestConstantQ(unittest.TestCase):
+
+    ##############################################
+
+    def test_transform(self):
+
+        sampling_frequency = 11025
+        transform = ConstantQTransform(sampling_frequency, Pitch('C3'), Pitch('C6'), bins_per_step=2)
+        self.assertEqual(transform.number_of_bins, 3*12*2 + 1)
+        self.assertAlmostEqual(transform.frequencies[0], Pitch('C3').frequency)
+        self.assertAlmostEqual(transform.frequencies[-1], Pitch('C6').frequency)
+        self.assertIs(ConstantQTransform(sampling_frequency, Pitch('C3'), Pitch('C6'), bins_per_step=2)._values,
+                      transform._values)
+
+        frequency = Pitch('A4').frequency
+        values = np.sin(2 * np.pi * frequency * np.arange(3 * transform.fft_size) / sampling_frequency)
+        times, magnitude = transform.transform_signal(values, transform.fft_size // 2)
+        self.assertEqual(magnitude.shape, (5, transform.number_of_bins))
+        i_max = np.argmax(magnitude, axis=-1)
+        self.assertTrue(np.all(transform.step_numbers[i_max] == 4*12 + 9))
+
+        # the frames are processed by batches
+        frames = np.random.default_rng(0).normal(size=(10, transform.fft_size))
+        fft = np.fft.rfft(frames, axis=-1)
+        expected = np.add.reduceat(fft[:, transform._columns] * transform._values, transform._row_starts, axis=-1)
+        transform.BATCH_SIZE = 3
+        self.assertTrue(np.allclose(transform.transform(frames), expected))
+        self.assertTrue(np.allclose(transform.transform(frames[4]), expected[4]))
+        values = frames.ravel()
+        _, magnitude = transform.transform_signal(values, transform.fft_size)
+        self.assertTrue(np.allclose(magnitude, np.abs(expected)))
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
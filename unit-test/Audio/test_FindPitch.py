@@ -0,0 +1,121 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+####################################################################################################
+
+from Musica.Audio.AnalysisCache import AnalysisCache
+from Musica.Audio.AudioFormat import AudioFormat
+from Musica.Audio.FindPitch import find_files, find_pitch, find_pitches
+
+####################################################################################################
+
+class TestFindPitch(unittest.TestCase):
+
+    ##############################################
+
+    def setUp(self):
+
+        self._directory = tempfile.TemporaryDirectory()
+        directory = self._directory.name
+        os.mkdir(os.path.join(directory, 'sub'))
+        sampling_frequency = 8000
+        times = np.arange(sampling_frequency) / sampling_frequency
+        tone = sum(np.sin(2 * np.pi * 220 * i * times) / (2*i) for i in range(1, 6))
+        self._paths = []
+        for filename, values in (
+                ('a.wav', tone),
+                ('sub/b.wav', np.zeros(sampling_frequency)),
+        ):
+            path = os.path.join(directory, filename)
+            AudioFormat.write(path, [values], sampling_frequency)
+            self._paths.append(path)
+        with open(os.path.join(directory, 'sub', 'notes.txt'), 'w') as text_file:
+            text_file.write('not audio')
+
+    ##############################################
+
+    def tearDown(self):
+
+        self._directory.cleanup()
+
+    ##############################################
+
+    def test_find_files(self):
+
+        directory = self._directory.name
+        self.assertEqual(list(find_files([directory])), self._paths)
+        self.assertEqual(list(find_files([os.path.join(directory, '**', '*.wav')])), self._paths)
+        self.assertEqual(list(find_files([os.path.join(directory, '*.flac')])), [])
+        missing_path = os.path.join(directory, 'missing.wav')
+        self.assertEqual(list(find_files([self._paths[1], missing_path])), [self._paths[1], missing_path])
+
+    ##############################################
+
+    def test_find_pitches(self):
+
+        missing_path = os.path.join(self._directory.name, 'missing.wav')
+        paths = self._paths + [missing_path]
+        for method in ('hps', 'yin', 'autocorrelation'):
+            refines = ('phase-vocoder', 'quadratic', None) if method == 'hps' else (None,)
+            for refine in refines:
+                results = list(find_pitches(paths, max_workers=2, chunksize=1, method=method, refine=refine))
+                self.assertEqual([result[0]['file'] for result in results], paths)
+
+                tone, silence, missing = [result[0] for result in results]
+                self.assertEqual(tone['pitch'], 'A3')
+                self.assertLess(abs(tone['cents']), 10)
+                self.assertGreater(tone['confidence'], .5)
+
+                self.assertIsNone(silence['frequency'])
+                self.assertIsNone(silence['pitch'])
+                self.assertIsNone(silence['cents'])
+                self.assertEqual(silence['confidence'], 0)
+
+                self.assertIn('error', missing)
+
+        self.assertIsNone(find_pitch(self._paths[0], minimum_confidence=2)[0]['pitch'])
+
+    ##############################################
+
+    def test_cache_directory(self):
+
+        # the cache of a directory is shared by the calls, thus the directory is scanned once
+        cache_path = os.path.join(self._directory.name, 'cache')
+        with mock.patch.object(AnalysisCache, '_entries', autospec=True,
+                               side_effect=AnalysisCache._entries) as entries:
+            for i in range(3):
+                for path in self._paths:
+                    find_pitch(path, method='yin', cache=cache_path, start=i * .1)
+        self.assertEqual(entries.call_count, 1)
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,76 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from Musica.Audio.Onset import OnsetDetector, segment_pitches
+from Musica.Audio.PitchDetection import PitchDetector
+from Musica.Audio.Spectrogram import Spectrogram
+from Musica.Audio.Synthesis import AdditiveSynthesizer, Envelope, Note
+
+####################################################################################################
+
+class TestOnset(unittest.TestCase):
+
+    ##############################################
+
+    def test_onsets(self):
+
+        sampling_frequency = 11025
+        synthesizer = AdditiveSynthesizer(sampling_frequency, envelope=Envelope(.005, .2, .3, .1))
+        pitches = ('C4', 'E4', 'G4', 'A3', 'A3')
+        notes = [Note(pitch, .5 * i, .4) for i, pitch in enumerate(pitches)]
+        values = np.concatenate(list(synthesizer.render(notes)))
+        values += 1e-3 * np.random.RandomState(0).normal(size=values.size)
+
+        detector = OnsetDetector(sampling_frequency, number_of_samples=1024, hop=256)
+        onsets = detector.detect(values)
+        self.assertEqual(onsets.size, len(notes))
+        np.testing.assert_allclose(onsets / sampling_frequency, [note.start for note in notes], atol=.05)
+
+        # streaming by blocks of any size gives the same onsets
+        blocks = [detector.feed(values[i:i + 777]) for i in range(0, values.size, 777)]
+        np.testing.assert_array_equal(np.concatenate(blocks + [detector.flush()]), onsets)
+
+        spectrogram = Spectrogram(sampling_frequency, values, 1024, 256)
+        np.testing.assert_array_equal(detector.detect_spectrogram(spectrogram), onsets)
+        # zero padded frames
+        detector = OnsetDetector(sampling_frequency, number_of_samples=1000, hop=256)
+        spectrogram = Spectrogram(sampling_frequency, values, 1000, 256, fft_size=1024)
+        np.testing.assert_allclose(detector.detect_spectrogram(spectrogram) / sampling_frequency,
+                                   [note.start for note in notes], atol=.05)
+
+        segments = detector.segments(onsets, values.size)
+        self.assertEqual(segments[-1,1], values.size)
+        pitch_detector = PitchDetector.create('yin', sampling_frequency)
+        frequencies, confidences = segment_pitches(values, segments, pitch_detector, 1024, 512)
+        np.testing.assert_allclose(frequencies, [note.frequency for note in notes], rtol=.01)
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,77 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from Musica.Audio.Partials import PartialTracker, fit_inharmonicity
+from Musica.Audio.Synthesis import AdditiveSynthesizer, Envelope, Note
+
+####################################################################################################
+
+class TestPartials(unittest.TestCase):
+
+    ##############################################
+
+    def test_fit(self):
+
+        ranks = np.arange(1, 9)
+        frequencies = np.stack([ranks * 100 * np.sqrt(1 + 1e-3 * ranks**2),
+                                ranks * 50 * np.sqrt(1 + 2e-4 * ranks**2)])[:,np.newaxis,:]
+        frequencies[1,0,3] = np.nan
+        fundamentals, inharmonicities = fit_inharmonicity(frequencies)
+        np.testing.assert_allclose(fundamentals, [100, 50])
+        np.testing.assert_allclose(inharmonicities, [1e-3, 2e-4])
+
+        fundamentals, inharmonicities = fit_inharmonicity(np.full((1, 3), np.nan))
+        self.assertTrue(np.isnan(fundamentals) and np.isnan(inharmonicities))
+
+    ##############################################
+
+    def test_analyse(self):
+
+        sampling_frequency = 11025
+        parameters = (('E2', 1e-4), ('A2', 5e-4), ('G3', 1e-3))
+        signals = []
+        for pitch, inharmonicity in parameters:
+            synthesizer = AdditiveSynthesizer(sampling_frequency,
+                                              number_of_partials=12,
+                                              inharmonicity=inharmonicity,
+                                              envelope=Envelope(.005, .1, .5, .1))
+            signals.append(np.concatenate(list(synthesizer.render(Note(pitch, 0, 1)))))
+        # the last recording is shorter and zero padded
+        signals[-1][sampling_frequency // 2:] = 0
+
+        tracker = PartialTracker(sampling_frequency, number_of_samples=4096, number_of_partials=8)
+        fundamentals, inharmonicities, frequencies, amplitudes = tracker.analyse(np.stack(signals))
+        self.assertEqual(frequencies.shape[0::2], (3, 8))
+        np.testing.assert_allclose(fundamentals, [Note(pitch).frequency for pitch, B in parameters], rtol=1e-3)
+        np.testing.assert_allclose(inharmonicities, [B for pitch, B in parameters], rtol=.05)
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,65 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from Musica.Audio.PitchDetection import PitchDetector
+
+####################################################################################################
+
+class TestPitchDetection(unittest.TestCase):
+
+    ##############################################
+
+    def test_detectors(self):
+
+        sampling_frequency = 8000
+        frequency = 110
+        times = np.arange(2048 + 3*256) / sampling_frequency
+        values = sum(np.sin(2 * np.pi * frequency * i * times + i) / i for i in range(1, 6))
+        frames = np.array([values[i*256:i*256+2048] for i in range(4)])
+
+        self.assertEqual(PitchDetector.methods(), ['autocorrelation', 'hps', 'yin'])
+
+        for method, tolerance in (('hps', 10), ('autocorrelation', 5), ('yin', 1)):
+            detector = PitchDetector.create(method, sampling_frequency, minimum_frequency=50, maximum_frequency=1000)
+            frequencies, confidences = detector.detect(frames)
+            self.assertEqual(frequencies.shape, (4,))
+            cents = 1200 * np.log2(frequencies / frequency)
+            self.assertTrue(np.all(np.abs(cents) < tolerance), (method, cents))
+            self.assertTrue(np.all((0 <= confidences) & (confidences <= 1)))
+            # a single frame
+            frequency0, confidence0 = detector.detect(frames[0])
+            self.assertAlmostEqual(frequency0, frequencies[0])
+
+        with self.assertRaises(ValueError):
+            PitchDetector.create('foo', sampling_frequency)
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,75 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from Musica.Audio.PitchTracker import StreamingPitchTracker
+
+####################################################################################################
+
+class TestPitchTracker(unittest.TestCase):
+
+    ##############################################
+
+    def test_feed(self):
+
+        sampling_frequency = 8000
+        times = np.arange(sampling_frequency) / sampling_frequency
+        values = sum(np.sin(2 * np.pi * 220 * i * times) / i for i in range(1, 6))
+
+        tracker = StreamingPitchTracker(sampling_frequency, number_of_samples=1024, hop=256)
+        results = tracker.feed(values)
+        self.assertEqual(len(results), (values.size - 1024) // 256 + 1)
+        for timestamp, frequency, confidence in results:
+            # the peak is refined by interpolation, thus the error is a fraction of a bin
+            self.assertLess(abs(1200 * np.log2(frequency / 220)), 5)
+
+        # the block size doesn't matter
+        tracker.reset()
+        block_results = []
+        for start in range(0, values.size, 100):
+            block_results += tracker.feed(values[start:start+100])
+        self.assertTrue(np.allclose(block_results, results))
+
+    ##############################################
+
+    def test_cents(self):
+
+        # G3 is at the middle of two bins with the default frame size
+        sampling_frequency = 44100
+        times = np.arange(sampling_frequency) / sampling_frequency
+        values = sum(np.sin(2 * np.pi * 196 * i * times) / i for i in range(1, 6))
+
+        tracker = StreamingPitchTracker(sampling_frequency)
+        frequencies = np.array([frequency for timestamp, frequency, confidence in tracker.feed(values)])
+        cents = 1200 * np.log2(frequencies / 196)
+        self.assertLess(np.max(np.abs(cents)), 2)
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
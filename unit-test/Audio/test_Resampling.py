@@ -0,0 +1,76 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from Musica.Audio.Resampling import Resampler, decimate, lowpass_filter, resample
+
+####################################################################################################
+
+class TestResampling(unittest.TestCase):
+
+    ##############################################
+
+    def test_resample(self):
+
+        sampling_frequency = 9600
+        times = np.arange(sampling_frequency) / sampling_frequency
+        values = np.sin(2 * np.pi * 50 * times) + .5 * np.sin(2 * np.pi * 4000 * times)
+
+        for up, down in ((1, 8), (3, 2), (2, 1), (160, 147)):
+            resampled = resample(values, up, down)
+            resampled_frequency = sampling_frequency * up / down
+            self.assertEqual(resampled.size, int(np.ceil(values.size * up / down)))
+            resampled_times = np.arange(resampled.size) / resampled_frequency
+            expected = np.sin(2 * np.pi * 50 * resampled_times)
+            if resampled_frequency > 8000 * 1.25:
+                expected += .5 * np.sin(2 * np.pi * 4000 * resampled_times)
+            # skip the transients at the ends
+            margin = resampled.size // 10
+            self.assertLess(np.max(np.abs(resampled - expected)[margin:-margin]), 1e-2)
+
+        self.assertIs(lowpass_filter(1, 8), lowpass_filter(1, 8))
+        np.testing.assert_array_equal(decimate(values, 8), resample(values, 2, 16))
+        np.testing.assert_array_equal(resample(np.stack((values, values)), 3, 2)[1], resample(values, 3, 2))
+
+    ##############################################
+
+    def test_segment(self):
+
+        values = np.random.RandomState(0).normal(size=4000)
+        for up, down in ((1, 8), (3, 2)):
+            resampler = Resampler(up, down)
+            resampled = resampler(values)
+            for start in (0, 800, 2000):
+                segment = resampler.resample_segment(values, start, start + 1000)
+                first = start * up // down
+                np.testing.assert_allclose(segment, resampled[first:first + segment.size], atol=1e-12)
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
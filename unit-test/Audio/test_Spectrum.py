@@ -0,0 +1,172 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from Musica.Audio.HarmonicSpectrum import decimate_spectrum
+from Musica.Audio.Spectrogram import Spectrogram
+from Musica.Audio.Spectrum import Spectrum, window_vector
+
+####################################################################################################
+
+def sine(frequency, sampling_frequency, number_of_samples):
+    return np.sin(2 * np.pi * frequency * np.arange(number_of_samples) / sampling_frequency)
+
+####################################################################################################
+
+class TestSpectrum(unittest.TestCase):
+
+    ##############################################
+
+    def test_lazy(self):
+
+        sampling_frequency = 8000
+        values = sine(440, sampling_frequency, 1024)
+
+        spectrum = Spectrum(sampling_frequency, values, lazy=True)
+        self.assertEqual(spectrum.frequency_resolution, sampling_frequency / 1024)
+        self.assertIsNone(spectrum._fft)
+
+        magnitude = spectrum.magnitude
+        self.assertIs(spectrum.magnitude, magnitude)
+        self.assertTrue(np.allclose(magnitude, Spectrum(sampling_frequency, values).magnitude))
+
+        spectrum.values = values[:512]
+        self.assertEqual(spectrum.magnitude.size, 257)
+
+    ##############################################
+
+    def test_window_cache(self):
+
+        for window in ('blackman', 'hamming', 'hann', 'kaiser'):
+            vector = window_vector(window, 1024)
+            self.assertIs(window_vector(window, 1024), vector)
+            self.assertFalse(vector.flags.writeable)
+
+        spectrum1 = Spectrum(8000, np.ones(256), window='hamming')
+        spectrum2 = Spectrum(8000, np.zeros(256), window='hamming')
+        self.assertIs(spectrum1.frequencies, spectrum2.frequencies)
+        self.assertAlmostEqual(spectrum1.fft[0].real, np.hamming(256).sum())
+
+    ##############################################
+
+    def test_refine_peak(self):
+
+        sampling_frequency = 8000
+        frequency = 441.3
+        values = sine(frequency, sampling_frequency, 2048)
+        spectrum = Spectrum(sampling_frequency, values[:1024])
+        next_spectrum = Spectrum(sampling_frequency, values[256:1280])
+
+        index = spectrum.peak_index()
+        self.assertEqual(index, round(frequency / spectrum.frequency_resolution))
+
+        refined_frequency, magnitude = spectrum.refine_peak()
+        self.assertLess(abs(refined_frequency - frequency), .05 * spectrum.frequency_resolution)
+        self.assertGreaterEqual(magnitude, spectrum.magnitude[index])
+
+        instantaneous_frequency = spectrum.instantaneous_frequency(next_spectrum, 256)
+        self.assertAlmostEqual(instantaneous_frequency, frequency, 2)
+
+    ##############################################
+
+    def test_fft_size(self):
+
+        self.assertEqual(Spectrum.next_fast_size(33000), 33750)
+        self.assertEqual(Spectrum.next_fast_size(2**15), 2**15)
+        self.assertEqual(Spectrum.sample_for_resolution(44100, 44100 / 33000), 2**16)
+        self.assertEqual(Spectrum.sample_for_resolution(44100, 44100 / 33000, fast_size=True), 33750)
+
+        sampling_frequency = 8000
+        values = sine(1000, sampling_frequency, 1000)
+        spectrum = Spectrum(sampling_frequency, values, fft_size='fast')
+        self.assertEqual(spectrum.number_of_samples, 1000)
+        self.assertEqual(spectrum.fft_size, 1000)
+        spectrum = Spectrum(sampling_frequency, values[:999], fft_size='fast')
+        self.assertEqual(spectrum.fft_size, 1000)
+        self.assertEqual(spectrum.frequencies.size, spectrum.fft.size)
+        self.assertEqual(spectrum.frequency_resolution, 8)
+        self.assertEqual(spectrum.frequencies[spectrum.peak_index()], 1000)
+        with self.assertRaises(ValueError):
+            Spectrum(sampling_frequency, values, fft_size=512)
+
+        spectrogram = Spectrogram(sampling_frequency, values, 250, fft_size='power_of_two')
+        self.assertEqual(spectrogram.fft.shape, (7, 129))
+        self.assertEqual(spectrogram.frequency_resolution, sampling_frequency / 256)
+
+    ##############################################
+
+    def test_spectrogram(self):
+
+        sampling_frequency = 8000
+        values = sine(440, sampling_frequency, 10000)
+        spectrogram = Spectrogram(sampling_frequency, values, 1024, hop=256)
+
+        self.assertEqual(spectrogram.number_of_frames, 1 + (10000 - 1024) // 256)
+        self.assertEqual(spectrogram.magnitude.shape, (spectrogram.number_of_frames, 513))
+
+        for i in (0, 5, spectrogram.number_of_frames -1):
+            spectrum = Spectrum(sampling_frequency, values[i*256:i*256+1024])
+            self.assertTrue(np.allclose(spectrogram.fft[i], spectrum.fft))
+
+        self.assertAlmostEqual(spectrogram.times[0], 512 / sampling_frequency)
+
+    ##############################################
+
+    def test_harmonic_spectrum(self):
+
+        spectrum = np.arange(1., 11.)
+        # bins 3k-1, 3k, 3k+1 with reflection at both ends
+        self.assertTrue(np.allclose(decimate_spectrum(spectrum, 3, 4),
+                                    [(2+1+2)/3, (3+4+5)/3, (6+7+8)/3, (9+10+9)/3]))
+        self.assertTrue(np.allclose(decimate_spectrum(spectrum, 3, 4, rebin=False), [1, 4, 7, 10]))
+        # bins 2k-1, 2k, 2k+1 weighted 1/2, 1, 1/2
+        self.assertTrue(np.allclose(decimate_spectrum(spectrum, 2, 4), [(2+2+2)/4, (2+6+4)/4, (4+10+6)/4, (6+14+8)/4]))
+        # the rebinned bins of a ramp are centered on the bin i*k
+        ramp = np.arange(40.)
+        for factor in (2, 3, 4, 5):
+            decimated = decimate_spectrum(np.stack((ramp, ramp)), factor, 6)
+            self.assertTrue(np.allclose(decimated[:, 1:], np.arange(1, 6) * factor))
+
+        sampling_frequency = 8000
+        times = np.arange(8000) / sampling_frequency
+        values = sum(np.sin(2 * np.pi * 110 * i * times) / i for i in range(1, 6))
+        spectrogram = Spectrogram(sampling_frequency, values, 2048, hop=512)
+
+        frequencies, hps = spectrogram.hps(5, rebin=False)
+        hfs_frequencies, hfs = Spectrum(sampling_frequency, values[512:2560]).hfs(5)
+        self.assertTrue(np.allclose(np.exp(hps[1]), hfs))
+
+        for method in ('product', 'sum'):
+            f0 = spectrogram.fundamental_frequencies(5, method=method)
+            self.assertEqual(f0.shape, (spectrogram.number_of_frames,))
+            self.assertTrue(np.all(np.abs(f0 - 110) <= spectrogram.frequency_resolution))
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,89 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from Musica.Audio.Spectrum import Spectrum
+from Musica.Audio.Synthesis import AdditiveSynthesizer, Envelope, Note
+
+####################################################################################################
+
+class TestSynthesis(unittest.TestCase):
+
+    ##############################################
+
+    def test_envelope(self):
+
+        envelope = Envelope(attack=.1, decay=.1, sustain=.5, release=.2)
+        times = np.array([0, .05, .1, .15, .2, .5, .6, .7, 1])
+        np.testing.assert_allclose(envelope.values(times, .5), [0, .5, 1, .75, .5, .5, .25, 0, 0])
+        # released during the attack
+        np.testing.assert_allclose(envelope.values(np.array([.05, .15]), .05), [.5, .25])
+
+    ##############################################
+
+    def test_render(self):
+
+        sampling_frequency = 8000
+        inharmonicity = 1e-3
+        synthesizer = AdditiveSynthesizer(sampling_frequency,
+                                          number_of_partials=4,
+                                          inharmonicity=inharmonicity,
+                                          chunk_size=1000)
+        frequencies = synthesizer.partial_frequencies(100)
+        np.testing.assert_allclose(frequencies, [k * 100 * np.sqrt(1 + inharmonicity * k**2) for k in range(1, 5)])
+
+        notes = [Note('A4', 0, 1), Note(300, .5, 1)]
+        chunks = list(synthesizer.render(notes))
+        self.assertTrue(all(chunk.size == 1000 for chunk in chunks[:-1]))
+        signal = np.concatenate(chunks)
+        self.assertEqual(signal.size, int((1.5 + synthesizer.envelope.release) * sampling_frequency))
+        self.assertLessEqual(np.max(np.abs(signal)), 2)
+
+        # the chunk size doesn't change the signal
+        synthesizer = AdditiveSynthesizer(sampling_frequency, number_of_partials=4, inharmonicity=inharmonicity)
+        np.testing.assert_allclose(np.concatenate(list(synthesizer.render(notes))), signal, atol=1e-9)
+
+        # notes are dropped after their release, a sequence is the sum of its notes
+        chunked_synthesizer = AdditiveSynthesizer(sampling_frequency, number_of_partials=4, chunk_size=1000)
+        sequence = [Note(200 + 50 * i, .3 * i, .2) for i in range(8)]
+        signal = np.concatenate(list(chunked_synthesizer.render(sequence)))
+        expected = np.zeros(signal.size)
+        for note in sequence:
+            note_signal = np.concatenate(list(chunked_synthesizer.render(note)))
+            expected[:note_signal.size] += note_signal
+        np.testing.assert_allclose(signal, expected, atol=1e-9)
+
+        signal = np.concatenate(list(synthesizer.render(notes)))
+        spectrum = Spectrum(sampling_frequency, signal[:4000])
+        frequency = spectrum.frequencies[np.argmax(spectrum.magnitude)]
+        self.assertAlmostEqual(frequency, 440 * np.sqrt(1 + inharmonicity), delta=spectrum.frequency_resolution)
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,310 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import os
+import struct
+import tempfile
+import unittest
+import wave
+
+import numpy as np
+
+####################################################################################################
+
+from Musica.Audio.AudioFormat import AudioFormat
+from Musica.Audio.Resampling import Resampler
+
+####################################################################################################
+
+class TestWave(unittest.TestCase):
+
+    ##############################################
+
+    def setUp(self):
+
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, 'test.wav')
+
+        self._frames = np.arange(-1000, 1000, dtype='<i2').reshape(-1, 2)
+        wave_file = wave.open(self._path, 'wb')
+        wave_file.setparams((2, 2, 44100, 0, 'NONE', 'not compressed'))
+        wave_file.writeframes(self._frames.tobytes())
+        wave_file.close()
+
+    ##############################################
+
+    def tearDown(self):
+
+        self._directory.cleanup()
+
+    ##############################################
+
+    def test_read(self):
+
+        for memory_map in (False, True):
+            audio = AudioFormat.open(self._path, memory_map=memory_map)
+            self.assertEqual(audio.metadata.number_of_channels, 2)
+            self.assertEqual(audio.metadata.sampling_frequency, 44100)
+            self.assertEqual(audio.number_of_samples, 1000)
+            for i in range(2):
+                self.assertTrue(np.array_equal(audio.channel(i), self._frames[:,i]))
+
+    ##############################################
+
+    def test_float_channel(self):
+
+        audio = AudioFormat.open(self._path, float_dtype=np.float32)
+        data = audio.channel(0, as_float=True)
+        self.assertEqual(data.dtype, np.float32)
+        self.assertIs(audio.channel(0, as_float=True), data)
+        self.assertFalse(data.flags.writeable)
+        self.assertTrue(np.allclose(data, self._frames[:,0] / 2**15))
+
+        spectrum = audio.spectrum(0, start_sample=100, number_of_samples=256)
+        self.assertTrue(np.array_equal(spectrum.values, data[100:356]))
+
+        spectrum = audio.spectrum(0, start_sample=100, frequency_resolution=44100 / 300, fast_size=True)
+        self.assertEqual(spectrum.number_of_samples, 300)
+        # the end of the channel is zero padded
+        spectrum = audio.spectrum(0, start_sample=900, frequency_resolution=44100 / 300)
+        self.assertEqual((spectrum.number_of_samples, spectrum.fft_size), (100, 512))
+        # the size policy applies to the resampled segment
+        resampler = Resampler(1, 8)
+        spectrum = audio.spectrum(0, frequency_resolution=44100 / 300, fast_size=True, resampler=resampler)
+        self.assertEqual((spectrum.number_of_samples, spectrum.fft_size), (38, 40))
+        spectrum = audio.spectrum(0, frequency_resolution=44100 / 300, resampler=resampler)
+        self.assertEqual(spectrum.fft_size, 64)
+        spectrum = audio.spectrum(0, frequency_resolution=44100 / 300, fft_size=80, resampler=resampler)
+        self.assertEqual(spectrum.fft_size, 80)
+
+    ##############################################
+
+    def test_multi_channel_spectrum(self):
+
+        audio = AudioFormat.open(self._path)
+        spectrum = audio.spectrum('all', start_sample=10, number_of_samples=512)
+        self.assertEqual(spectrum.number_of_channels, 2)
+        self.assertEqual(spectrum.fft.shape, (2, 257))
+        for i in range(2):
+            channel_spectrum = audio.spectrum(i, start_sample=10, number_of_samples=512)
+            self.assertTrue(np.allclose(spectrum.magnitude[i], channel_spectrum.magnitude))
+            self.assertEqual(spectrum.peak_index()[i], channel_spectrum.peak_index())
+
+        spectrum = audio.spectrum([1], number_of_samples=512)
+        self.assertEqual(spectrum.fft.shape, (1, 257))
+
+    ##############################################
+
+    def test_memory_mapped_spectrum(self):
+
+        audio = AudioFormat.open(self._path)
+        mapped_audio = AudioFormat.open(self._path, memory_map=True)
+        for resampler in (None, Resampler(1, 4)):
+            for channel in (1, 'all'):
+                spectrum = audio.spectrum(channel, start_sample=100, number_of_samples=256, resampler=resampler)
+                mapped_spectrum = mapped_audio.spectrum(channel, start_sample=100, number_of_samples=256,
+                                                        resampler=resampler)
+                np.testing.assert_array_equal(mapped_spectrum.values, spectrum.values)
+            spectrogram = audio.spectrogram(0, 64, start_sample=50, resampler=resampler)
+            mapped_spectrogram = mapped_audio.spectrogram(0, 64, start_sample=50, resampler=resampler)
+            np.testing.assert_array_equal(mapped_spectrogram.fft, spectrogram.fft)
+        # only the segments are converted
+        self.assertEqual(mapped_audio._float_channels, {})
+
+    ##############################################
+
+    def test_iter_blocks(self):
+
+        audio = AudioFormat.open(self._path, memory_map=True)
+
+        starts = []
+        for start, block in audio.iter_blocks(300, hop=200):
+            starts.append(start)
+            self.assertTrue(np.array_equal(block, self._frames[start:start+300].T))
+        self.assertEqual(starts, [0, 200, 400, 600, 800])
+
+        blocks = [block for start, block in audio.iter_blocks(400, channel=1)]
+        self.assertEqual([block.size for block in blocks], [400, 400, 200])
+        self.assertTrue(np.array_equal(np.concatenate(blocks), self._frames[:,1]))
+
+    ##############################################
+
+    def _write_wave(self, path, audio_format, bits_per_sample, data):
+
+        number_of_channels = 2
+        block_align = number_of_channels * bits_per_sample // 8
+        with open(path, 'wb') as wave_file:
+            wave_file.write(struct.pack('<4sI4s', b'RIFF', 36 + len(data), b'WAVE'))
+            wave_file.write(struct.pack('<4sIHHIIHH', b'fmt ', 16,
+                                        audio_format, number_of_channels, 48000, 48000 * block_align,
+                                        block_align, bits_per_sample))
+            wave_file.write(struct.pack('<4sI', b'data', len(data)))
+            wave_file.write(data)
+
+    ##############################################
+
+    def test_24_bit(self):
+
+        path = os.path.join(self._directory.name, 'test-24.wav')
+        samples = np.array([[0, -1], [2**23 - 1, -2**23], [123456, -654321]])
+        data = b''.join(int(sample).to_bytes(3, 'little', signed=True) for sample in samples.flat)
+        self._write_wave(path, 1, 24, data)
+
+        for memory_map in (False, True):
+            audio = AudioFormat.open(path, memory_map=memory_map)
+            self.assertEqual(audio.metadata.bits_per_sample, 24)
+            self.assertEqual(audio.number_of_samples, 3)
+            for i in range(2):
+                self.assertTrue(np.array_equal(audio.channel(i), samples[:,i]))
+            self.assertTrue(np.array_equal(audio.channel(1, as_float=True), samples[:,1] / 2**23))
+            blocks = [block for start, block in audio.iter_blocks(2)]
+            self.assertTrue(np.array_equal(np.concatenate(blocks, axis=1), samples.T))
+
+    ##############################################
+
+    def test_float(self):
+
+        path = os.path.join(self._directory.name, 'test-float.wav')
+        samples = np.array([[0, -1], [.5, -.25], [1, .125]], dtype='<f4')
+        self._write_wave(path, 3, 32, samples.tobytes())
+
+        audio = AudioFormat.open(path, memory_map=True)
+        self.assertTrue(audio.metadata.is_float)
+        self.assertEqual(audio.metadata.float_scale, 1)
+        self.assertEqual(audio.channel(0).dtype, np.float32)
+        self.assertTrue(np.array_equal(audio.channel(1, as_float=True), samples[:,1]))
+
+    ##############################################
+
+    def test_write(self):
+
+        path = os.path.join(self._directory.name, 'test-write.wav')
+        samples = np.array([[0, .5, -.25, 1, -1, 2], [.125, -.5, .75, 0, -2, .1]])
+
+        for bits_per_sample, is_float in ((16, False), (24, False), (32, False), (32, True)):
+            blocks = (samples[:,i:min(i + 2, 5)] for i in range(0, 5, 2))
+            number_of_samples = AudioFormat.write(path, blocks, 22050,
+                                                  bits_per_sample=bits_per_sample, is_float=is_float)
+            self.assertEqual(number_of_samples, 5)
+            audio = AudioFormat.open(path)
+            self.assertEqual(audio.metadata.bits_per_sample, bits_per_sample)
+            self.assertEqual(audio.metadata.is_float, is_float)
+            self.assertEqual(audio.number_of_samples, 5)
+            tolerance = 0 if is_float else 1 / audio.metadata.float_scale
+            for i in range(2):
+                data = audio.channel(i, as_float=True)
+                expected = samples[i,:5] if is_float else np.clip(samples[i,:5], -1, 1 - tolerance)
+                self.assertTrue(np.allclose(data, expected, rtol=0, atol=tolerance))
+
+        # a mono block is written to all the channels
+        with AudioFormat.open_writer(path, 8000, number_of_channels=2, bits_per_sample=24) as writer:
+            writer.write(np.arange(-3, 0))
+            with self.assertRaises(ValueError):
+                writer.write(np.zeros((3, 2)))
+        audio = AudioFormat.open(path)
+        for i in range(2):
+            self.assertTrue(np.array_equal(audio.channel(i), [-3, -2, -1]))
+
+        # the data chunk of a 24-bit mono file having an odd number of samples is padded, the header
+        # of the extensible format is 68 bytes
+        AudioFormat.write(path, np.arange(3), 8000, bits_per_sample=24)
+        self.assertEqual(os.path.getsize(path), 68 + 3 * 3 + 1)
+        self.assertTrue(np.array_equal(AudioFormat.open(path).channel(0), [0, 1, 2]))
+
+        # an integral float sampling frequency, e.g. from the resampler, is accepted
+        AudioFormat.write(path, np.arange(3), 8000.)
+        self.assertEqual(AudioFormat.open(path).metadata.sampling_frequency, 8000)
+        other_path = os.path.join(self._directory.name, 'test-write-rate.wav')
+        with self.assertRaises(ValueError):
+            AudioFormat.write(other_path, np.arange(3), 8000.5)
+        self.assertFalse(os.path.exists(other_path))
+
+        # the wave module reads integer PCM
+        AudioFormat.write(path, self._frames.T, 44100)
+        wave_file = wave.open(path, 'rb')
+        self.assertEqual(wave_file.getnframes(), 1000)
+        self.assertEqual(wave_file.readframes(1000), self._frames.tobytes())
+        wave_file.close()
+
+    ##############################################
+
+    def _read_chunks(self, path):
+
+        chunks = {}
+        with open(path, 'rb') as wave_file:
+            riff_id, riff_size, wave_id = struct.unpack('<4sI4s', wave_file.read(12))
+            self.assertEqual(riff_size, os.path.getsize(path) - 8)
+            while True:
+                chunk_header = wave_file.read(8)
+                if not chunk_header:
+                    break
+                chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+                chunks[chunk_id] = wave_file.read(chunk_size + (chunk_size & 1))[:chunk_size]
+        return chunks
+
+    ##############################################
+
+    def test_write_extensible(self):
+
+        path = os.path.join(self._directory.name, 'test-extensible.wav')
+        samples = np.array([[0, 2**23 - 1, -2**23], [1, -1, 123456], [-654321, 7, 0]])
+
+        # 24-bit integer samples and 3 channels use the extensible format
+        for bits_per_sample, number_of_channels in ((24, 2), (16, 3), (24, 3)):
+            data = samples[:number_of_channels] >> (24 - bits_per_sample)
+            AudioFormat.write(path, data / 2**(bits_per_sample - 1), 48000, bits_per_sample=bits_per_sample)
+            fmt = self._read_chunks(path)[b'fmt ']
+            self.assertEqual(len(fmt), 40)
+            (audio_format, channels, sampling_frequency, byte_rate, block_align, bits,
+             cb_size, valid_bits, channel_mask, sub_format) = struct.unpack('<HHIIHHHHIH', fmt[:26])
+            self.assertEqual((audio_format, channels, bits, cb_size, valid_bits, sub_format),
+                             (0xFFFE, number_of_channels, bits_per_sample, 22, bits_per_sample, 1))
+            self.assertEqual(channel_mask, 2**number_of_channels - 1)
+            for memory_map in (False, True):
+                audio = AudioFormat.open(path, memory_map=memory_map)
+                self.assertEqual(audio.metadata.bits_per_sample, bits_per_sample)
+                self.assertFalse(audio.metadata.is_float)
+                for i in range(number_of_channels):
+                    self.assertTrue(np.array_equal(audio.channel(i), data[i]))
+
+        # 16-bit stereo keeps the PCM format
+        AudioFormat.write(path, samples[:2] / 2**23, 48000)
+        self.assertEqual(len(self._read_chunks(path)[b'fmt ']), 16)
+
+        # float files have a cbSize and a fact chunk
+        for number_of_channels, fmt_size in ((2, 18), (3, 40)):
+            data = samples[:number_of_channels] / 2**23
+            AudioFormat.write(path, data, 48000, bits_per_sample=32, is_float=True)
+            chunks = self._read_chunks(path)
+            self.assertEqual(len(chunks[b'fmt ']), fmt_size)
+            self.assertEqual(struct.unpack('<H', chunks[b'fmt '][16:18])[0], fmt_size - 18)
+            self.assertEqual(struct.unpack('<I', chunks[b'fact'])[0], 3)
+            audio = AudioFormat.open(path)
+            self.assertTrue(audio.metadata.is_float)
+            for i in range(number_of_channels):
+                self.assertTrue(np.array_equal(audio.channel(i), data[i].astype(np.float32)))
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
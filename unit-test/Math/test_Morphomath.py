@@ -0,0 +1,87 @@
+####################################################################################################
+#
+# Musica - A Music Theory Package for Python
+# Copyright (C) 2017 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+from Musica.Math.Morphomath import (
+    BallStructuringElement,
+    Function,
+    StructuringElement,
+    moving_rank,
+)
+
+####################################################################################################
+
+class TestMorphomath(unittest.TestCase):
+
+    ##############################################
+
+    def test_rank_filter(self):
+
+        random_state = np.random.RandomState(0)
+        for size in (1, 7, 100):
+            values = random_state.randint(0, 100, size)
+            for radius in (0, 1, 3, 40):
+                structuring_element = BallStructuringElement(radius)
+                for operation in ('erode', 'dilate'):
+                    reference = getattr(Function(values), operation)(structuring_element, vectorised=False)
+                    function = getattr(Function(values), operation)(structuring_element)
+                    np.testing.assert_array_equal(function.values, reference.values)
+                    rank_operator = min if operation == 'erode' else max
+                    for vhgw in (False, True):
+                        np.testing.assert_array_equal(moving_rank(values, -radius, radius, rank_operator, vhgw),
+                                                      reference.values)
+                    if 0 < 2*radius + 1 < size:
+                        function = getattr(Function(values), operation + '_vhgw')(radius)
+                        reference = getattr(Function(values), operation + '_vhgw')(radius, vectorised=False)
+                        np.testing.assert_array_equal(function.values, reference.values)
+
+        structuring_element = StructuringElement([-2, 0, 3])
+        values = random_state.randint(0, 100, 50)
+        for operation in ('erode', 'dilate'):
+            reference = getattr(Function(values), operation)(structuring_element, vectorised=False)
+            function = getattr(Function(values), operation)(structuring_element)
+            np.testing.assert_array_equal(function.values, reference.values)
+
+    ##############################################
+
+    def test_geodesic_reconstruction(self):
+
+        random_state = np.random.RandomState(0)
+        for size in (1, 2, 10, 200):
+            for i in range(20):
+                mask = Function(random_state.randint(0, 50, size))
+                for marker in (Function(random_state.randint(0, 50, size)), mask.clone().subtract(5)):
+                    self.assertEqual(mask.geodesic_reconstruction(marker),
+                                     mask.geodesic_reconstruction(marker, iterative=True))
+
+        function = Function([0, 1, 5, 1, 0, 2, 9, 3, 3, 0])
+        np.testing.assert_array_equal(function.h_dome(3).values, [0, 0, 3, 0, 0, 0, 3, 0, 0, 0])
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -22,9 +22,12 @@
 
 import unittest
 
+import numpy as np
+
 ####################################################################################################
 
 from Musica.Theory.Temperament import *
+from Musica.Theory.Pitch import Pitch
 
 ####################################################################################################
 
@@ -39,6 +42,25 @@ class TestTemperament(unittest.TestCase):
         self.assertAlmostEqual(ET12.frequency(octave=4, step_number=9), 440)
         self.assertAlmostEqual(ET12.frequency(octave=8, step_number=11), 7902.13, 2)
 
+    ##############################################
+
+    def test_nearest_steps(self):
+
+        frequencies = np.array([440, 440 * 2**(.3/12), 261.63 * 2**(-.2/12), 16.352])
+        step_numbers, octaves, midi, cents = ET12.nearest_steps(frequencies)
+        np.testing.assert_array_equal(step_numbers, [9, 9, 0, 0])
+        np.testing.assert_array_equal(octaves, [4, 4, 4, 0])
+        np.testing.assert_array_equal(midi, [69, 69, 60, 12])
+        np.testing.assert_allclose(cents, [0, 30, -20, 0], atol=.1)
+        np.testing.assert_array_equal(ET12.pitch_names(step_numbers, octaves), ['A4', 'A4', 'C4', 'C0'])
+        self.assertEqual(str(ET12.step_names(10, flat=True)), 'B-')
+
+        # negative octaves are written as Pitch does
+        step_numbers, octaves, midi, cents = ET12.nearest_steps(np.array([8.18, 10.91, 43.65]))
+        names = ET12.pitch_names(step_numbers, octaves)
+        np.testing.assert_array_equal(names, ['C/-1', 'F/-1', 'F1'])
+        self.assertEqual([str(Pitch(midi=int(x))) for x in midi], list(names))
+
 ####################################################################################################
 
 if __name__ == '__main__':